@@ -0,0 +1,303 @@
+"""
+Wholesale customer balances.
+
+CustomerBalance keeps running sales and payment totals per customer. Sales
+and payments adjust it with F() increments inside the same transaction that
+creates or soft-deletes them, so the balance popup and payment list read a
+single row instead of aggregating the customer's whole history.
+
+LedgerCheckpoint rows hold the same totals per (customer, branch) for
+everything dated before the first of a month. They are created on first use
+from the previous checkpoint and shifted by every later sale or payment, so
+a ledger opening balance only aggregates the days since the month started.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, IntegerField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    Branch, Customer, CustomerBalance, LedgerCheckpoint, WholesalePayment,
+    WholesaleSales,
+)
+
+ZERO = Decimal('0.000')
+
+
+def _bump(customer, branch_id, day, sales=ZERO, paid=ZERO):
+    changes = {
+        'total_sales': F('total_sales') + Decimal(sales or 0),
+        'total_paid': F('total_paid') + Decimal(paid or 0),
+    }
+    updated = CustomerBalance.objects.filter(customer=customer).update(**changes)
+    if not updated:
+        CustomerBalance.objects.get_or_create(customer=customer)
+        CustomerBalance.objects.filter(customer=customer).update(**changes)
+
+    # Checkpoints of later months already include documents dated before them
+    LedgerCheckpoint.objects.filter(
+        _branch_q([branch_id]), customer=customer, month__gt=day
+    ).update(**changes)
+
+
+def apply_sale(customer, amount, branch_id, day):
+    """Record a wholesale sale total (negative amount reverses it)."""
+    _bump(customer, branch_id, day, sales=amount)
+
+
+def apply_payment(customer, amount, branch_id, day):
+    """Record a wholesale payment (negative amount reverses it)."""
+    _bump(customer, branch_id, day, paid=amount)
+
+
+def get_customer_balance(customer_id):
+    """Outstanding balance for a customer from its balance row, or None if unknown."""
+    row = (
+        Customer.objects
+        .filter(id=customer_id, delete_status=False)
+        .annotate(**balance_annotations())
+        .values_list('current_balance', flat=True)
+        .first()
+    )
+    return row
+
+
+def balance_annotations():
+    """Annotations adding total_sales, total_paid and current_balance to a Customer queryset."""
+    money = DecimalField(max_digits=14, decimal_places=3)
+    total_sales = Coalesce(F('balance__total_sales'), Value(ZERO), output_field=money)
+    total_paid = Coalesce(F('balance__total_paid'), Value(ZERO), output_field=money)
+    return {
+        'total_sales': total_sales,
+        'total_paid': total_paid,
+        'current_balance': F('opening_balance') + total_sales - total_paid,
+    }
+
+
+def compute_customer_totals():
+    """customer_id → (total_sales, total_paid) recomputed from sales and payments."""
+    sales = dict(
+        WholesaleSales.objects.filter(delete_status=False)
+        .values('customer_id').annotate(total=Sum('grand_total'))
+        .values_list('customer_id', 'total')
+    )
+    paid = dict(
+        WholesalePayment.objects.filter(delete_status=False)
+        .values('customer_id').annotate(total=Sum('amount'))
+        .values_list('customer_id', 'total')
+    )
+    return {
+        customer_id: (sales.get(customer_id) or ZERO, paid.get(customer_id) or ZERO)
+        for customer_id in set(sales) | set(paid)
+    }
+
+
+def find_balance_mismatches():
+    """
+    Compare stored balance rows with totals rebuilt from history.
+    Returns a list of (customer_id, stored, expected) tuples.
+    """
+    expected = compute_customer_totals()
+    stored = {
+        row[0]: (row[1], row[2])
+        for row in CustomerBalance.objects.values_list('customer_id', 'total_sales', 'total_paid')
+    }
+    mismatches = []
+    for customer_id in set(expected) | set(stored):
+        want = expected.get(customer_id, (ZERO, ZERO))
+        have = stored.get(customer_id, (ZERO, ZERO))
+        if want[0] != have[0] or want[1] != have[1]:
+            mismatches.append((customer_id, have, want))
+    return sorted(mismatches)
+
+
+def rebuild_customer_balances():
+    """
+    Rewrite every balance row from history. Returns the number of rows written.
+    The rows are created if missing and locked before history is summed, so a
+    sale or payment posted meanwhile waits and is then applied on top.
+    """
+    with transaction.atomic():
+        CustomerBalance.objects.bulk_create(
+            [CustomerBalance(customer_id=pk) for pk in Customer.objects.values_list('id', flat=True)],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        balances = list(CustomerBalance.objects.select_for_update().order_by('pk'))
+        expected = compute_customer_totals()
+        now = timezone.now()
+        for balance in balances:
+            balance.total_sales, balance.total_paid = expected.get(balance.customer_id, (ZERO, ZERO))
+            balance.updated_at = now
+        CustomerBalance.objects.bulk_update(
+            balances, ['total_sales', 'total_paid', 'updated_at'], batch_size=1000
+        )
+        # Checkpoints are rebuilt from history the next time a ledger needs them
+        LedgerCheckpoint.objects.all().delete()
+    return len(balances)
+
+
+# ── Ledger checkpoints ──────────────────────────────────────────
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def _branch_q(branch_ids):
+    """Filter for documents in the given branches; None stands for "no branch"."""
+    if branch_ids is None:
+        return Q()
+    ids = [branch_id for branch_id in branch_ids if branch_id is not None]
+    condition = Q(branch_id__in=ids)
+    if None in branch_ids:
+        condition |= Q(branch__isnull=True)
+    return condition
+
+
+def _totals_by_branch(customer, condition_for):
+    """
+    branch_id → [sales, paid] over wholesale documents of a customer.
+    condition_for(date_field) returns the Q applied to each document table.
+    """
+    totals = {}
+    for model, date_field, amount_field, index in (
+        (WholesaleSales, 'sales_date', 'grand_total', 0),
+        (WholesalePayment, 'payment_date', 'amount', 1),
+    ):
+        rows = (
+            model.objects
+            .filter(condition_for(date_field), customer=customer, delete_status=False)
+            .values('branch_id')
+            .annotate(total=Sum(amount_field))
+            .values_list('branch_id', 'total')
+        )
+        for branch_id, total in rows:
+            totals.setdefault(branch_id, [ZERO, ZERO])[index] += total or ZERO
+    return totals
+
+
+def get_checkpoints(customer, month, branch_ids):
+    """
+    branch_id → (total_sales, total_paid) before `month`, creating missing
+    checkpoints from the latest earlier one plus the documents in between.
+    """
+    stored = {
+        branch_id: (sales, paid)
+        for branch_id, sales, paid in LedgerCheckpoint.objects
+        .filter(_branch_q(branch_ids), customer=customer, month=month)
+        .values_list('branch_id', 'total_sales', 'total_paid')
+    }
+    missing = [branch_id for branch_id in branch_ids if branch_id not in stored]
+    if not missing:
+        return stored
+
+    previous = {}
+    for checkpoint in (
+        LedgerCheckpoint.objects
+        .filter(_branch_q(missing), customer=customer, month__lt=month)
+        .order_by('-month')
+    ):
+        previous.setdefault(checkpoint.branch_id, checkpoint)
+
+    def condition_for(date_field):
+        condition = Q()
+        for branch_id in missing:
+            scope = _branch_q([branch_id])
+            if branch_id in previous:
+                scope &= Q(**{f'{date_field}__gte': previous[branch_id].month})
+            condition |= scope
+        return condition & Q(**{f'{date_field}__lt': month})
+
+    delta = _totals_by_branch(customer, condition_for)
+    rows = []
+    for branch_id in missing:
+        base = previous.get(branch_id)
+        sales, paid = delta.get(branch_id, (ZERO, ZERO))
+        if base:
+            sales += base.total_sales
+            paid += base.total_paid
+        stored[branch_id] = (sales, paid)
+        rows.append(LedgerCheckpoint(
+            customer=customer, branch_id=branch_id, month=month,
+            total_sales=sales, total_paid=paid,
+        ))
+    LedgerCheckpoint.objects.bulk_create(rows, ignore_conflicts=True)
+    return stored
+
+
+def ledger_opening_balance(customer, from_date, branch_ids=None):
+    """
+    Balance of a customer before from_date, limited to branch_ids
+    (None = every branch, including payments without a branch).
+    """
+    month = month_start(from_date)
+    scopes = branch_ids
+    if scopes is None:
+        scopes = [None] + list(Branch.objects.values_list('pk', flat=True))
+
+    checkpoints = get_checkpoints(customer, month, scopes)
+    sales = sum((totals[0] for totals in checkpoints.values()), ZERO)
+    paid = sum((totals[1] for totals in checkpoints.values()), ZERO)
+
+    # Documents between the checkpoint and from_date
+    for branch_id, totals in _totals_by_branch(
+        customer,
+        lambda date_field: _branch_q(branch_ids) & Q(**{
+            f'{date_field}__gte': month, f'{date_field}__lt': from_date,
+        })
+    ).items():
+        sales += totals[0]
+        paid += totals[1]
+
+    return (customer.opening_balance or ZERO) + sales - paid
+
+
+def ledger_entries(customer, from_date, to_date, branch_ids=None):
+    """
+    Sales and payments of a customer between the dates as one UNION ALL
+    query ordered by date (sales before payments on the same day).
+    Yields dicts with date, kind ('sale'/'payment'), receipt_no, amount, payment_mode.
+    """
+    money = DecimalField(max_digits=14, decimal_places=3)
+    columns = ('entry_date', 'kind', 'id', 'receipt_no', 'entry_amount', 'entry_mode')
+    sales = (
+        WholesaleSales.objects
+        .filter(
+            _branch_q(branch_ids), customer=customer, delete_status=False,
+            sales_date__gte=from_date, sales_date__lte=to_date,
+        )
+        .annotate(
+            entry_date=F('sales_date'),
+            kind=Value(0, output_field=IntegerField()),
+            entry_amount=Coalesce(F('grand_total'), Value(ZERO), output_field=money),
+            entry_mode=Value(''),
+        )
+        .values_list(*columns)
+        .order_by()
+    )
+    payments = (
+        WholesalePayment.objects
+        .filter(
+            _branch_q(branch_ids), customer=customer, delete_status=False,
+            payment_date__gte=from_date, payment_date__lte=to_date,
+        )
+        .annotate(
+            entry_date=F('payment_date'),
+            kind=Value(1, output_field=IntegerField()),
+            entry_amount=Coalesce(F('amount'), Value(ZERO), output_field=money),
+            entry_mode=F('payment_mode'),
+        )
+        .values_list(*columns)
+        .order_by()
+    )
+    rows = sales.union(payments, all=True).order_by('entry_date', 'kind', 'id')
+    for day, kind, _, receipt_no, amount, mode in rows.iterator(chunk_size=2000):
+        yield {
+            'date': day,
+            'kind': 'payment' if kind else 'sale',
+            'receipt_no': receipt_no,
+            'amount': Decimal(amount or 0),
+            'payment_mode': mode,
+        }
@@ -0,0 +1,169 @@
+"""
+View benchmarks (manage.py benchmark_views and the budget tests).
+
+The heavy views are requested through the Django test client against the
+data already in the database, normally a seed_shop dataset. Every view gets
+one request with a query counter for its query count, a few timed
+requests for its wall time and one request under tracemalloc for its peak
+Python memory. The configured cache (the database cache table) is cleared
+and the in-process versions forgotten before each request, so the numbers
+are for the uncached path and include the cache table round trips.
+
+A view is over budget when any of the three exceeds VIEW_BUDGETS. Query
+counts must not grow with the data; the time and memory budgets are for the
+reference dataset (seed_shop --days 90 --branches 3 --bills 100).
+"""
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count, Max
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from .models import RetailSales, Supplierpay, WholesaleSales
+from .versions import forget_local_versions
+
+REPORT_DAYS = 30
+
+# url name → (queries, milliseconds, peak KB). The query counts include the
+# cache table: creating a missing version token (versions.py) or storing a
+# daily summary costs about six statements.
+VIEW_BUDGETS = {
+    'dashboard': (8, 500, 2000),
+    'daily_summary_report': (28, 500, 2000),
+    'daily_stock_update': (22, 500, 2000),
+    'item_wise_profit_report': (19, 3000, 64000),
+    'wholesale_profit_report': (19, 1000, 12000),
+    'customer_ledger': (14, 500, 4000),
+    'wholesale_payment_list': (9, 500, 2000),
+    'supplier_payment_list': (9, 500, 2000),
+    'retail_sales_list': (10, 500, 4000),
+}
+
+BENCHMARK_SETTINGS = {
+    'ALLOWED_HOSTS': ['testserver'],
+    'DEBUG': False,
+}
+
+
+def scenario():
+    """
+    Query parameters of every benchmarked view: the busiest branch, wholesale
+    customer and supplier over the REPORT_DAYS days up to the latest sale.
+    None when there are no sales to report on.
+    """
+    to_date = RetailSales.objects.filter(delete_status=False).aggregate(day=Max('sales_date'))['day']
+    if to_date is None:
+        return None
+    from_date = to_date - timedelta(days=REPORT_DAYS - 1)
+
+    def busiest(queryset, field):
+        return (
+            queryset.filter(delete_status=False).values_list(field, flat=True)
+            .annotate(n=Count('pk')).order_by('-n', field).first()
+        )
+
+    branch = busiest(RetailSales.objects.all(), 'branch')
+    customer = busiest(WholesaleSales.objects.all(), 'customer')
+    supplier = busiest(Supplierpay.objects.all(), 'supplier')
+    period = {'from_date': from_date.isoformat(), 'to_date': to_date.isoformat()}
+    return {
+        'dashboard': {'period': 'custom', **period},
+        'daily_summary_report': {'date': to_date.isoformat(), 'branch': branch},
+        'daily_stock_update': {'date': to_date.isoformat(), 'branch': branch},
+        'item_wise_profit_report': {'branch': branch, **period},
+        'wholesale_profit_report': {'branch': branch, **period},
+        'customer_ledger': {'customer_id': customer, **period},
+        'wholesale_payment_list': {'customer': customer, **period},
+        'supplier_payment_list': {'supplier': supplier, **period},
+        'retail_sales_list': {'branch': branch, **period},
+    }
+
+
+class QueryCounter:
+    """Database execute wrapper counting statements; unlike connection.queries it survives reconnects."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _clear_caches():
+    cache.clear()
+    forget_local_versions()
+
+
+def _get(client, url, params):
+    response = client.get(url, {k: v for k, v in params.items() if v is not None})
+    if getattr(response, 'streaming', False):
+        b''.join(response.streaming_content)
+    return response
+
+
+def _request(client, url, params):
+    _clear_caches()
+    return _get(client, url, params)
+
+
+def benchmark_view(client, name, params, repeat=3):
+    """Measurements of one view and the budgets it exceeds."""
+    url = reverse(name)
+    _request(client, url, params)  # imports, template loading
+
+    queries = QueryCounter()
+    _clear_caches()
+    with connection.execute_wrapper(queries):
+        response = _get(client, url, params)
+
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        _request(client, url, params)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    try:
+        _request(client, url, params)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    result = {
+        'view': name,
+        'status': response.status_code,
+        'queries': queries.count,
+        'ms': round(best * 1000, 1),
+        'peak_kb': peak // 1024,
+    }
+    max_queries, max_ms, max_kb = VIEW_BUDGETS[name]
+    result['over_budget'] = [
+        measure for measure, value, budget in (
+            ('queries', result['queries'], max_queries),
+            ('ms', result['ms'], max_ms),
+            ('peak_kb', result['peak_kb'], max_kb),
+        )
+        if value > budget
+    ]
+    if response.status_code != 200:
+        result['over_budget'].append('status')
+    return result
+
+
+def run_view_benchmarks(user, views=None, repeat=3):
+    """Results of benchmark_view for the given url names (all by default), logged in as user."""
+    params = scenario()
+    if params is None:
+        return None
+    call_command('createcachetable', verbosity=0)  # a benchmark database may predate migration 0054
+    with override_settings(**BENCHMARK_SETTINGS):
+        client = Client()
+        client.force_login(user)
+        return [benchmark_view(client, name, params[name], repeat) for name in (views or VIEW_BUDGETS)]
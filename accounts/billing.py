@@ -0,0 +1,53 @@
+"""
+Posting retail and wholesale bills.
+
+The bill lines are inserted with one bulk_create and taken out of stock with
+record_movements, so the number of statements inside the sale transaction
+does not grow with the number of lines.
+"""
+from decimal import Decimal
+
+from .inventory import lock_stock, record_movements, stock_quantity
+from .models import Item
+
+
+def post_sale_lines(sales, formset, movement_type, user=None):
+    """
+    Save the detail forms of an already saved sale and deduct their stock
+    from the sale's branch. Call inside the sale transaction.
+
+    Returns (item, quantity needed) for every item the branch did not have
+    enough stock of; the caller decides whether that aborts the sale.
+    """
+    details = []
+    for form in formset:
+        if form.cleaned_data and not form.cleaned_data.get('DELETE'):
+            detail = form.save(commit=False)
+            detail.sales = sales
+            details.append(detail)
+    if not details:
+        return []
+
+    type(details[0]).objects.bulk_create(details)
+
+    items = Item.objects.select_related('category').in_bulk({detail.item_id for detail in details})
+    needed = {}
+    for detail in details:
+        item = items[detail.item_id]
+        needed[item.pk] = needed.get(item.pk, Decimal('0.000')) + stock_quantity(
+            item, detail.qty, detail.net_weight
+        )
+
+    available = lock_stock(needed, sales.branch)
+    shortages = [
+        (items[item_id], quantity)
+        for item_id, quantity in needed.items()
+        if available.get(item_id, Decimal('0.000')) < quantity
+    ]
+
+    record_movements(
+        sales.branch,
+        {item_id: -quantity for item_id, quantity in needed.items()},
+        movement_type, sales.receipt_no, user,
+    )
+    return shortages
@@ -0,0 +1,126 @@
+"""
+In-memory item catalog for the billing screen APIs.
+
+Each process keeps one snapshot per branch: every item with its category
+weight flag and effective retail/wholesale price. A snapshot is tagged with
+the catalog version (see versions.py); saving or deleting a Branch, Item,
+ItemCategory or ItemBranchPrice replaces the version (see signals.py), and
+the next lookup rebuilds the snapshot with two queries. Lookups between
+changes read only memory: other worker processes see the new version
+within VERSION_CHECK_INTERVAL.
+"""
+import threading
+import time
+
+from .models import Branch, Item, ItemBranchPrice
+from .versions import SharedVersion
+
+SNAPSHOT_MAX_AGE = 300  # safety net should a version change be missed
+
+_version = SharedVersion('catalog:version')
+_snapshots = {}
+_branch_ids = (None, frozenset())  # (version, pks of every branch)
+_lock = threading.Lock()
+
+
+def catalog_version():
+    return _version.get()
+
+
+def invalidate_catalog():
+    _version.replace()
+
+
+def _known_branch(branch_id, version):
+    global _branch_ids
+    if _branch_ids[0] != version:
+        _branch_ids = (version, frozenset(Branch.objects.values_list('pk', flat=True)))
+    return branch_id in _branch_ids[1]
+
+
+class CatalogSnapshot:
+    """Items of one branch as the JSON dicts the billing APIs return."""
+
+    def __init__(self, branch_id, version):
+        self.branch_id = branch_id
+        self.version = version
+        self.built_at = time.monotonic()
+
+        prices = {}
+        if branch_id:
+            prices = {
+                item_id: (retail, wholesale)
+                for item_id, retail, wholesale in ItemBranchPrice.objects
+                .filter(branch_id=branch_id)
+                .values_list('item_id', 'price_per_unit_retail', 'price_per_unit_wholesale')
+            }
+
+        self.items = []
+        self.by_id = {}
+        self.by_code = {}
+        for item in Item.objects.select_related('category').order_by('name', 'id'):
+            retail, wholesale = prices.get(
+                item.id, (item.price_per_unit_retail, item.price_per_unit_wholesale)
+            )
+            entry = {
+                'id': item.id,
+                'name': item.name,
+                'code': item.code,
+                'price': str(retail),
+                'wholesale_price': str(wholesale),
+                'is_weight_based': item.category.is_weight_based,
+            }
+            self.items.append(entry)
+            self.by_id[item.id] = entry
+            self.by_code[item.code] = entry
+
+    @property
+    def etag(self):
+        return f'"catalog-{self.branch_id or 0}-{self.version}"'
+
+    def search(self, q):
+        """Same matching and ranking as the database search: name or code contains q."""
+        q = q.lower()
+        if not q:
+            return list(self.items)
+
+        def rank(entry):
+            code, name = entry['code'].lower(), entry['name'].lower()
+            if code == q:
+                return 0
+            if code.startswith(q):
+                return 1
+            if name.startswith(q):
+                return 2
+            return 3
+
+        matches = [
+            entry for entry in self.items
+            if q in entry['name'].lower() or q in entry['code'].lower()
+        ]
+        return sorted(matches, key=rank)  # stable: keeps name order within a rank
+
+
+def get_catalog(branch_id=None):
+    """Current snapshot for a branch (None or an unknown branch = default item prices)."""
+    branch_id = int(branch_id) if branch_id and str(branch_id).isdigit() else None
+    version = catalog_version()
+    # The search APIs take any branch_id; only real branches get a snapshot of their own
+    if branch_id and not _known_branch(branch_id, version):
+        branch_id = None
+    snapshot = _snapshots.get(branch_id)
+    if (
+        snapshot is None
+        or snapshot.version != version
+        or time.monotonic() - snapshot.built_at > SNAPSHOT_MAX_AGE
+    ):
+        snapshot = CatalogSnapshot(branch_id, version)
+        with _lock:
+            _snapshots[branch_id] = snapshot
+    return snapshot
+
+
+def not_modified(request, snapshot):
+    """True if the client already holds the response for this catalog version."""
+    etags = request.headers.get('If-None-Match', '')
+    return snapshot.etag in [tag.strip() for tag in etags.split(',')]
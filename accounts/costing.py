@@ -0,0 +1,138 @@
+"""
+Costing helpers shared by the stock screens and the reports.
+
+Yield multipliers are loaded for all items in one query and kept in memory
+per process; saving or deleting a YieldPercentage replaces their version
+(see signals.py and versions.py).
+
+LivePriceIndex holds one row per (category, branch, day) with live purchases.
+Purchase add/edit/delete refresh the affected rows under a row lock;
+reports load the rows they need with a single range query and resolve days
+without purchases by carrying the last known price forward.
+"""
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import LivePriceIndex, PurchaseDetail, YieldPercentage
+from .versions import SharedVersion
+
+_version = SharedVersion('costing:yield_multipliers')
+_multipliers = (None, {})  # (version, map)
+
+
+def get_multiplier_map():
+    """item_id → yield multiplier for every item that has a yield record."""
+    global _multipliers
+    version = _version.get()
+    if _multipliers[0] != version:
+        multipliers = {}
+        rows = YieldPercentage.objects.order_by('id').values_list('item_id', 'multipler')
+        for item_id, multipler in rows:
+            # Mirror item.yieldpercentage_set.first(): the oldest record wins
+            multipliers.setdefault(item_id, multipler)
+        _multipliers = (version, multipliers)
+    return _multipliers[1]
+
+
+def invalidate_multipliers():
+    _version.replace()
+
+
+def live_price_keys(purchase):
+    """(category_id, branch_id, date) keys touched by a purchase's live items."""
+    category_ids = (
+        purchase.details
+        .filter(item__is_live=True)
+        .values_list('item__category_id', flat=True)
+        .distinct()
+    )
+    return {(category_id, purchase.branch_id, purchase.purchase_date) for category_id in category_ids}
+
+
+def _locked_index_row(category_id, branch_id, day):
+    """
+    The index row for a key, created if missing and locked until commit.
+    A second purchase refreshing the same key waits here until the first one
+    commits, so its totals below include the other purchase's details.
+    """
+    key = {'category_id': category_id, 'branch_id': branch_id, 'date': day}
+    while True:
+        LivePriceIndex.objects.bulk_create([LivePriceIndex(**key)], ignore_conflicts=True)
+        row = LivePriceIndex.objects.select_for_update().filter(**key).first()
+        if row is not None:  # None if a concurrent refresh deleted it meanwhile
+            return row
+
+
+def refresh_live_prices(keys):
+    """Recompute the index rows for the given (category_id, branch_id, date) keys."""
+    with transaction.atomic():
+        # Lock in a fixed order so two purchases touching the same keys can't deadlock
+        for category_id, branch_id, day in sorted(keys):
+            row = _locked_index_row(category_id, branch_id, day)
+            totals = PurchaseDetail.objects.filter(
+                item__is_live=True,
+                item__category_id=category_id,
+                purchase__branch_id=branch_id,
+                purchase__purchase_date=day,
+                purchase__delete_status=False,
+            ).aggregate(cost=Sum('total_amount'), weight=Sum('net_weight'))
+
+            if totals['weight'] is None:
+                row.delete()
+                continue
+
+            row.total_cost = totals['cost'] or Decimal('0.000')
+            row.total_weight = totals['weight'] or Decimal('0.000')
+            row.price_per_kg = (
+                (row.total_cost / row.total_weight).quantize(Decimal('0.001'))
+                if row.total_weight > 0 else Decimal('0.000')
+            )
+            row.save(update_fields=['total_cost', 'total_weight', 'price_per_kg', 'updated_at'])
+
+
+class LivePriceLookup:
+    """
+    Live price per kg for any (category, day, branch) between from_date and to_date.
+    Days without a live purchase use the most recent earlier price.
+    """
+
+    def __init__(self, from_date, to_date, branch=None):
+        # Latest index date before the range for the same (category, branch),
+        # so the first days of the range can carry that price forward.
+        anchor = (
+            LivePriceIndex.objects
+            .filter(category=OuterRef('category'), branch=OuterRef('branch'), date__lt=from_date)
+            .order_by('-date')
+            .values('date')[:1]
+        )
+        rows = (
+            LivePriceIndex.objects
+            .filter(date__lte=to_date)
+            .annotate(anchor=Coalesce(Subquery(anchor), Value(from_date)))
+            .filter(date__gte=F('anchor'))
+        )
+        if branch:
+            rows = rows.filter(branch=branch)
+
+        self._dates = {}
+        self._prices = {}
+        for category_id, branch_id, day, price in rows.order_by('date').values_list(
+            'category_id', 'branch_id', 'date', 'price_per_kg'
+        ):
+            key = (category_id, branch_id)
+            self._dates.setdefault(key, []).append(day)
+            self._prices.setdefault(key, []).append(price)
+
+    def get(self, category_id, sales_date, branch_id):
+        key = (category_id, branch_id)
+        dates = self._dates.get(key)
+        if not dates:
+            return Decimal('0.000')
+        pos = bisect_right(dates, sales_date)
+        if pos == 0:
+            return Decimal('0.000')
+        return self._prices[key][pos - 1]
@@ -0,0 +1,218 @@
+"""
+Background PDF exports of reports.
+
+A report view decorated with pdf_export does not render ?export=pdf in the
+request: it records an ExportJob and sends the user to the job's status
+page. The run_export_worker command renders pending jobs in a process pool
+by calling the same view for the job's user and parameters.
+
+Rendered PDFs are stored on disk under the sha256 of (report, parameters,
+user scope, data version). Saving or deleting any document a report reads
+replaces the data version (see signals.py); until then, asking for the same
+export again is answered from the stored file without rendering. The data
+version, like the summary and catalog caches the reports read, lives in the
+shared database cache, so the worker processes see every change made
+through the web processes.
+
+The worker also purges files past EXPORT_MAX_AGE, which are never served
+again, and finished jobs older than EXPORT_JOB_RETENTION.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from datetime import timedelta
+from functools import wraps
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpRequest, QueryDict
+from django.shortcuts import redirect
+from django.utils import timezone
+
+from .models import ExportJob
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'exports:version'
+EXPORT_MAX_AGE = 24 * 60 * 60  # seconds a stored file is reused and kept
+EXPORT_JOB_RETENTION = timedelta(days=7)
+STALE_JOB_AFTER = timedelta(minutes=15)
+
+_report_views = {}
+
+
+class ExportError(Exception):
+    pass
+
+
+# ── Stored files ─────────────────────────────────────
+
+def export_dir():
+    return Path(getattr(settings, 'PDF_EXPORT_DIR', Path(settings.BASE_DIR) / 'exports'))
+
+
+def export_path(cache_key):
+    return export_dir() / cache_key[:2] / f'{cache_key}.pdf'
+
+
+def stored_export(cache_key):
+    """Path of a stored export still young enough to serve, or None."""
+    path = export_path(cache_key)
+    try:
+        if time.time() - path.stat().st_mtime < EXPORT_MAX_AGE:
+            return path
+    except FileNotFoundError:
+        pass
+    return None
+
+
+def _store(cache_key, content):
+    path = export_path(cache_key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix(f'.{os.getpid()}.part')
+    partial.write_bytes(content)
+    os.replace(partial, path)  # readers never see half a file
+
+
+def purge_exports():
+    """Delete stored files past EXPORT_MAX_AGE and finished jobs past EXPORT_JOB_RETENTION."""
+    cutoff = time.time() - EXPORT_MAX_AGE
+    files = 0
+    for path in export_dir().glob('*/*'):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                files += 1
+        except FileNotFoundError:
+            pass  # removed by another worker
+    jobs, _ = ExportJob.objects.filter(
+        status__in=[ExportJob.DONE, ExportJob.FAILED],
+        created_at__lt=timezone.now() - EXPORT_JOB_RETENTION,
+    ).delete()
+    return files, jobs
+
+
+# ── Data version ─────────────────────────────────────
+
+def data_version():
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_CACHE_KEY)
+    return version
+
+
+def invalidate_exports():
+    cache.delete(VERSION_CACHE_KEY)
+    # A request may enqueue against the old rows before this transaction commits
+    transaction.on_commit(lambda: cache.delete(VERSION_CACHE_KEY))
+
+
+def export_key(report, params, user):
+    """Content address of an export: what is rendered, for whom, from which data."""
+    material = json.dumps(
+        [report, params, user.role, user.branch_id, data_version()],
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+# ── Requests ─────────────────────────────────────────
+
+def pdf_export(view):
+    """Queue ?export=pdf of a report view instead of rendering it in the request."""
+    _report_views[view.__name__] = view
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.GET.get('export') == 'pdf' and not getattr(request, 'export_job', None):
+            job = enqueue_export(request.user, view.__name__, request.GET)
+            return redirect('export_status', pk=job.pk)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def enqueue_export(user, report, query):
+    """ExportJob for a report; already done if the same export is stored."""
+    params = {key: value for key, value in query.items() if key != 'export'}
+    job = ExportJob(user=user, report=report, params=params, cache_key=export_key(report, params, user))
+    if stored_export(job.cache_key):
+        job.status = ExportJob.DONE
+        job.finished_at = timezone.now()
+        job.filename = (
+            ExportJob.objects
+            .filter(cache_key=job.cache_key, status=ExportJob.DONE)
+            .exclude(filename='')
+            .values_list('filename', flat=True)
+            .first()
+        ) or f'{report}.pdf'
+    job.save()
+    return job
+
+
+# ── Worker side ──────────────────────────────────────
+
+def requeue_stale_jobs():
+    """Jobs left running by a worker that died go back to the queue."""
+    return ExportJob.objects.filter(
+        status=ExportJob.RUNNING,
+        started_at__lt=timezone.now() - STALE_JOB_AFTER,
+    ).update(status=ExportJob.PENDING, started_at=None)
+
+
+def claim_jobs(limit):
+    """Move up to limit pending jobs to running; safe with several workers."""
+    claimed = []
+    pending = ExportJob.objects.filter(status=ExportJob.PENDING).order_by('created_at', 'id')
+    for pk in pending.values_list('pk', flat=True)[:limit]:
+        if ExportJob.objects.filter(pk=pk, status=ExportJob.PENDING).update(
+            status=ExportJob.RUNNING, started_at=timezone.now()
+        ):
+            claimed.append(pk)
+    return claimed
+
+
+def _render(job):
+    from . import views  # noqa: F401  (registers the report views)
+
+    view = _report_views.get(job.report)
+    if view is None:
+        raise ExportError(f'Unknown report {job.report!r}')
+
+    request = HttpRequest()
+    request.method = 'GET'
+    request.GET = QueryDict(mutable=True)
+    request.GET.update(job.params)
+    request.GET['export'] = 'pdf'
+    request.user = job.user
+    request.export_job = job
+    request._messages = CookieStorage(request)
+
+    response = view(request)
+    if response.status_code != 200 or response.get('Content-Type') != 'application/pdf':
+        raise ExportError(f'{job.report} answered {response.status_code} instead of a PDF')
+    filename = re.search(r'filename="([^"]+)"', response.get('Content-Disposition', ''))
+    return response.content, filename.group(1) if filename else f'{job.report}.pdf'
+
+
+def run_export_job(job_id):
+    """Render one claimed job and store its PDF. Returns the final status."""
+    job = ExportJob.objects.select_related('user').get(pk=job_id)
+    try:
+        content, job.filename = _render(job)
+        _store(job.cache_key, content)
+        job.status = ExportJob.DONE
+    except Exception as exc:
+        logger.exception('Export job %s failed', job.pk)
+        job.status = ExportJob.FAILED
+        job.error = str(exc)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['filename', 'status', 'error', 'finished_at'])
+    return job.status
@@ -931,8 +931,8 @@ class WholesaleSalesForm(forms.ModelForm):
         fields = ['receipt_no', 'sales_date', 'branch', 'tax_amount','discount','total', 'grand_total', 'payment_mode', 'paid_amount','pending_balance']
 
     receipt_no = forms.CharField(
-        widget=forms.TextInput(attrs={'class': 'form-control', 'autocomplete': 'off'}),
-        required=True
+        widget=forms.TextInput(attrs={'class': 'form-control', 'autocomplete': 'off', 'placeholder': 'Leave blank for next number'}),
+        required=False
     )
     sales_date = forms.DateField(
         widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control', 'autocomplete': 'off'})
@@ -1141,8 +1141,8 @@ class AttendanceInlineForm(forms.ModelForm):
     
 class WholesalePaymentForm(forms.ModelForm):
     receipt_no = forms.CharField(
-        widget=forms.TextInput(attrs={'class': 'form-control', 'autocomplete': 'off'}),
-        required=True
+        widget=forms.TextInput(attrs={'class': 'form-control', 'autocomplete': 'off', 'placeholder': 'Leave blank for next number'}),
+        required=False
     )
     customer = forms.ModelChoiceField(
         queryset=Customer.objects.filter(whole_sale=True, delete_status=False),
@@ -0,0 +1,144 @@
+"""
+Per-branch running stock.
+
+Every stock change is written as a signed StockMovement row and applied to
+the matching StockBalance row with an F() increment, so concurrent billing
+counters never overwrite each other's updates. Item.stock is kept as the
+all-branch total the same way.
+
+record_movements applies a whole bill at once: one INSERT for the movements
+and one UPDATE ... CASE per table, after locking the touched rows in item id
+order so two counters posting overlapping bills cannot deadlock.
+"""
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, Value, When
+
+from .models import Item, StockBalance, StockMovement
+
+
+def stock_quantity(item, qty, net_weight):
+    """Quantity that moves stock: weight for weight-based items, else count."""
+    if item.category.is_weight_based:
+        return Decimal(net_weight or 0)
+    return Decimal(qty or 0)
+
+
+def record_movement(item, branch, quantity, movement_type, reference='', user=None):
+    """Append a movement and apply it to the running balance. Call inside a transaction."""
+    quantity = Decimal(quantity or 0)
+    if not quantity:
+        return None
+
+    movement = StockMovement.objects.create(
+        item=item,
+        branch=branch,
+        quantity=quantity,
+        movement_type=movement_type,
+        reference=reference or '',
+        created_by=user,
+    )
+
+    updated = StockBalance.objects.filter(item=item, branch=branch).update(
+        quantity=F('quantity') + quantity
+    )
+    if not updated:
+        StockBalance.objects.get_or_create(item=item, branch=branch)
+        StockBalance.objects.filter(item=item, branch=branch).update(
+            quantity=F('quantity') + quantity
+        )
+
+    Item.objects.filter(pk=item.pk).update(stock=F('stock') + quantity)
+    return movement
+
+
+def get_stock(item, branch):
+    """Current stock of an item in a branch."""
+    balance = (
+        StockBalance.objects
+        .filter(item=item, branch=branch)
+        .values_list('quantity', flat=True)
+        .first()
+    )
+    return balance if balance is not None else Decimal('0.000')
+
+
+def get_stock_map(item_ids, branch):
+    """item_id → current stock in a branch, in one query."""
+    rows = (
+        StockBalance.objects
+        .filter(item_id__in=item_ids, branch=branch)
+        .values_list('item_id', 'quantity')
+    )
+    return dict(rows)
+
+
+def _case_increment(field, key, quantities, output_field):
+    """F(field) + CASE key WHEN item_id THEN quantity ... END"""
+    return F(field) + Case(
+        *[When(**{key: item_id}, then=Value(quantity)) for item_id, quantity in quantities.items()],
+        default=Value(Decimal('0.000')),
+        output_field=output_field,
+    )
+
+
+def lock_stock(item_ids, branch):
+    """
+    Lock the items and their balance rows in a branch (in item id order) and
+    return item_id → current stock. Call inside a transaction.
+    """
+    item_ids = sorted(set(item_ids))
+    list(Item.objects.select_for_update().filter(pk__in=item_ids).order_by('pk').values_list('pk', flat=True))
+
+    existing = set(
+        StockBalance.objects.filter(item_id__in=item_ids, branch=branch).values_list('item_id', flat=True)
+    )
+    missing = [item_id for item_id in item_ids if item_id not in existing]
+    if missing:
+        StockBalance.objects.bulk_create(
+            [StockBalance(item_id=item_id, branch=branch) for item_id in missing],
+            ignore_conflicts=True,
+        )
+
+    rows = (
+        StockBalance.objects
+        .select_for_update()
+        .filter(item_id__in=item_ids, branch=branch)
+        .order_by('item_id')
+        .values_list('item_id', 'quantity')
+    )
+    return dict(rows)
+
+
+def record_movements(branch, quantities, movement_type, reference='', user=None):
+    """
+    Apply several movements in one go. quantities: item_id → signed quantity.
+    The rows should already be locked with lock_stock.
+    """
+    quantities = {
+        item_id: Decimal(quantity or 0)
+        for item_id, quantity in sorted(quantities.items())
+        if quantity
+    }
+    if not quantities:
+        return []
+
+    movements = StockMovement.objects.bulk_create([
+        StockMovement(
+            item_id=item_id,
+            branch=branch,
+            quantity=quantity,
+            movement_type=movement_type,
+            reference=reference or '',
+            created_by=user,
+        )
+        for item_id, quantity in quantities.items()
+    ])
+
+    StockBalance.objects.filter(item_id__in=quantities, branch=branch).update(
+        quantity=_case_increment('quantity', 'item_id', quantities, DecimalField(max_digits=12, decimal_places=3))
+    )
+    Item.objects.filter(pk__in=quantities).update(
+        stock=_case_increment('stock', 'pk', quantities, DecimalField(max_digits=10, decimal_places=2))
+    )
+    return movements
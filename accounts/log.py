@@ -0,0 +1,87 @@
+"""
+Structured logging for the shop, configured through LOGGING in settings.
+
+JsonFormatter writes every record as one JSON object. Fields passed as
+extra={'data': {...}} are added to it, so debug output such as the lines of
+a purchase stays one searchable record instead of a block of prints.
+
+SampleFilter passes only a fraction of the records at or below a level, so
+a chatty debug logger switched on in production does not flood the log.
+Records that carry a sample key in their data (the invoice of a purchase)
+are kept or dropped by a hash of that key, so all the records of one
+purchase are sampled together, in every process.
+QueueStreamHandler hands formatted records to a background thread that
+writes them to the stream, which keeps console I/O off the request path.
+
+Views guard expensive debug data with logger.isEnabledFor(logging.DEBUG),
+so while a logger is above DEBUG its debug calls cost one level check.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import zlib
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        data = getattr(record, 'data', None)
+        if isinstance(data, dict):
+            entry.update(data)
+        # Other extra= keys are kept as well
+        entry.update({
+            key: value for key, value in vars(record).items()
+            if key not in _RESERVED and key != 'data' and key not in entry
+        })
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SampleFilter(logging.Filter):
+    """
+    Pass `rate` (0..1) of the records at or below max_level; higher levels always pass.
+    Records whose data has `key` are decided by that value, the rest one by one.
+    """
+
+    def __init__(self, rate=1.0, max_level='DEBUG', key='invoice'):
+        super().__init__()
+        self.rate = float(rate)
+        self.max_level = max_level if isinstance(max_level, int) else logging.getLevelName(max_level)
+        self.key = key
+
+    def filter(self, record):
+        if record.levelno > self.max_level:
+            return True
+        data = getattr(record, 'data', None)
+        if isinstance(data, dict) and data.get(self.key) is not None:
+            # crc32 rather than hash(): the same decision in every process
+            return zlib.crc32(str(data[self.key]).encode()) / 2**32 < self.rate
+        return random.random() < self.rate
+
+
+class QueueStreamHandler(QueueHandler):
+    """Formats on the calling thread; a listener thread writes the lines to the stream."""
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        target = logging.StreamHandler(stream or sys.stderr)
+        self.listener = QueueListener(self.queue, target)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+        # A forked worker (gunicorn --preload) does not inherit the writer thread
+        os.register_at_fork(after_in_child=self.listener.start)
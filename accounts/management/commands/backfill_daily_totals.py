@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from accounts.rollups import rebuild_daily_totals
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily branch totals used by the dashboard from purchases and sales."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='from_date', help="First day to rebuild (YYYY-MM-DD).")
+        parser.add_argument('--to', dest='to_date', help="Last day to rebuild (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        try:
+            from_date = datetime.strptime(options['from_date'], '%Y-%m-%d').date() if options['from_date'] else None
+            to_date = datetime.strptime(options['to_date'], '%Y-%m-%d').date() if options['to_date'] else None
+        except ValueError:
+            raise CommandError("Dates must be in YYYY-MM-DD format.")
+
+        with transaction.atomic():
+            count = rebuild_daily_totals(from_date, to_date)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} daily branch total rows."))
@@ -0,0 +1,141 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max, Sum
+
+from accounts.models import (
+    Expense, Purchase, PurchaseDetail, RetailSales, RetailSalesDetails, Supplierpay,
+    WholesalePayment, WholesaleSales, WholesaleSalesDetails,
+)
+
+# Models whose Meta.indexes hold the report access-path indexes (migration 0052)
+INDEXED_MODELS = (
+    RetailSales, RetailSalesDetails, WholesaleSales, WholesaleSalesDetails, WholesalePayment,
+    Purchase, PurchaseDetail, Expense, Supplierpay,
+)
+
+
+class _Rollback(Exception):
+    pass
+
+
+def report_queries(branch, customer, item, supplier, from_date, to_date):
+    """(label, queryset) pairs shaped like the queries of the list and report views."""
+    period = {'delete_status': False, 'branch': branch}
+    return [
+        ('retail list page', RetailSales.objects.filter(
+            sales_date__range=(from_date, to_date), **period).order_by('-sales_date', '-id')[:100]),
+        ('retail credit page', RetailSales.objects.filter(
+            pending_amount__gt=0, **period).order_by('-sales_date', '-id')[:25]),
+        ('retail day totals', RetailSales.objects.filter(
+            sales_date=to_date, **period).values('branch').annotate(total=Sum('grand_total'))),
+        ('retail item report', RetailSalesDetails.objects.filter(
+            item=item, sales__delete_status=False, sales__sales_date__range=(from_date, to_date),
+        ).values('item').annotate(qty=Sum('qty'), net_weight=Sum('net_weight'))),
+        ('wholesale list', WholesaleSales.objects.filter(
+            sales_date__range=(from_date, to_date), **period).order_by('-sales_date')),
+        ('wholesale ledger', WholesaleSales.objects.filter(
+            customer=customer, delete_status=False, sales_date__lte=to_date).order_by('sales_date')),
+        ('wholesale item report', WholesaleSalesDetails.objects.filter(
+            item=item, sales__delete_status=False, sales__sales_date__range=(from_date, to_date),
+        ).values('item').annotate(qty=Sum('qty'), total=Sum('total_amount'))),
+        ('wholesale payments', WholesalePayment.objects.filter(
+            payment_date__range=(from_date, to_date), **period)),
+        ('customer payments', WholesalePayment.objects.filter(
+            customer=customer, delete_status=False, payment_date__lte=to_date)),
+        ('purchase list', Purchase.objects.filter(
+            purchase_date__range=(from_date, to_date), **period).order_by('-purchase_date')),
+        ('purchase item totals', PurchaseDetail.objects.filter(
+            item=item, purchase__delete_status=False, purchase__purchase_date__range=(from_date, to_date),
+        ).values('item').annotate(qty=Sum('qty'), total=Sum('total_amount'))),
+        ('expense list', Expense.objects.filter(
+            payment_date__range=(from_date, to_date), **period).order_by('-payment_date')),
+        ('supplier payments', Supplierpay.objects.filter(
+            payment_date__range=(from_date, to_date), **period).order_by('-payment_date')),
+        ('supplier paid total', Supplierpay.objects.filter(
+            supplier=supplier, delete_status=False).values('supplier').annotate(total=Sum('amount'))),
+    ]
+
+
+def measure(queries, repeat):
+    """{label: (best time in seconds, query plan)} of the queries as the database stands."""
+    results = {}
+    for label, queryset in queries:
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset.all())  # a fresh clone, so nothing comes from the result cache
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        results[label] = (best, queryset.explain())
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        "Show query plans and timings of the report and list queries, with and without the "
+        "report indexes. Run it against a seeded database (see seed_shop)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=31, help="Report period, ending on the latest sale.")
+        parser.add_argument('--repeat', type=int, default=5, help="Runs timed per query.")
+        parser.add_argument('--plans', action='store_true', help="Print the query plans.")
+        parser.add_argument(
+            '--compare', action='store_true',
+            help="Also time every query with the report indexes dropped (inside a rolled-back transaction).",
+        )
+
+    def handle(self, *args, **options):
+        latest = RetailSales.objects.filter(delete_status=False).aggregate(day=Max('sales_date'))['day']
+        sale = RetailSales.objects.filter(delete_status=False, sales_date=latest).first()
+        wholesale = WholesaleSales.objects.filter(delete_status=False).first()
+        detail = RetailSalesDetails.objects.first()
+        payment = Supplierpay.objects.filter(delete_status=False).first()
+        if not (sale and wholesale and detail and payment):
+            raise CommandError("No sales, purchases and payments to query; seed the database first.")
+
+        to_date = latest
+        from_date = to_date - timedelta(days=options['days'] - 1)
+        queries = report_queries(sale.branch, wholesale.customer, detail.item, payment.supplier, from_date, to_date)
+        repeat = options['repeat']
+
+        self.stdout.write(
+            f"{connection.vendor}, {RetailSales.objects.count()} retail sales, "
+            f"{from_date} to {to_date}, best of {repeat}"
+        )
+        indexed = measure(queries, repeat)
+        unindexed = self._without_indexes(queries, repeat) if options['compare'] else {}
+
+        self.stdout.write(f"  {'query':<22} {'indexed':>11}" + (f" {'no index':>11} {'speedup':>8}" if unindexed else ''))
+        for label, queryset in queries:
+            seconds, plan = indexed[label]
+            line = f"  {label:<22} {seconds * 1000:8.2f} ms"
+            if unindexed:
+                line += f" {unindexed[label][0] * 1000:8.2f} ms {unindexed[label][0] / max(seconds, 1e-9):7.1f}x"
+            self.stdout.write(line)
+            if options['plans']:
+                self._write_plan('indexed', plan)
+                if unindexed:
+                    self._write_plan('no index', unindexed[label][1])
+
+    def _write_plan(self, title, plan):
+        self.stdout.write(f"    {title}:")
+        for plan_line in plan.splitlines():
+            self.stdout.write(f"      {plan_line}")
+
+    def _without_indexes(self, queries, repeat):
+        results = {}
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                # DROP INDEX is transactional on PostgreSQL and SQLite
+                for model in INDEXED_MODELS:
+                    for index in model._meta.indexes:
+                        cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+                results = measure(queries, repeat)
+                raise _Rollback
+        except _Rollback:
+            pass
+        return results
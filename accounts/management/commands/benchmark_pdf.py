@@ -0,0 +1,88 @@
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from xhtml2pdf import pisa
+
+from accounts.pdf import LOGO_PATH, html_to_pdf, render_to_pdf
+
+
+def ledger_context(rows):
+    """Customer ledger PDF context with the given number of transactions (no database)."""
+    start = date.today() - timedelta(days=rows)
+    balance = Decimal('0.00')
+    ledger_rows = [{
+        'date': start, 'type': '', 'particular': 'Opening Balance', 'receipt_no': '',
+        'debit': '', 'credit': '', 'balance': balance,
+    }]
+    for n in range(rows):
+        sale = n % 3 != 2
+        amount = Decimal('1250.50') if sale else Decimal('900.00')
+        balance += amount if sale else -amount
+        ledger_rows.append({
+            'date': start + timedelta(days=n),
+            'type': 'To' if sale else 'By',
+            'particular': 'Sales' if sale else 'Cash',
+            'receipt_no': f'WS-{n + 1:05d}' if sale else f'WP-{n + 1:05d}',
+            'debit': amount if sale else Decimal('0.00'),
+            'credit': Decimal('0.00') if sale else amount,
+            'balance': balance,
+        })
+    return {
+        'ledger_rows': ledger_rows,
+        'from_date': start,
+        'to_date': date.today(),
+        'total_debit': sum((r['debit'] for r in ledger_rows if r['debit']), Decimal('0.00')),
+        'total_credit': sum((r['credit'] for r in ledger_rows if r['credit']), Decimal('0.00')),
+        'closing_balance': balance,
+        'logo_path': LOGO_PATH,
+    }
+
+
+def old_pdf(html):
+    """The previous render_to_pdf: logo opened from disk by xhtml2pdf, streams ASCII85-encoded."""
+    result = BytesIO()
+    pisa.CreatePDF(html, dest=result)  # reportlab's default useA85 = 1
+    return result.getvalue()
+
+
+# Both modes render the template the same way (render_to_string, cached loader)
+MODES = {
+    'old': old_pdf,
+    'current': html_to_pdf,
+}
+
+
+class Command(BaseCommand):
+    help = "Time PDF exports of a long customer ledger on the previous render path and the current one."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help="Ledger transactions.")
+        parser.add_argument('--repeat', type=int, default=3, help="Exports timed per mode.")
+        parser.add_argument('--template', default='customer_ledger_pdf.html')
+
+    def handle(self, *args, **options):
+        template_src = options['template']
+        context = ledger_context(options['rows'])
+        render_to_pdf(template_src, context)  # template and logo loading stay outside the timings
+
+        self.stdout.write(f"{template_src}, {options['rows']} rows, best of {options['repeat']}")
+        self.stdout.write(f"  {'mode':<9} {'template':>11} {'pdf':>11} {'total':>11} {'size':>10}")
+        for label, make_pdf in MODES.items():
+            best = None
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                html = render_to_string(template_src, context)
+                rendered = time.perf_counter()
+                pdf = make_pdf(html)
+                finished = time.perf_counter()
+                timing = (rendered - started, finished - rendered, finished - started, len(pdf or b''))
+                if best is None or timing[2] < best[2]:
+                    best = timing
+            self.stdout.write(
+                f"  {label:<9}" + ''.join(f" {seconds * 1000:8.1f} ms" for seconds in best[:3])
+                + f" {best[3] // 1024:7d} KB"
+            )
@@ -0,0 +1,79 @@
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from accounts.benchmarks import VIEW_BUDGETS, run_view_benchmarks
+from accounts.models import CustomUser, RetailSales
+
+DEFAULT_HISTORY = Path(settings.BASE_DIR) / 'benchmarks' / 'views.jsonl'
+
+
+def last_run(history):
+    """{view: result} of the latest run in the history file, or {}."""
+    if not history.exists():
+        return {}
+    with open(history, encoding='utf-8') as f:
+        lines = [line for line in f if line.strip()]
+    return {result['view']: result for result in json.loads(lines[-1])['results']} if lines else {}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the heavy views through the test client against the current (seeded) database, "
+        "fail when a view exceeds its query, time or memory budget and append the run to a JSON history."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('views', nargs='*', help=f"URL names to run (default: {', '.join(VIEW_BUDGETS)}).")
+        parser.add_argument('--user', default='seed_shop', help="Username to request the views as (a super_admin).")
+        parser.add_argument('--repeat', type=int, default=3, help="Timed requests per view.")
+        parser.add_argument('--history', default=str(DEFAULT_HISTORY), help="JSON lines file the run is appended to.")
+        parser.add_argument('--no-history', action='store_true', help="Do not record this run.")
+
+    def handle(self, *args, **options):
+        unknown = set(options['views']) - set(VIEW_BUDGETS)
+        if unknown:
+            raise CommandError(f"Unknown view(s): {', '.join(sorted(unknown))}.")
+        user = (
+            CustomUser.objects.filter(username=options['user']).first()
+            or CustomUser.objects.filter(role='super_admin', is_active=True).order_by('pk').first()
+        )
+        if user is None:
+            raise CommandError("No super_admin user to request the views as.")
+
+        history = Path(options['history'])
+        previous = last_run(history)
+        results = run_view_benchmarks(user, options['views'], max(options['repeat'], 1))
+        if results is None:
+            raise CommandError("No retail sales to report on; seed the database first (seed_shop).")
+
+        self.stdout.write(f"  {'view':<24} {'status':>6} {'queries':>8} {'time':>11} {'peak':>10} {'was':>11}")
+        for result in results:
+            before = previous.get(result['view'])
+            self.stdout.write(
+                f"  {result['view']:<24} {result['status']:>6} {result['queries']:>8} "
+                f"{result['ms']:>8.1f} ms {result['peak_kb']:>7} KB "
+                + (f"{before['ms']:>8.1f} ms" if before else f"{'-':>11}")
+                + (f"  over budget: {', '.join(result['over_budget'])}" if result['over_budget'] else '')
+            )
+
+        if not options['no_history']:
+            os.makedirs(history.parent, exist_ok=True)
+            with open(history, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({
+                    'at': datetime.now().isoformat(timespec='seconds'),
+                    'database': connection.vendor,
+                    'retail_sales': RetailSales.objects.count(),
+                    'repeat': options['repeat'],
+                    'results': results,
+                }) + '\n')
+
+        over = [result['view'] for result in results if result['over_budget']]
+        if over:
+            raise CommandError(f"Over budget: {', '.join(over)}.")
+        self.stdout.write(self.style.SUCCESS(f"All {len(results)} views within budget."))
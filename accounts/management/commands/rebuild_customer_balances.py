@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from accounts.balances import find_balance_mismatches, rebuild_customer_balances
+
+
+class Command(BaseCommand):
+    help = "Rebuild wholesale customer balances from sales and payment history."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help="Only compare stored balances with history; exit with an error on mismatch.",
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            mismatches = find_balance_mismatches()
+            for customer_id, stored, expected in mismatches:
+                self.stdout.write(
+                    f"Customer {customer_id}: stored sales/paid {stored[0]}/{stored[1]}, "
+                    f"expected {expected[0]}/{expected[1]}"
+                )
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} customer balance(s) out of sync.")
+            self.stdout.write(self.style.SUCCESS("All customer balances match history."))
+            return
+
+        with transaction.atomic():
+            count = rebuild_customer_balances()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt balances for {count} customers."))
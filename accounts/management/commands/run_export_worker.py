@@ -0,0 +1,61 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from accounts.exports import claim_jobs, purge_exports, requeue_stale_jobs, run_export_job
+from accounts.models import ExportJob
+
+PURGE_EVERY = 60 * 60  # seconds
+
+
+def _start_process():
+    # Spawned processes start without Django; forked ones must not reuse the parent's connections
+    django.setup()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Render queued report PDF exports in a pool of worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=min(os.cpu_count() or 1, 4),
+            help="Worker processes (0 renders in this process).",
+        )
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is empty.")
+        parser.add_argument('--poll', type=float, default=2.0, help="Seconds between queue checks.")
+
+    def handle(self, *args, **options):
+        processes = max(options['processes'], 0)
+        pool = ProcessPoolExecutor(processes, initializer=_start_process) if processes else None
+        purged_at = None
+        try:
+            while True:
+                if purged_at is None or time.monotonic() - purged_at > PURGE_EVERY:
+                    files, jobs = purge_exports()
+                    purged_at = time.monotonic()
+                    if files or jobs:
+                        self.stdout.write(f"Purged {files} expired export file(s) and {jobs} old job(s).")
+                requeue_stale_jobs()
+                jobs = claim_jobs(max(processes, 1) * 2)
+                if jobs:
+                    if pool:
+                        connections.close_all()  # before the pool forks new processes
+                        statuses = list(pool.map(run_export_job, jobs))
+                    else:
+                        statuses = [run_export_job(pk) for pk in jobs]
+                    failed = statuses.count(ExportJob.FAILED)
+                    self.stdout.write(f"Rendered {len(jobs) - failed} export(s), {failed} failed.")
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['poll'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pool:
+                pool.shutdown()
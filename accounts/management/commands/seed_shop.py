@@ -0,0 +1,56 @@
+import time
+from datetime import date, datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.seed import MAX_SEED, seed_shop
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with synthetic branches, items, purchases, sales, payments and "
+        "expenses for load tests. The same arguments (including --end) give the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help="Days of documents per branch.")
+        parser.add_argument('--branches', type=int, default=2, help="New branches to create.")
+        parser.add_argument('--bills', type=int, default=40, help="Retail bills per branch per day (±30%%).")
+        parser.add_argument('--seed', type=int, default=1, help=f"Random seed, 0 to {MAX_SEED}.")
+        parser.add_argument('--end', dest='end_date', help="Last day (YYYY-MM-DD); defaults to today.")
+        parser.add_argument('--suppliers', type=int, default=8)
+        parser.add_argument('--customers', type=int, default=200, help="Named retail customers.")
+        parser.add_argument('--wholesale-customers', type=int, default=25)
+        parser.add_argument('--batch-days', type=int, default=7, help="Days written per transaction.")
+
+    def handle(self, *args, **options):
+        try:
+            end_date = datetime.strptime(options['end_date'], '%Y-%m-%d').date() if options['end_date'] else date.today()
+        except ValueError:
+            raise CommandError("Dates must be in YYYY-MM-DD format.")
+        if not 0 <= options['seed'] <= MAX_SEED:
+            raise CommandError(f"--seed must be between 0 and {MAX_SEED}.")
+        if min(options['days'], options['branches'], options['suppliers'],
+               options['customers'], options['wholesale_customers'], options['batch_days']) < 1:
+            raise CommandError("Counts must be at least 1.")
+
+        started = time.perf_counter()
+
+        def progress(day, counts):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  up to {day}: {counts['RetailSales']} retail sales ({time.perf_counter() - started:.0f}s)")
+
+        counts = seed_shop(
+            end_date, options['days'], options['branches'], options['bills'], seed=options['seed'],
+            suppliers=options['suppliers'], customers=options['customers'],
+            wholesale_customers=options['wholesale_customers'], batch_days=options['batch_days'],
+            progress=progress,
+        )
+        if counts is None:
+            raise CommandError(f"Seed {options['seed']} has already been loaded into this database.")
+
+        for model, count in sorted(counts.items()):
+            self.stdout.write(f"  {model:<22} {count:>10}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {sum(counts.values())} rows in {time.perf_counter() - started:.1f}s."
+        ))
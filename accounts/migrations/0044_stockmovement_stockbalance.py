@@ -0,0 +1,86 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:22
+
+from collections import defaultdict
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_stock_ledger(apps, schema_editor):
+    """Seed one opening movement per (item, branch) from purchase/sales history."""
+    Item = apps.get_model('accounts', 'Item')
+    PurchaseDetail = apps.get_model('accounts', 'PurchaseDetail')
+    RetailSalesDetails = apps.get_model('accounts', 'RetailSalesDetails')
+    WholesaleSalesDetails = apps.get_model('accounts', 'WholesaleSalesDetails')
+    StockMovement = apps.get_model('accounts', 'StockMovement')
+    StockBalance = apps.get_model('accounts', 'StockBalance')
+
+    weight_based = dict(Item.objects.values_list('id', 'category__is_weight_based'))
+    net = defaultdict(Decimal)
+
+    sources = (
+        (PurchaseDetail, 'purchase', 1),
+        (RetailSalesDetails, 'sales', -1),
+        (WholesaleSalesDetails, 'sales', -1),
+    )
+    for model, parent, sign in sources:
+        rows = (
+            model.objects
+            .filter(**{f'{parent}__delete_status': False})
+            .values('item_id', f'{parent}__branch_id')
+            .annotate(weight=Sum('net_weight'), qty=Sum('qty'))
+            .values_list('item_id', f'{parent}__branch_id', 'weight', 'qty')
+        )
+        for item_id, branch_id, weight, qty in rows:
+            quantity = (weight or Decimal('0')) if weight_based.get(item_id) else Decimal(qty or 0)
+            net[(item_id, branch_id)] += sign * quantity
+
+    StockMovement.objects.bulk_create([
+        StockMovement(item_id=item_id, branch_id=branch_id, quantity=quantity,
+                      movement_type='opening', reference='Backfill')
+        for (item_id, branch_id), quantity in net.items()
+    ])
+    StockBalance.objects.bulk_create([
+        StockBalance(item_id=item_id, branch_id=branch_id, quantity=quantity)
+        for (item_id, branch_id), quantity in net.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0043_alter_pettycashbalance_balance_itembranchprice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('movement_type', models.CharField(choices=[('opening', 'Opening'), ('purchase', 'Purchase'), ('purchase_revert', 'Purchase Revert'), ('retail_sale', 'Retail Sale'), ('retail_sale_revert', 'Retail Sale Revert'), ('wholesale_sale', 'Wholesale Sale'), ('wholesale_sale_revert', 'Wholesale Sale Revert')], max_length=30)),
+                ('reference', models.CharField(blank=True, max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.branch')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='accounts.item')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=3, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.branch')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_balances', to='accounts.item')),
+            ],
+            options={
+                'unique_together': {('item', 'branch')},
+            },
+        ),
+        migrations.RunPython(backfill_stock_ledger, migrations.RunPython.noop),
+    ]
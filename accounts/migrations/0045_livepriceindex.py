@@ -0,0 +1,60 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:24
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_live_prices(apps, schema_editor):
+    PurchaseDetail = apps.get_model('accounts', 'PurchaseDetail')
+    LivePriceIndex = apps.get_model('accounts', 'LivePriceIndex')
+
+    rows = (
+        PurchaseDetail.objects
+        .filter(item__is_live=True, purchase__delete_status=False)
+        .values('item__category_id', 'purchase__branch_id', 'purchase__purchase_date')
+        .annotate(cost=Sum('total_amount'), weight=Sum('net_weight'))
+    )
+    entries = []
+    for row in rows:
+        cost = row['cost'] or Decimal('0.000')
+        weight = row['weight'] or Decimal('0.000')
+        entries.append(LivePriceIndex(
+            category_id=row['item__category_id'],
+            branch_id=row['purchase__branch_id'],
+            date=row['purchase__purchase_date'],
+            total_cost=cost,
+            total_weight=weight,
+            price_per_kg=(cost / weight).quantize(Decimal('0.001')) if weight > 0 else Decimal('0.000'),
+        ))
+    LivePriceIndex.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0044_stockmovement_stockbalance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LivePriceIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('total_cost', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+                ('total_weight', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+                ('price_per_kg', models.DecimalField(decimal_places=3, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.branch')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.itemcategory')),
+            ],
+            options={
+                'ordering': ['category', 'branch', 'date'],
+                'unique_together': {('category', 'branch', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_live_prices, migrations.RunPython.noop),
+    ]
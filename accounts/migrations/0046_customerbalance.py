@@ -0,0 +1,52 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_customer_balances(apps, schema_editor):
+    Customer = apps.get_model('accounts', 'Customer')
+    WholesaleSales = apps.get_model('accounts', 'WholesaleSales')
+    WholesalePayment = apps.get_model('accounts', 'WholesalePayment')
+    CustomerBalance = apps.get_model('accounts', 'CustomerBalance')
+
+    sales = dict(
+        WholesaleSales.objects.filter(delete_status=False)
+        .values('customer_id').annotate(total=Sum('grand_total'))
+        .values_list('customer_id', 'total')
+    )
+    paid = dict(
+        WholesalePayment.objects.filter(delete_status=False)
+        .values('customer_id').annotate(total=Sum('amount'))
+        .values_list('customer_id', 'total')
+    )
+    CustomerBalance.objects.bulk_create([
+        CustomerBalance(
+            customer_id=customer_id,
+            total_sales=sales.get(customer_id) or 0,
+            total_paid=paid.get(customer_id) or 0,
+        )
+        for customer_id in Customer.objects.values_list('id', flat=True)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0045_livepriceindex'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_sales', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+                ('total_paid', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='balance', to='accounts.customer')),
+            ],
+        ),
+        migrations.RunPython(backfill_customer_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0046_customerbalance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('total_sales', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+                ('total_paid', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('branch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='accounts.branch')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_checkpoints', to='accounts.customer')),
+            ],
+            options={
+                'ordering': ['customer', 'month'],
+                'constraints': [models.UniqueConstraint(fields=('customer', 'branch', 'month'), name='unique_ledger_checkpoint'), models.UniqueConstraint(condition=models.Q(('branch__isnull', True)), fields=('customer', 'month'), name='unique_unassigned_ledger_checkpoint')],
+            },
+        ),
+    ]
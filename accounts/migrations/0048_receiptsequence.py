@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0047_ledgercheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceiptSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=10)),
+                ('document_type', models.CharField(choices=[('retail_sale', 'Retail Sale'), ('wholesale_sale', 'Wholesale Sale'), ('wholesale_payment', 'Wholesale Payment')], max_length=30)),
+                ('last_number', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('prefix', 'document_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# Expressions match what icontains/istartswith compile to on PostgreSQL:
+# UPPER("column"::text) LIKE UPPER(%s)
+TRIGRAM_INDEXES = [
+    ('accounts_item_name_trgm', 'accounts_item', 'name'),
+    ('accounts_item_code_trgm', 'accounts_item', 'code'),
+    ('accounts_customer_name_trgm', 'accounts_customer', 'customer_name'),
+    ('accounts_customer_phone_trgm', 'accounts_customer', 'customer_phone'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return  # plain LIKE scans elsewhere (e.g. SQLite in tests)
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} '
+            f'USING gin (UPPER({column}::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0048_receiptsequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
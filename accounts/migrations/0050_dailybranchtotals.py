@@ -0,0 +1,65 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_daily_totals(apps, schema_editor):
+    DailyBranchTotals = apps.get_model('accounts', 'DailyBranchTotals')
+    sources = (
+        ('Purchase', 'purchase_date', {'purchase_total': Sum('grand_total')}),
+        ('RetailSales', 'sales_date', {
+            'retail_total': Sum('grand_total'),
+            'retail_cash': Sum('total_cash'),
+            'retail_upi': Sum('total_upi'),
+            'retail_card': Sum('total_card'),
+        }),
+        ('WholesaleSales', 'sales_date', {'wholesale_total': Sum('grand_total')}),
+    )
+    totals = {}
+    for model_name, date_field, sums in sources:
+        model = apps.get_model('accounts', model_name)
+        rows = (
+            model.objects.filter(delete_status=False)
+            .values('branch_id', date_field).annotate(**sums).order_by()
+        )
+        for row in rows:
+            day = totals.setdefault((row['branch_id'], row[date_field]), {})
+            for field in sums:
+                day[field] = row[field] or 0
+
+    DailyBranchTotals.objects.bulk_create([
+        DailyBranchTotals(branch_id=branch_id, date=day, **values)
+        for (branch_id, day), values in totals.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0049_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBranchTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('purchase_total', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+                ('retail_total', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+                ('wholesale_total', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+                ('retail_cash', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+                ('retail_upi', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+                ('retail_card', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.branch')),
+            ],
+            options={
+                'ordering': ['date', 'branch'],
+                'unique_together': {('branch', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:52
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class AddIndexConcurrentlyOnPostgres(AddIndexConcurrently):
+    """CREATE INDEX CONCURRENTLY on PostgreSQL, so the report tables stay writable
+    while the indexes build; a plain AddIndex elsewhere (e.g. SQLite in tests)."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            super(AddIndexConcurrently, self).database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            super(AddIndexConcurrently, self).database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+    # CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0051_exportjob'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name='expense',
+            index=models.Index(condition=models.Q(('delete_status', False)), fields=['branch', 'payment_date'], name='expense_branch_date'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='expense',
+            index=models.Index(condition=models.Q(('delete_status', False)), fields=['payment_date'], name='expense_date'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='purchase',
+            index=models.Index(condition=models.Q(('delete_status', False)), fields=['branch', 'purchase_date'], name='purchase_branch_date'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='purchase',
+            index=models.Index(condition=models.Q(('delete_status', False)), fields=['purchase_date'], name='purchase_date'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='purchasedetail',
+            index=models.Index(fields=['item', 'purchase'], name='purchasedetail_item_purchase'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='retailsales',
+            index=models.Index(condition=models.Q(('delete_status', False)), fields=['branch', 'sales_date', 'id'], name='retailsales_branch_date'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='retailsales',
+            index=models.Index(condition=models.Q(('delete_status', False)), fields=['sales_date', 'id'], name='retailsales_date'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='retailsales',
+            index=models.Index(condition=models.Q(('delete_status', False), ('pending_amount__gt', 0)), fields=['branch', 'sales_date'], name='retailsales_credit'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='retailsalesdetails',
+            index=models.Index(fields=['item', 'sales'], name='retaildetail_item_sales'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='supplierpay',
+            index=models.Index(condition=models.Q(('delete_status', False)), fields=['branch', 'payment_date'], name='supplierpay_branch_date'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='supplierpay',
+            index=models.Index(condition=models.Q(('delete_status', False)), fields=['supplier'], name='supplierpay_supplier'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='wholesalepayment',
+            index=models.Index(condition=models.Q(('delete_status', False)), fields=['branch', 'payment_date'], name='wholesalepay_branch_date'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='wholesalepayment',
+            index=models.Index(condition=models.Q(('delete_status', False)), fields=['customer', 'payment_date'], name='wholesalepay_customer_date'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='wholesalesales',
+            index=models.Index(condition=models.Q(('delete_status', False)), fields=['branch', 'sales_date'], name='wholesale_branch_date'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='wholesalesales',
+            index=models.Index(condition=models.Q(('delete_status', False)), fields=['sales_date'], name='wholesale_date'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='wholesalesales',
+            index=models.Index(condition=models.Q(('delete_status', False)), fields=['customer', 'sales_date'], name='wholesale_customer_date'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='wholesalesalesdetails',
+            index=models.Index(fields=['item', 'sales'], name='wholesaledetail_item_sales'),
+        ),
+    ]
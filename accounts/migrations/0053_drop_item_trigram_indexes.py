@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# Items are searched in memory since the catalog snapshot (catalog.py), so
+# nothing queries these any more. The customer name/phone indexes from 0049
+# stay: customer search (search.py) still runs icontains in the database.
+ITEM_TRIGRAM_INDEXES = [
+    ('accounts_item_name_trgm', 'accounts_item', 'name'),
+    ('accounts_item_code_trgm', 'accounts_item', 'code'),
+]
+
+
+def drop_item_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in ITEM_TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+def create_item_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in ITEM_TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} '
+            f'USING gin (UPPER({column}::text) gin_trgm_ops)'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0052_report_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_item_trigram_indexes, create_item_trigram_indexes),
+    ]
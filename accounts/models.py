@@ -2,6 +2,10 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
 from django.utils import timezone
+
+# Lists and reports only read documents that are not soft-deleted; the
+# indexes on their (branch, date) access paths skip the deleted rows.
+NOT_DELETED = models.Q(delete_status=False)
 # Create your models here.
 
 class Branch(models.Model):
@@ -54,6 +58,12 @@ class Supplierpay(models.Model):
     delete_status = models.BooleanField(default=False)
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['branch', 'payment_date'], condition=NOT_DELETED, name='supplierpay_branch_date'),
+            models.Index(fields=['supplier'], condition=NOT_DELETED, name='supplierpay_supplier'),
+        ]
+
 class ItemCategory(models.Model):
     category_id = models.AutoField(primary_key=True)
     category_name = models.CharField(max_length=100)
@@ -97,6 +107,12 @@ class Purchase(models.Model):
     branch = models.ForeignKey(Branch, on_delete=models.PROTECT)
     delete_status = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['branch', 'purchase_date'], condition=NOT_DELETED, name='purchase_branch_date'),
+            models.Index(fields=['purchase_date'], condition=NOT_DELETED, name='purchase_date'),
+        ]
+
 class PurchaseDetail(models.Model):
     purchase = models.ForeignKey(Purchase, on_delete=models.CASCADE, related_name='details')
     purchase_type = models.CharField(max_length=50)
@@ -111,6 +127,9 @@ class PurchaseDetail(models.Model):
     net_weight = models.DecimalField(max_digits=10, decimal_places=3,default='0.000')
     total_amount = models.DecimalField(max_digits=12, decimal_places=3,default='0.000')
 
+    class Meta:
+        indexes = [models.Index(fields=['item', 'purchase'], name='purchasedetail_item_purchase')]
+
 class Customer(models.Model):
     customer_name = models.CharField(max_length=100, blank=True)
     customer_phone = models.CharField(max_length=15, blank=True, unique=True, null=True)
@@ -170,6 +189,18 @@ class RetailSales(models.Model):
     total_upi = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True, default=0)
     total_card = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True, default=0)
 
+    class Meta:
+        indexes = [
+            # (sales_date, id) is also the keyset order of the retail sales list
+            models.Index(fields=['branch', 'sales_date', 'id'], condition=NOT_DELETED, name='retailsales_branch_date'),
+            models.Index(fields=['sales_date', 'id'], condition=NOT_DELETED, name='retailsales_date'),
+            models.Index(
+                fields=['branch', 'sales_date'],
+                condition=NOT_DELETED & models.Q(pending_amount__gt=0),
+                name='retailsales_credit',
+            ),
+        ]
+
 class RetailSalesDetails(models.Model):
     sales = models.ForeignKey(RetailSales,on_delete=models.CASCADE, related_name='details')
     item = models.ForeignKey(Item, on_delete=models.CASCADE)
@@ -179,7 +210,10 @@ class RetailSalesDetails(models.Model):
     tax_percentage = models.DecimalField(max_digits=5, decimal_places=3,default='0.000')
     price_per_unit = models.DecimalField(max_digits=10, decimal_places=3,default='0.000')
     total_amount = models.DecimalField(max_digits=12, decimal_places=3,default='0.000')
-    
+
+    class Meta:
+        indexes = [models.Index(fields=['item', 'sales'], name='retaildetail_item_sales')]
+
 class WholesaleSales(models.Model):
     receipt_no = models.CharField(max_length=20)
     sales_date = models.DateField()
@@ -202,6 +236,13 @@ class WholesaleSales(models.Model):
     paid_amount = models.DecimalField(max_digits=12, decimal_places=2)
     pending_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['branch', 'sales_date'], condition=NOT_DELETED, name='wholesale_branch_date'),
+            models.Index(fields=['sales_date'], condition=NOT_DELETED, name='wholesale_date'),
+            models.Index(fields=['customer', 'sales_date'], condition=NOT_DELETED, name='wholesale_customer_date'),
+        ]
+
     # def clean(self):
     #     if self.paid_amount > self.grand_total:
     #         raise ValidationError("Paid amount cannot be greater than the grand total.")
@@ -216,6 +257,9 @@ class WholesaleSalesDetails(models.Model):
     price_per_unit = models.DecimalField(max_digits=10, decimal_places=3,default='0.000')
     total_amount = models.DecimalField(max_digits=12, decimal_places=3,default='0.000')
 
+    class Meta:
+        indexes = [models.Index(fields=['item', 'sales'], name='wholesaledetail_item_sales')]
+
 
 ATTENDANCE_CHOICES = (
     ('present', 'Present'),
@@ -271,6 +315,10 @@ class WholesalePayment(models.Model):
 
     class Meta:
         ordering = ['-payment_date']
+        indexes = [
+            models.Index(fields=['branch', 'payment_date'], condition=NOT_DELETED, name='wholesalepay_branch_date'),
+            models.Index(fields=['customer', 'payment_date'], condition=NOT_DELETED, name='wholesalepay_customer_date'),
+        ]
 
 class ExpenseCategory(models.Model):
     expense_name = models.TextField(blank=True, null=True)
@@ -295,6 +343,12 @@ class Expense(models.Model):
     delete_status = models.BooleanField(default=False)
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['branch', 'payment_date'], condition=NOT_DELETED, name='expense_branch_date'),
+            models.Index(fields=['payment_date'], condition=NOT_DELETED, name='expense_date'),
+        ]
+
 class YieldPercentage(models.Model):
     item = models.ForeignKey(Item,on_delete=models.CASCADE)
     yeild_percentage = models.DecimalField(max_digits=12, decimal_places=3,default='0.000')
@@ -349,4 +403,174 @@ class ItemBranchPrice(models.Model):
         ordering = ['branch__branch_name', 'item__name']
 
     def __str__(self):
-        return f"{self.item.name} @ {self.branch.branch_name}"
\ No newline at end of file
+        return f"{self.item.name} @ {self.branch.branch_name}"
+
+class StockMovement(models.Model):
+    """Append-only stock ledger. Quantity is signed: + stock in, - stock out."""
+    MOVEMENT_CHOICES = (
+        ('opening', 'Opening'),
+        ('purchase', 'Purchase'),
+        ('purchase_revert', 'Purchase Revert'),
+        ('retail_sale', 'Retail Sale'),
+        ('retail_sale_revert', 'Retail Sale Revert'),
+        ('wholesale_sale', 'Wholesale Sale'),
+        ('wholesale_sale_revert', 'Wholesale Sale Revert'),
+    )
+
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='stock_movements')
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
+    quantity = models.DecimalField(max_digits=12, decimal_places=3)
+    movement_type = models.CharField(max_length=30, choices=MOVEMENT_CHOICES)
+    reference = models.CharField(max_length=50, blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.item.name} @ {self.branch.branch_name}: {self.quantity} ({self.movement_type})"
+
+
+class StockBalance(models.Model):
+    """Current stock per (item, branch), kept in step with StockMovement."""
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='stock_balances')
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
+    quantity = models.DecimalField(max_digits=12, decimal_places=3, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('item', 'branch')
+
+    def __str__(self):
+        return f"{self.item.name} @ {self.branch.branch_name}: {self.quantity}"
+
+
+class LivePriceIndex(models.Model):
+    """Live purchase cost per kg for a (category, branch, day) that had live purchases."""
+    category = models.ForeignKey(ItemCategory, on_delete=models.CASCADE)
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
+    date = models.DateField()
+    total_cost = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    total_weight = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    price_per_kg = models.DecimalField(max_digits=12, decimal_places=3, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('category', 'branch', 'date')
+        ordering = ['category', 'branch', 'date']
+
+    def __str__(self):
+        return f"{self.category.category_name} @ {self.branch.branch_name} {self.date}: {self.price_per_kg}"
+
+
+class CustomerBalance(models.Model):
+    """Running wholesale totals per customer, kept in sync by sales and payments."""
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, related_name='balance')
+    total_sales = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    total_paid = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def amount(self):
+        """Outstanding balance including the customer's opening balance."""
+        return (self.customer.opening_balance or 0) + self.total_sales - self.total_paid
+
+    def __str__(self):
+        return f"{self.customer}: {self.amount}"
+
+
+class LedgerCheckpoint(models.Model):
+    """
+    Wholesale sales and payment totals of a customer in one branch for all
+    documents dated before `month` (first day of a month). branch is empty
+    for payments recorded without a branch.
+    """
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='ledger_checkpoints')
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, null=True, blank=True)
+    month = models.DateField()
+    total_sales = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    total_paid = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['customer', 'month']
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'branch', 'month'], name='unique_ledger_checkpoint'),
+            models.UniqueConstraint(
+                fields=['customer', 'month'],
+                condition=models.Q(branch__isnull=True),
+                name='unique_unassigned_ledger_checkpoint',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.customer} / {self.branch or '-'} @ {self.month}"
+
+
+class ReceiptSequence(models.Model):
+    """Last receipt number issued per receipt prefix (branch alias) and document type."""
+    DOCUMENT_CHOICES = (
+        ('retail_sale', 'Retail Sale'),
+        ('wholesale_sale', 'Wholesale Sale'),
+        ('wholesale_payment', 'Wholesale Payment'),
+    )
+
+    prefix = models.CharField(max_length=10)
+    document_type = models.CharField(max_length=30, choices=DOCUMENT_CHOICES)
+    last_number = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('prefix', 'document_type')
+
+    def __str__(self):
+        return f"{self.prefix} {self.get_document_type_display()}: {self.last_number}"
+
+
+class DailyBranchTotals(models.Model):
+    """Per-day purchase and sales totals of a branch, refreshed when a bill changes."""
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
+    date = models.DateField()
+    purchase_total = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    retail_total = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    wholesale_total = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    retail_cash = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    retail_upi = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    retail_card = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('branch', 'date')
+        ordering = ['date', 'branch']
+
+    def __str__(self):
+        return f"{self.branch} {self.date}"
+
+
+class ExportJob(models.Model):
+    """A report PDF rendered in the background by the export worker."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='export_jobs')
+    report = models.CharField(max_length=50)  # url name of the report view
+    params = models.JSONField(default=dict)
+    cache_key = models.CharField(max_length=64, db_index=True)
+    filename = models.CharField(max_length=200, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, db_index=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.report} ({self.get_status_display()})"
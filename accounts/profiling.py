@@ -0,0 +1,261 @@
+"""
+Opt-in request profiling.
+
+RequestProfilingMiddleware profiles every request when
+settings.REQUEST_PROFILING is on, and otherwise only the requests a
+super_admin sends with an "X-Profile: 1" header. A profiled request counts
+and times its SQL statements through a database execute wrapper, grouped by
+query shape (the SQL with IN lists collapsed) so that a statement repeated
+once per row (N+1) stands out, and times its template renders through a
+wrapper on the Django template backend.
+
+A streamed response (CSV exports, downloads) is profiled until it has been
+sent: its content is read under the same wrappers and the profile is
+written when the response is closed.
+
+Each profiled request is written as one JSON line to a log next to
+REQUEST_PROFILE_LOG with the process id in its name (request_profile.<pid>.jsonl),
+so every gunicorn worker rotates only its own file by size. The request
+profiles page reads all of them back and ranks the views by their p50/p95
+time.
+
+A request that is not profiled only pays for the setting and header checks;
+the template wrapper returns straight to Django when no profile is active.
+"""
+import json
+import logging
+import math
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template as DjangoTemplate
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+TOP_SHAPES = 5
+MAX_SQL_LENGTH = 500
+
+_active_profile = ContextVar('request_profile', default=None)
+_handler = None
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_WHITESPACE = re.compile(r'\s+')
+
+logger = logging.getLogger('accounts.profiling')
+
+
+def query_shape(sql):
+    """SQL with its IN (%s, %s, ...) lists collapsed, so batches of any size group together."""
+    return _IN_LIST.sub('IN (...)', _WHITESPACE.sub(' ', sql).strip())
+
+
+class RequestProfile:
+    """SQL and template timings of one request; also the database execute wrapper."""
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+        self.shapes = Counter()
+        self.shape_seconds = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            shape = query_shape(sql)
+            self.sql_count += 1
+            self.sql_seconds += elapsed
+            self.shapes[shape] += 1
+            self.shape_seconds[shape] += elapsed
+
+    def repeated_shapes(self):
+        return [
+            {'sql': shape[:MAX_SQL_LENGTH], 'count': count, 'ms': round(self.shape_seconds[shape] * 1000, 2)}
+            for shape, count in self.shapes.most_common(TOP_SHAPES)
+            if count > 1
+        ]
+
+
+def _timed_render(render):
+    def wrapper(self, context=None, request=None):
+        profile = _active_profile.get()
+        if profile is None:
+            return render(self, context, request)
+        # Templates rendered from inside a template are part of the outer render
+        profile.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            profile.template_depth -= 1
+            if not profile.template_depth:
+                profile.template_seconds += time.perf_counter() - started
+    wrapper.profiled = True
+    return wrapper
+
+
+def install_template_timer():
+    if not getattr(DjangoTemplate.render, 'profiled', False):
+        DjangoTemplate.render = _timed_render(DjangoTemplate.render)
+
+
+def _log_path():
+    """This process's log: REQUEST_PROFILE_LOG with the pid before the extension."""
+    path = Path(settings.REQUEST_PROFILE_LOG)
+    return str(path.with_name(f'{path.stem}.{os.getpid()}{path.suffix}'))
+
+
+def _profile_logger():
+    """The logger writing profile lines, with a rotating file handler for this process's log."""
+    global _handler
+    path = _log_path()
+    if _handler is None or _handler.baseFilename != os.path.abspath(path):
+        if _handler is not None:
+            logger.removeHandler(_handler)
+            _handler.close()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _handler = RotatingFileHandler(
+            path, maxBytes=settings.REQUEST_PROFILE_LOG_MAX_BYTES,
+            backupCount=settings.REQUEST_PROFILE_LOG_BACKUPS, encoding='utf-8',
+        )
+        _handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(_handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+@contextmanager
+def profiling(profile):
+    """Count SQL on every connection and time template renders into profile."""
+    token = _active_profile.set(profile)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            yield
+    finally:
+        _active_profile.reset(token)
+
+
+class RequestProfilingMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.always = settings.REQUEST_PROFILING
+        install_template_timer()
+
+    def wants_profile(self, request):
+        if self.always:
+            return True
+        if request.META.get(PROFILE_HEADER) != '1':
+            return False
+        user = getattr(request, 'user', None)
+        return bool(user and user.is_authenticated and user.role == 'super_admin')
+
+    def __call__(self, request):
+        if not self.wants_profile(request):
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        started = time.perf_counter()
+        with profiling(profile):
+            response = self.get_response(request)
+
+        if response.streaming and not response.is_async:
+            # The body is produced while it is sent, after this method returns
+            response.streaming_content = self.profiled_stream(
+                response.streaming_content, profile, lambda: self.write(request, response, profile, started)
+            )
+        else:
+            self.write(request, response, profile, started)
+        return response
+
+    @staticmethod
+    def profiled_stream(content, profile, finish):
+        iterator = iter(content)
+        try:
+            while True:
+                with profiling(profile):
+                    chunk = next(iterator, None)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            finish()  # also when the client goes away and the response is closed early
+
+    @staticmethod
+    def write(request, response, profile, started):
+        total = time.perf_counter() - started
+        match = request.resolver_match
+        _profile_logger().info(json.dumps({
+            'at': round(time.time(), 3),
+            'view': (match.view_name if match else None) or request.path,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'ms': round(total * 1000, 2),
+            'sql_count': profile.sql_count,
+            'sql_ms': round(profile.sql_seconds * 1000, 2),
+            'template_ms': round(profile.template_seconds * 1000, 2),
+            'repeated': profile.repeated_shapes(),
+        }))
+
+
+# ── Reading the log ─────────────────────────────────────────────
+
+def read_profiles():
+    """Profiled requests from the logs of every process and their rotated backups."""
+    path = Path(settings.REQUEST_PROFILE_LOG)
+    records = []
+    for name in sorted(path.parent.glob(f'{path.stem}.*{path.suffix}*')):
+        with open(name, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue  # a line cut short by a crash or a rotation
+    return records
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list."""
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def rank_views(records):
+    """Per-view time, SQL and template statistics, slowest p95 first."""
+    by_view = defaultdict(list)
+    for record in records:
+        by_view[record['view']].append(record)
+
+    rows = []
+    for view, requests in by_view.items():
+        times = sorted(r['ms'] for r in requests)
+        repeated = Counter()
+        for r in requests:
+            for shape in r['repeated']:
+                repeated[shape['sql']] = max(repeated[shape['sql']], shape['count'])
+        rows.append({
+            'view': view,
+            'requests': len(requests),
+            'p50': percentile(times, 0.5),
+            'p95': percentile(times, 0.95),
+            'max': times[-1],
+            'sql_count': percentile(sorted(r['sql_count'] for r in requests), 0.5),
+            'sql_ms': percentile(sorted(r['sql_ms'] for r in requests), 0.5),
+            'template_ms': percentile(sorted(r['template_ms'] for r in requests), 0.5),
+            'repeated': repeated.most_common(3),
+        })
+    rows.sort(key=lambda row: row['p95'], reverse=True)
+    return rows
@@ -0,0 +1,105 @@
+"""
+Receipt numbers.
+
+Each (branch alias, document type) pair has a ReceiptSequence row. A number
+is taken by locking that row with select_for_update and incrementing it, so
+two tills on the same branch can never be handed the same receipt. On first
+use the row starts from the highest number already stored for that prefix.
+"""
+import re
+
+from django.db import IntegrityError, transaction
+
+from .models import ReceiptSequence, RetailSales, WholesalePayment, WholesaleSales
+
+RETAIL_SALE = 'retail_sale'
+WHOLESALE_SALE = 'wholesale_sale'
+WHOLESALE_PAYMENT = 'wholesale_payment'
+
+# document type → (model, text between the alias and the number)
+DOCUMENTS = {
+    RETAIL_SALE: (RetailSales, ''),
+    WHOLESALE_SALE: (WholesaleSales, 'WS-'),
+    WHOLESALE_PAYMENT: (WholesalePayment, 'WP-'),
+}
+
+
+def receipt_prefix(branch):
+    """Receipt prefix for a branch, e.g. "AK" (XX when there is no branch)."""
+    alias = (branch.alias if branch else '') or 'XX'
+    return alias.strip().upper()
+
+
+def format_receipt(prefix, document_type, number):
+    return f"{prefix}-{DOCUMENTS[document_type][1]}{number:04d}"
+
+
+def _highest_existing(prefix, document_type):
+    """Highest number already used for the prefix, e.g. 12 for AK-0012."""
+    model, marker = DOCUMENTS[document_type]
+    start = f"{prefix}-{marker}"
+    pattern = re.compile(re.escape(start) + r'(\d+)$', re.IGNORECASE)
+    highest = 0
+    for receipt_no in model.objects.filter(receipt_no__istartswith=start).values_list('receipt_no', flat=True).iterator():
+        match = pattern.match(receipt_no.strip())
+        if match:
+            highest = max(highest, int(match.group(1)))
+    return highest
+
+
+def _locked_sequence(prefix, document_type):
+    sequence = (
+        ReceiptSequence.objects
+        .select_for_update()
+        .filter(prefix=prefix, document_type=document_type)
+        .first()
+    )
+    if sequence is None:
+        try:
+            with transaction.atomic():
+                ReceiptSequence.objects.create(
+                    prefix=prefix,
+                    document_type=document_type,
+                    last_number=_highest_existing(prefix, document_type),
+                )
+        except IntegrityError:
+            pass  # another till created it first
+        sequence = ReceiptSequence.objects.select_for_update().get(
+            prefix=prefix, document_type=document_type
+        )
+    return sequence
+
+
+def next_receipt_no(branch, document_type):
+    """
+    Take the next receipt number for a branch. Call inside the transaction
+    that saves the document so an unused number is rolled back with it.
+    """
+    prefix = receipt_prefix(branch)
+    model = DOCUMENTS[document_type][0]
+    with transaction.atomic():
+        sequence = _locked_sequence(prefix, document_type)
+        number = sequence.last_number
+        while True:
+            number += 1
+            receipt_no = format_receipt(prefix, document_type, number)
+            # Skip numbers typed in by hand on an earlier document
+            if not model.objects.filter(receipt_no__iexact=receipt_no, delete_status=False).exists():
+                break
+        sequence.last_number = number
+        sequence.save(update_fields=['last_number', 'updated_at'])
+    return receipt_no
+
+
+def peek_receipt_no(branch, document_type):
+    """Number the next document will probably get, for display on an empty form."""
+    prefix = receipt_prefix(branch)
+    last_number = (
+        ReceiptSequence.objects
+        .filter(prefix=prefix, document_type=document_type)
+        .values_list('last_number', flat=True)
+        .first()
+    )
+    if last_number is None:
+        last_number = _highest_existing(prefix, document_type)
+    return format_receipt(prefix, document_type, last_number + 1)
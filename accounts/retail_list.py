@@ -0,0 +1,168 @@
+"""
+Retail sales list: filters, keyset pages and cached totals.
+
+Pages are cut on (sales_date, id) descending: the next page starts after the
+last row shown, so a page costs the same whatever the date range or how far
+the user has scrolled. Totals of the whole filtered range are served by a
+separate endpoint and cached; saving or deleting a retail sale replaces the
+totals version (see signals.py).
+"""
+import uuid
+from datetime import date
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import RetailSales
+
+SALES_PAGE_SIZE = 100
+CREDIT_PAGE_SIZE = 25
+
+TOTALS_VERSION_CACHE_KEY = 'retail_totals:version'
+TOTALS_CACHE_TIMEOUT = 60 * 60
+
+MONEY = DecimalField(max_digits=14, decimal_places=3)
+
+SALES_TOTAL_FIELDS = {
+    'total_subtotal': 'total',
+    'total_discount': 'discount',
+    'total_grand': 'grand_total',
+    'total_cash': 'total_cash',
+    'total_upi': 'total_upi',
+    'total_card': 'total_card',
+    'total_pending': 'pending_amount',
+}
+CREDIT_TOTAL_FIELDS = {
+    'credit_total_grand': 'grand_total',
+    'credit_pending_total': 'pending_amount',
+}
+
+
+class RetailListFilter:
+    """Branch / customer type / date range of the list, resolved for a user."""
+
+    def __init__(self, user, params, today=None):
+        today = today or date.today()
+        self.is_admin_like = user.role in ['super_admin', 'admin']
+        self.from_date = self._date(params.get('from_date'), today)
+        self.to_date = self._date(params.get('to_date'), today)
+
+        customer_type = params.get('customer_type', 'all')
+        self.customer_type = customer_type if customer_type in ('store', 'takeaway') else 'all'
+
+        branch_id = params.get('branch')
+        self.selected_branch = int(branch_id) if branch_id and branch_id.isdigit() else None
+
+        # None = every branch; 0 = the user has no branch and sees nothing
+        if self.is_admin_like:
+            self.branch_id = self.selected_branch
+        else:
+            self.branch_id = user.branch_id or 0
+
+    @staticmethod
+    def _date(value, default):
+        try:
+            return date.fromisoformat(value) if value else default
+        except ValueError:
+            return default
+
+    def _scoped(self, queryset):
+        if self.branch_id == 0:
+            return queryset.none()
+        if self.branch_id is not None:
+            queryset = queryset.filter(branch_id=self.branch_id)
+        return queryset
+
+    def sales(self):
+        sales = self._scoped(RetailSales.objects.filter(
+            delete_status=False,
+            sales_date__gte=self.from_date,
+            sales_date__lte=self.to_date,
+        ))
+        if self.customer_type == 'store':
+            sales = sales.filter(take_amay_employee__isnull=True)
+        elif self.customer_type == 'takeaway':
+            sales = sales.filter(take_amay_employee__isnull=False)
+        return sales
+
+    def credit_sales(self):
+        """Pending credit bills of any date."""
+        return self._scoped(RetailSales.objects.filter(pending_amount__gt=0, delete_status=False))
+
+    @property
+    def cache_key(self):
+        branch = 'all' if self.branch_id is None else self.branch_id
+        return f'{branch}:{self.customer_type}:{self.from_date}:{self.to_date}'
+
+
+# ── Keyset pages ─────────────────────────────────────
+
+def encode_cursor(sale):
+    return f'{sale.sales_date.isoformat()}_{sale.pk}'
+
+
+def decode_cursor(value):
+    """(sales_date, id) from a cursor, or None for the first page."""
+    try:
+        day, pk = (value or '').split('_')
+        return date.fromisoformat(day), int(pk)
+    except ValueError:
+        return None
+
+
+def keyset_page(queryset, cursor, limit):
+    """
+    Newest-first page of sales after the cursor.
+    Returns (rows, cursor of the next page or None).
+    """
+    queryset = queryset.order_by('-sales_date', '-id')
+    after = decode_cursor(cursor)
+    if after:
+        day, pk = after
+        queryset = queryset.filter(Q(sales_date__lt=day) | Q(sales_date=day, id__lt=pk))
+    rows = list(queryset[:limit + 1])
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
+
+
+# ── Totals ───────────────────────────────────────────
+
+def _totals_version():
+    version = cache.get(TOTALS_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(TOTALS_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+        version = cache.get(TOTALS_VERSION_CACHE_KEY)
+    return version
+
+
+def invalidate_retail_totals():
+    cache.delete(TOTALS_VERSION_CACHE_KEY)
+    # A request may recompute from the old rows before this transaction commits
+    transaction.on_commit(lambda: cache.delete(TOTALS_VERSION_CACHE_KEY))
+
+
+def _sums(queryset, fields):
+    return queryset.aggregate(**{
+        name: Coalesce(Sum(field), Value(Decimal('0.000')), output_field=MONEY)
+        for name, field in fields.items()
+    })
+
+
+def compute_retail_totals(list_filter):
+    totals = _sums(list_filter.sales(), SALES_TOTAL_FIELDS)
+    totals.update(_sums(list_filter.credit_sales(), CREDIT_TOTAL_FIELDS))
+    return totals
+
+
+def get_retail_totals(list_filter):
+    """compute_retail_totals, cached per filter until a retail sale changes."""
+    key = f'retail_totals:{_totals_version()}:{list_filter.cache_key}'
+    totals = cache.get(key)
+    if totals is None:
+        totals = compute_retail_totals(list_filter)
+        cache.set(key, totals, TOTALS_CACHE_TIMEOUT)
+    return totals
@@ -0,0 +1,102 @@
+"""
+Daily per-branch totals for the dashboard.
+
+DailyBranchTotals holds one row per (branch, day) with purchase, retail and
+wholesale totals and the retail cash/UPI/card split. Saving a purchase or
+sale refreshes only the affected (branch, day) rows once its transaction
+commits (see signals.py), so the dashboard reads at most one row per branch
+and day instead of aggregating the bills themselves.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import DailyBranchTotals, Purchase, RetailSales, WholesaleSales
+
+ZERO = Decimal('0.000')
+TOTAL_FIELDS = (
+    'purchase_total', 'retail_total', 'wholesale_total',
+    'retail_cash', 'retail_upi', 'retail_card',
+)
+
+
+def _day_totals(branch_filter, day_filter):
+    """(branch_id, date) → totals dict from grouped queries over the bills."""
+    sources = (
+        (Purchase, 'purchase_date', {'purchase_total': Sum('grand_total')}),
+        (RetailSales, 'sales_date', {
+            'retail_total': Sum('grand_total'),
+            'retail_cash': Sum('total_cash'),
+            'retail_upi': Sum('total_upi'),
+            'retail_card': Sum('total_card'),
+        }),
+        (WholesaleSales, 'sales_date', {'wholesale_total': Sum('grand_total')}),
+    )
+    totals = {}
+    for model, date_field, sums in sources:
+        rows = (
+            model.objects
+            .filter(delete_status=False, **branch_filter, **day_filter(date_field))
+            .values('branch_id', date_field)
+            .annotate(**sums)
+            .order_by()
+        )
+        for row in rows:
+            key = (row['branch_id'], row[date_field])
+            day = totals.setdefault(key, dict.fromkeys(TOTAL_FIELDS, ZERO))
+            for field in sums:
+                day[field] = row[field] or ZERO
+    return totals
+
+
+def _locked_totals_row(branch_id, day):
+    """
+    The row for a (branch, day), created if missing and locked until commit.
+    Two tills refreshing the same day take turns, and the second one sums
+    the bills after the first has written its row.
+    """
+    key = {'branch_id': branch_id, 'date': day}
+    while True:
+        DailyBranchTotals.objects.bulk_create([DailyBranchTotals(**key)], ignore_conflicts=True)
+        row = DailyBranchTotals.objects.select_for_update().filter(**key).first()
+        if row is not None:  # None if a concurrent refresh deleted it meanwhile
+            return row
+
+
+def refresh_daily_totals(keys):
+    """Recompute the rows for the given (branch_id, date) keys."""
+    with transaction.atomic():
+        # Lock in a fixed order so two refreshes of the same days can't deadlock
+        for branch_id, day in sorted(key for key in keys if key[0] is not None):
+            row = _locked_totals_row(branch_id, day)
+            totals = _day_totals({'branch_id': branch_id}, lambda field: {field: day}).get((branch_id, day))
+            if totals is None:
+                row.delete()
+                continue
+            for field, value in totals.items():
+                setattr(row, field, value)
+            row.save(update_fields=[*TOTAL_FIELDS, 'updated_at'])
+
+
+def rebuild_daily_totals(from_date=None, to_date=None):
+    """Rewrite all rows between the dates (inclusive, open-ended if None). Returns rows written."""
+    def day_filter(field):
+        bounds = {}
+        if from_date:
+            bounds[f'{field}__gte'] = from_date
+        if to_date:
+            bounds[f'{field}__lte'] = to_date
+        return bounds
+
+    totals = _day_totals({}, day_filter)
+    stale = DailyBranchTotals.objects.filter(**day_filter('date'))
+    stale.delete()
+    DailyBranchTotals.objects.bulk_create(
+        [
+            DailyBranchTotals(branch_id=branch_id, date=day, **values)
+            for (branch_id, day), values in totals.items()
+        ],
+        batch_size=1000,
+    )
+    return len(totals)
@@ -0,0 +1,54 @@
+"""
+Customer search for the billing screens (items are searched in memory, see
+catalog.py).
+
+Matching is a case-insensitive substring match. On PostgreSQL the customer
+name and phone expressions carry pg_trgm GIN indexes (migration 0049), so
+the LIKE lookups stay index scans as the tables grow; other databases run
+the same queries without them. Prefix matches are ranked first and results
+are returned one capped page at a time.
+"""
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from .models import Customer
+
+SEARCH_LIMIT = 20
+SEARCH_MAX_LIMIT = 50
+
+
+def page_bounds(params):
+    """(offset, limit) from ?offset=&limit= query parameters, clamped."""
+    def number(name, default):
+        value = params.get(name, '')
+        return int(value) if str(value).isdigit() else default
+
+    limit = min(max(number('limit', SEARCH_LIMIT), 1), SEARCH_MAX_LIMIT)
+    return number('offset', 0), limit
+
+
+def _rank(*conditions):
+    """0 for rows matching the first condition, 1 for the second, ..."""
+    return Case(
+        *[When(condition, then=Value(rank)) for rank, condition in enumerate(conditions)],
+        default=Value(len(conditions)),
+        output_field=IntegerField(),
+    )
+
+
+def find_customers(q, field='customer_name', queryset=None):
+    """Customers whose field contains q, prefix matches first."""
+    customers = Customer.objects.all() if queryset is None else queryset
+    if not q:
+        return customers.order_by(field, 'id')
+    return (
+        customers
+        .filter(**{f'{field}__icontains': q})
+        .annotate(rank=_rank(Q(**{f'{field}__istartswith': q})))
+        .order_by('rank', field, 'id')
+    )
+
+
+def paginate(queryset, offset, limit):
+    """One page of results and whether there are more after it."""
+    rows = list(queryset[offset:offset + limit + 1])
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,371 @@
+"""
+Synthetic shop data for load tests and benchmarks (manage.py seed_shop).
+
+A run adds its own branches, items with yield multipliers, suppliers,
+customers and employees, then fills every branch and day with purchases,
+retail and wholesale bills, payments and expenses. All values come from one
+random.Random(seed), so the same arguments on an empty database always give
+the same rows. The volume is days × branches × bills per day.
+
+Documents are inserted with bulk_create a few days at a time. That skips the
+model signals, so the derived tables (customer balances, daily branch
+totals, live price index) are written and the caches invalidated once at
+the end. Stock movements are not generated.
+"""
+import random
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+
+from .balances import rebuild_customer_balances
+from .catalog import invalidate_catalog
+from .costing import invalidate_multipliers
+from .exports import invalidate_exports
+from .models import (
+    Branch, CustomUser, Customer, Employe, Expense, ExpenseCategory, Item, ItemCategory,
+    LivePriceIndex, Purchase, PurchaseDetail, RetailSales, RetailSalesDetails, Supplier,
+    Supplierpay, WholesalePayment, WholesaleSales, WholesaleSalesDetails, YieldPercentage,
+)
+from .receipts import RETAIL_SALE, WHOLESALE_PAYMENT, WHOLESALE_SALE, format_receipt, receipt_prefix
+from .retail_list import invalidate_retail_totals
+from .rollups import rebuild_daily_totals
+from .summary import invalidate_all_summaries
+
+MAX_SEED = 99999  # keeps aliases, item codes and phone numbers within their columns
+BATCH_SIZE = 1000
+DELETED_SHARE = 0.01  # documents created soft-deleted
+
+# name, is_weight_based, include_in_stock_update
+CATEGORIES = (
+    ('Chicken', True, True),
+    ('Mutton', True, False),
+    ('Fish', True, False),
+    ('Eggs', False, False),
+)
+
+# category, name, unit, is_live, retail price, wholesale price, yield %
+ITEMS = (
+    ('Chicken', 'Broiler Live', 'kg', True, '140', '125', '100'),
+    ('Chicken', 'Country Chicken Live', 'kg', True, '380', '350', '100'),
+    ('Chicken', 'Broiler Dressed', 'kg', False, '220', '200', '70'),
+    ('Chicken', 'Boneless', 'kg', False, '320', '290', '45'),
+    ('Chicken', 'Leg Piece', 'kg', False, '260', '240', '60'),
+    ('Chicken', 'Wings', 'kg', False, '180', '160', '65'),
+    ('Mutton', 'Mutton Curry Cut', 'kg', False, '800', '760', '100'),
+    ('Mutton', 'Mutton Liver', 'kg', False, '600', '560', '100'),
+    ('Fish', 'Seer Fish', 'kg', False, '900', '850', '100'),
+    ('Fish', 'Sardine', 'kg', False, '200', '180', '100'),
+    ('Eggs', 'Egg Tray', 'pcs', False, '180', '165', '100'),
+    ('Eggs', 'Country Egg', 'pcs', False, '12', '10', '100'),
+)
+
+EXPENSE_CATEGORIES = ('Electricity', 'Rent', 'Transport', 'Ice', 'Packing', 'Salary Advance')
+
+RETAIL_PAYMENT_MODES = ('cash', 'upi', 'card', 'multiple', 'pending')
+RETAIL_PAYMENT_WEIGHTS = (45, 35, 8, 7, 5)
+
+
+def _amount(rng, low, high, places=2):
+    """Random Decimal between low and high with the given decimal places."""
+    scale = 10 ** places
+    return Decimal(rng.randint(int(low * scale), int(high * scale))).scaleb(-places)
+
+
+class ShopSeeder:
+    """One seeding run; see seed_shop()."""
+
+    def __init__(self, seed, suppliers, customers, wholesale_customers):
+        self.rng = random.Random(seed)
+        self.tag = f'S{seed}'
+        self.seed = seed
+        self.supplier_count = suppliers
+        self.customer_count = customers
+        self.wholesale_customer_count = wholesale_customers
+        self.counts = Counter()
+        self.receipts = Counter()  # (prefix, document type) → last number
+        self.live_prices = {}  # (category_id, branch_id, day) → [cost, weight]
+
+    def already_seeded(self):
+        return Item.objects.filter(code__startswith=f'{self.tag}-').exists()
+
+    def _create(self, model, rows):
+        created = model.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+        self.counts[model.__name__] += len(created)
+        return created
+
+    def _deleted(self):
+        return self.rng.random() < DELETED_SHARE
+
+    # ── Master data ──────────────────────────────────────────────
+
+    def create_master_data(self, branch_count):
+        rng = self.rng
+        self.user, _ = CustomUser.objects.get_or_create(
+            username='seed_shop', defaults={'role': 'super_admin', 'is_staff': True}
+        )
+        self.branches = self._create(Branch, [
+            Branch(
+                branch_name=f'{self.tag} Branch {n}', alias=f'{self.tag}B{n}',
+                branch_address=f'{n} Market Road', phone=f'04{self.seed:05d}{n:03d}',
+            )
+            for n in range(1, branch_count + 1)
+        ])
+
+        categories = {}
+        for name, weight_based, in_stock_update in CATEGORIES:
+            categories[name], _ = ItemCategory.objects.get_or_create(
+                category_name=name,
+                defaults={'is_weight_based': weight_based, 'include_in_stock_update': in_stock_update},
+            )
+        self.items = self._create(Item, [
+            Item(
+                category=categories[category], name=name, code=f'{self.tag}-{n:03d}', unit=unit,
+                is_live=is_live, price_per_unit_retail=Decimal(retail),
+                price_per_unit_wholesale=Decimal(wholesale),
+            )
+            for n, (category, name, unit, is_live, retail, wholesale, _) in enumerate(ITEMS, 1)
+        ])
+        self._create(YieldPercentage, [
+            YieldPercentage(
+                item=item, yeild_percentage=Decimal(yield_percentage),
+                multipler=(Decimal(100) / Decimal(yield_percentage)).quantize(Decimal('0.001')),
+            )
+            for item, (*_, yield_percentage) in zip(self.items, ITEMS)
+        ])
+        # Live birds and the non-chicken lines are bought; everything but live birds is sold
+        self.purchased_items = [item for item in self.items if item.is_live or item.category.category_name != 'Chicken']
+        self.sold_items = [item for item in self.items if not item.is_live]
+
+        self.suppliers = self._create(Supplier, [
+            Supplier(
+                supplier_name=f'Supplier {n}', company_name=f'{self.tag} Farms {n}',
+                address=f'Village {n}', phone_no=f'8{self.seed:05d}{n:04d}',
+            )
+            for n in range(1, self.supplier_count + 1)
+        ])
+        self.walk_in, = self._create(Customer, [Customer(customer_name=f'{self.tag} Walk-in')])
+        self.customers = self._create(Customer, [
+            Customer(customer_name=f'Customer {n}', customer_phone=f'9{self.seed:05d}{n:06d}')
+            for n in range(1, self.customer_count + 1)
+        ])
+        self.wholesale_customers = self._create(Customer, [
+            Customer(
+                customer_name=f'{self.tag} Hotel {n}', customer_phone=f'7{self.seed:05d}{n:06d}',
+                customer_address=f'{n} Hotel Street', whole_sale=True,
+                opening_balance=_amount(rng, 0, 20000, 3),
+            )
+            for n in range(1, self.wholesale_customer_count + 1)
+        ])
+        employees = self._create(Employe, [
+            Employe(
+                emp_id=f'{self.tag}-E{branch_no}{n}', name=f'Employee {branch_no}.{n}',
+                phone_no=f'6{self.seed:05d}{branch_no:03d}{n}', address='Staff Quarters',
+                salary_per_day=Decimal('800.00'), branch=branch,
+            )
+            for branch_no, branch in enumerate(self.branches, 1)
+            for n in range(1, 5)
+        ])
+        self.employees = {branch.pk: [e for e in employees if e.branch_id == branch.pk] for branch in self.branches}
+        self.expense_categories = [
+            ExpenseCategory.objects.get_or_create(expense_name=name, defaults={'type': 'expense'})[0]
+            for name in EXPENSE_CATEGORIES
+        ]
+
+    # ── Documents ────────────────────────────────────────────────
+
+    def _receipt(self, branch, document_type):
+        prefix = receipt_prefix(branch)
+        self.receipts[prefix, document_type] += 1
+        return format_receipt(prefix, document_type, self.receipts[prefix, document_type])
+
+    def _purchase(self, branch, day, number):
+        rng = self.rng
+        deleted = self._deleted()
+        purchase = Purchase(
+            invoice_number=f'{branch.alias}-{day:%y%m%d}-{number}', purchase_date=day,
+            supplier=rng.choice(self.suppliers), added_by=self.user, branch=branch,
+            delete_status=deleted, deleted_by=self.user if deleted else None,
+        )
+        details = []
+        for item in rng.sample(self.purchased_items, rng.randint(1, 3)):
+            if item.is_live:
+                qty = rng.randint(50, 400)  # birds
+                boxes = qty // 10 + 1
+                gross = (Decimal(qty) * _amount(rng, 1.8, 2.6, 3)).quantize(Decimal('0.001'))
+                empty = boxes * Decimal('2.500')
+                net = gross - empty
+                price = _amount(rng, 95, 125)
+            elif item.unit == 'kg':
+                qty, boxes, empty = 1, None, Decimal('0.000')
+                net = gross = _amount(rng, 5, 60, 3)
+                price = (item.price_per_unit_wholesale * Decimal('0.8')).quantize(Decimal('0.001'))
+            else:
+                qty, boxes = rng.randint(5, 60), None
+                net = gross = empty = Decimal('0.000')
+                price = (item.price_per_unit_wholesale * Decimal('0.8')).quantize(Decimal('0.001'))
+            total = ((net if item.unit == 'kg' else qty) * price).quantize(Decimal('0.001'))
+            details.append(PurchaseDetail(
+                purchase=purchase, purchase_type=item.unit, category=item.category, item=item,
+                purchase_price=price, qty=qty, no_of_boxes=boxes, gross_weight=gross,
+                empty_weight=empty, net_weight=net, total_amount=total,
+            ))
+            if item.is_live and not deleted:
+                totals = self.live_prices.setdefault((item.category_id, branch.pk, day), [Decimal(0), Decimal(0)])
+                totals[0] += total
+                totals[1] += net
+        purchase.grand_total = sum(d.total_amount for d in details).quantize(Decimal('0.01'))
+        return purchase, details
+
+    def _sale_lines(self, detail_model, sale, price_field, line_count, weights):
+        details = []
+        for item in self.rng.sample(self.sold_items, line_count):
+            price = getattr(item, price_field)
+            if item.unit == 'kg':
+                qty, net = 1, _amount(self.rng, *weights, 3)
+                total = net * price
+            else:
+                qty, net = self.rng.randint(1, 6), Decimal('0.000')
+                total = qty * price
+            details.append(detail_model(
+                sales=sale, item=item, qty=qty, net_weight=net, price_per_unit=price,
+                total_amount=total.quantize(Decimal('0.001')),
+            ))
+        return details
+
+    def _retail_sale(self, branch, day):
+        rng = self.rng
+        deleted = self._deleted()
+        mode = rng.choices(RETAIL_PAYMENT_MODES, RETAIL_PAYMENT_WEIGHTS)[0]
+        employee = rng.choice(self.employees[branch.pk]) if rng.random() < 0.05 else None
+        sale = RetailSales(
+            receipt_no=self._receipt(branch, RETAIL_SALE), sales_date=day,
+            customer=rng.choice(self.customers) if mode == 'pending' or rng.random() < 0.3 else self.walk_in,
+            added_by=self.user, branch=branch, payment_mode=mode, take_amay_employee=employee,
+            delete_status=deleted, deleted_by=self.user if deleted else None,
+        )
+        details = self._sale_lines(RetailSalesDetails, sale, 'price_per_unit_retail', rng.randint(1, 4), (0.25, 3))
+        sale.total = sum(d.total_amount for d in details)
+        sale.discount = Decimal(rng.randint(1, 20)) if rng.random() < 0.05 else Decimal('0.000')
+        sale.grand_total = sale.total - sale.discount
+        if mode == 'multiple':
+            sale.total_cash = (sale.grand_total / 2).quantize(Decimal('0.001'))
+            sale.total_upi = sale.grand_total - sale.total_cash
+        elif mode == 'pending':
+            sale.pending_amount = sale.grand_total
+        else:
+            setattr(sale, f'total_{mode}', sale.grand_total)
+        return sale, details
+
+    def _wholesale_sale(self, branch, day):
+        rng = self.rng
+        deleted = self._deleted()
+        mode = rng.choices(('credit', 'cash', 'online'), (70, 20, 10))[0]
+        sale = WholesaleSales(
+            receipt_no=self._receipt(branch, WHOLESALE_SALE), sales_date=day,
+            customer=rng.choice(self.wholesale_customers), added_by=self.user, branch=branch,
+            payment_mode=mode, paid_amount=Decimal('0.00'),
+            delete_status=deleted, deleted_by=self.user if deleted else None,
+        )
+        details = self._sale_lines(WholesaleSalesDetails, sale, 'price_per_unit_wholesale', rng.randint(2, 6), (10, 80))
+        sale.total = sale.grand_total = sum(d.total_amount for d in details)
+        if mode != 'credit':
+            sale.paid_amount = sale.grand_total.quantize(Decimal('0.01'))
+        sale.pending_balance = (sale.grand_total - sale.paid_amount).quantize(Decimal('0.01'))
+        return sale, details
+
+    def _write(self, model, detail_model, documents):
+        self._create(model, [document for document, _ in documents])
+        self._create(detail_model, [detail for _, details in documents for detail in details])
+
+    def fill_days(self, days, bills_per_day):
+        """Documents of every branch on the given days, written in one transaction."""
+        rng = self.rng
+        purchases, retail, wholesale = [], [], []
+        payments, supplier_payments, expenses = [], [], []
+        for day in days:
+            for branch in self.branches:
+                purchases += [self._purchase(branch, day, n) for n in range(1, rng.randint(1, 2) + 1)]
+                bills = max(0, round(bills_per_day * rng.uniform(0.7, 1.3)))
+                retail += [self._retail_sale(branch, day) for _ in range(bills)]
+                wholesale += [self._wholesale_sale(branch, day) for _ in range(max(1, bills // 10))]
+                if rng.random() < 0.6:
+                    payments.append(WholesalePayment(
+                        receipt_no=self._receipt(branch, WHOLESALE_PAYMENT),
+                        customer=rng.choice(self.wholesale_customers), payment_date=day,
+                        amount=_amount(rng, 1000, 50000),
+                        payment_mode=rng.choice(('cash', 'upi', 'online', 'cheque')),
+                        branch=branch, added_by=self.user, delete_status=self._deleted(),
+                    ))
+                if rng.random() < 0.5:
+                    supplier_payments.append(Supplierpay(
+                        supplier=rng.choice(self.suppliers), payment_date=day,
+                        amount=_amount(rng, 5000, 60000), payment_mode=rng.choice(('cash', 'online')),
+                        branch=branch, delete_status=self._deleted(),
+                    ))
+                expenses += [
+                    Expense(
+                        expense=rng.choice(self.expense_categories), amount=_amount(rng, 100, 3000, 3),
+                        payment_mode=rng.choice(('cash', 'upi')), payment_date=day,
+                        staff=rng.choice(self.employees[branch.pk]) if rng.random() < 0.3 else None,
+                        branch=branch, delete_status=self._deleted(),
+                    )
+                    for _ in range(rng.randint(1, 2))
+                ]
+
+        with transaction.atomic():
+            self._write(Purchase, PurchaseDetail, purchases)
+            self._write(RetailSales, RetailSalesDetails, retail)
+            self._write(WholesaleSales, WholesaleSalesDetails, wholesale)
+            self._create(WholesalePayment, payments)
+            self._create(Supplierpay, supplier_payments)
+            self._create(Expense, expenses)
+
+    # ── Derived tables ───────────────────────────────────────────
+
+    def finish(self, from_date, to_date):
+        self._create(LivePriceIndex, [
+            LivePriceIndex(
+                category_id=category_id, branch_id=branch_id, date=day, total_cost=cost,
+                total_weight=weight, price_per_kg=(cost / weight).quantize(Decimal('0.001')),
+            )
+            for (category_id, branch_id, day), (cost, weight) in self.live_prices.items()
+            if weight > 0
+        ])
+        rebuild_customer_balances()
+        rebuild_daily_totals(from_date, to_date)
+        for invalidate in (
+            invalidate_catalog, invalidate_multipliers, invalidate_all_summaries,
+            invalidate_retail_totals, invalidate_exports,
+        ):
+            invalidate()
+
+
+def seed_shop(end_date, days, branches, bills_per_day, seed=1, suppliers=8, customers=200,
+              wholesale_customers=25, batch_days=7, progress=None):
+    """
+    Generate `days` days of documents ending on end_date for `branches` new
+    branches with about `bills_per_day` retail bills each per day. Returns
+    a Counter of rows created per model, or None if this seed was already
+    used on the database. progress(last_day, counts) is called after every
+    batch of days.
+    """
+    seeder = ShopSeeder(seed, suppliers, customers, wholesale_customers)
+    if seeder.already_seeded():
+        return None
+
+    from_date = end_date - timedelta(days=days - 1)
+    with transaction.atomic():
+        seeder.create_master_data(branches)
+
+    dates = [from_date + timedelta(days=n) for n in range(days)]
+    for start in range(0, len(dates), batch_days):
+        batch = dates[start:start + batch_days]
+        seeder.fill_days(batch, bills_per_day)
+        if progress:
+            progress(batch[-1], seeder.counts)
+
+    with transaction.atomic():
+        seeder.finish(from_date, end_date)
+    return seeder.counts
@@ -0,0 +1,103 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .catalog import invalidate_catalog
+from .costing import invalidate_multipliers
+from .exports import invalidate_exports
+from .models import (
+    Branch, Customer, Expense, Item, ItemBranchPrice, ItemCategory, Purchase,
+    PurchaseDetail, RetailSales, RetailSalesDetails, Supplier, Supplierpay,
+    WholesalePayment, WholesaleSales, WholesaleSalesDetails, YieldPercentage,
+)
+from .retail_list import invalidate_retail_totals
+from .rollups import refresh_daily_totals
+from .summary import invalidate_all_summaries, invalidate_daily_summary
+
+# Documents shown on the daily summary → their date field
+SUMMARY_DATE_FIELDS = {
+    Purchase: 'purchase_date',
+    RetailSales: 'sales_date',
+    WholesaleSales: 'sales_date',
+    WholesalePayment: 'payment_date',
+    Expense: 'payment_date',
+}
+
+# Bills counted in the dashboard's DailyBranchTotals
+ROLLUP_SOURCES = (Purchase, RetailSales, WholesaleSales)
+
+# Everything the PDF reports read; a change makes stored exports stale
+EXPORT_SOURCES = (
+    Branch, Customer, Expense, Item, ItemBranchPrice, ItemCategory, Purchase,
+    PurchaseDetail, RetailSales, RetailSalesDetails, Supplier, Supplierpay,
+    WholesalePayment, WholesaleSales, WholesaleSalesDetails, YieldPercentage,
+)
+
+
+@receiver([post_save, post_delete], sender=YieldPercentage)
+def yield_percentage_changed(sender, **kwargs):
+    invalidate_multipliers()
+    invalidate_all_summaries()
+
+
+@receiver([post_save, post_delete], sender=Branch)
+@receiver([post_save, post_delete], sender=Item)
+@receiver([post_save, post_delete], sender=ItemCategory)
+@receiver([post_save, post_delete], sender=ItemBranchPrice)
+def catalog_changed(sender, **kwargs):
+    invalidate_catalog()
+    if sender is Item:
+        invalidate_all_summaries()  # is_live affects live weights
+
+
+@receiver([post_save, post_delete], sender=RetailSales)
+def retail_sale_changed(sender, **kwargs):
+    invalidate_retail_totals()
+
+
+def remember_summary_day(sender, instance, **kwargs):
+    """An edit may move a document to another day or branch; remember the old one."""
+    if instance.pk:
+        instance._summary_day = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list('branch_id', SUMMARY_DATE_FIELDS[sender]).first()
+        )
+
+
+def summary_document_changed(sender, instance, **kwargs):
+    invalidate_daily_summary(instance.branch_id, getattr(instance, SUMMARY_DATE_FIELDS[sender]))
+    previous = getattr(instance, '_summary_day', None)
+    if previous:
+        invalidate_daily_summary(*previous)
+
+
+# Connected per model: a receiver without a sender would listen to every
+# post_delete and stop Django from fast-deleting any model.
+for model in SUMMARY_DATE_FIELDS:
+    pre_save.connect(remember_summary_day, sender=model)
+    post_save.connect(summary_document_changed, sender=model)
+    post_delete.connect(summary_document_changed, sender=model)
+
+
+def rollup_document_changed(sender, instance, **kwargs):
+    keys = {(instance.branch_id, getattr(instance, SUMMARY_DATE_FIELDS[sender]))}
+    previous = getattr(instance, '_summary_day', None)
+    if previous:
+        keys.add(previous)
+    # After commit, so the refresh sums committed bills and takes its row lock
+    # after the bill's own stock locks are released
+    transaction.on_commit(lambda: refresh_daily_totals(keys))
+
+
+for model in ROLLUP_SOURCES:
+    post_save.connect(rollup_document_changed, sender=model)
+    post_delete.connect(rollup_document_changed, sender=model)
+
+
+def export_source_changed(sender, **kwargs):
+    invalidate_exports()
+
+
+for model in EXPORT_SOURCES:
+    post_save.connect(export_source_changed, sender=model)
+    post_delete.connect(export_source_changed, sender=model)
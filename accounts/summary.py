@@ -0,0 +1,233 @@
+"""
+Daily summary report figures.
+
+Everything the daily summary shows is computed with a fixed set of grouped
+queries; live weights join the item's yield multiplier in SQL instead of
+converting row by row in Python. The figures are cached per (branch, date).
+Saving or deleting a purchase, sale, wholesale payment or expense drops the
+entries for its day (see signals.py); yield or item changes retire every
+entry at once by replacing the cache generation.
+"""
+import uuid
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Case, Count, DecimalField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce, Floor, Mod, Round
+from django.db.models.lookups import Exact
+
+from .models import (
+    Expense, PurchaseDetail, RetailSales, RetailSalesDetails, WholesalePayment,
+    WholesaleSales, WholesaleSalesDetails, YieldPercentage,
+)
+
+SUMMARY_CACHE_TIMEOUT = 60 * 60
+GENERATION_CACHE_KEY = 'daily_summary:generation'
+
+ALL_BRANCHES = 'all'
+NO_BRANCH = 'none'
+
+WEIGHT = DecimalField(max_digits=14, decimal_places=3)
+MONEY = DecimalField(max_digits=14, decimal_places=3)
+ZERO = Decimal('0.000')
+
+
+# ── Caching ──────────────────────────────────────────
+
+def _generation():
+    generation = cache.get(GENERATION_CACHE_KEY)
+    if generation is None:
+        cache.add(GENERATION_CACHE_KEY, uuid.uuid4().hex, None)
+        generation = cache.get(GENERATION_CACHE_KEY)
+    return generation
+
+
+def _cache_key(scope, report_date):
+    return f'daily_summary:{_generation()}:{scope}:{report_date}'
+
+
+def invalidate_daily_summary(branch_id, report_date):
+    """Drop cached summaries of a day for the branch and for all branches."""
+    keys = [_cache_key(ALL_BRANCHES, report_date)]
+    if branch_id:
+        keys.append(_cache_key(branch_id, report_date))
+    cache.delete_many(keys)
+    # A request may recompute from the old rows before this transaction commits
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_all_summaries():
+    cache.delete(GENERATION_CACHE_KEY)
+    transaction.on_commit(lambda: cache.delete(GENERATION_CACHE_KEY))
+
+
+# ── Computation ──────────────────────────────────────
+
+def _round_half_even(value, places):
+    """
+    Round(value, places) with ties to even, as Decimal.quantize rounds;
+    SQL ROUND sends ties away from zero. For non-negative values.
+    """
+    scaled = ExpressionWrapper(value * Value(Decimal(10) ** places), output_field=WEIGHT)
+    lower = Floor(scaled)
+    tie_to_even = Q(Exact(scaled - lower, Value(Decimal('0.5')))) & Q(Exact(Mod(lower, 2), Value(0)))
+    return Case(
+        When(tie_to_even, then=lower / Value(Decimal(10) ** places)),
+        default=Round(value, places),
+        output_field=WEIGHT,
+    )
+
+
+def _live_weight(item_path):
+    """Per-row live weight: live items as is, others × yield multiplier (1 if none)."""
+    multiplier = Subquery(
+        YieldPercentage.objects
+        .filter(item_id=OuterRef(f'{item_path}_id'))
+        .order_by('id')
+        .values('multipler')[:1]
+    )
+    return Case(
+        When(**{f'{item_path}__is_live': True}, then=F('net_weight')),
+        default=_round_half_even(
+            F('net_weight') * Coalesce(multiplier, Value(Decimal('1.000'))),
+            3,
+        ),
+        output_field=WEIGHT,
+    )
+
+
+def _sums(queryset, **fields):
+    """Aggregate Sum for each name → expression, with zero instead of None."""
+    return queryset.aggregate(**{
+        name: Coalesce(expression, Value(ZERO), output_field=MONEY)
+        for name, expression in fields.items()
+    })
+
+
+def _detail_totals(queryset, **sums):
+    """Weight, live weight and qty of detail rows (plus any extra sums) in one query."""
+    totals = _sums(
+        queryset,
+        weight=Sum('net_weight'),
+        live_weight=Sum(_live_weight('item')),
+        qty=Sum('qty'),
+        **sums
+    )
+    totals['live_weight'] = totals['live_weight'].quantize(Decimal('0.001'))
+    totals['qty'] = int(totals['qty'])
+    return totals
+
+
+def compute_daily_summary(report_date, scope):
+    """
+    Summary figures of a day. scope: a branch id, ALL_BRANCHES or NO_BRANCH
+    (a user without a branch sees nothing).
+    """
+    def scoped(queryset, branch_path='branch'):
+        if scope == NO_BRANCH:
+            return queryset.none()
+        if scope == ALL_BRANCHES:
+            return queryset
+        return queryset.filter(**{f'{branch_path}_id': scope})
+
+    # ─── 1. PURCHASES ────────────────────────────────────────────
+    purchase_details = scoped(PurchaseDetail.objects.filter(
+        purchase__purchase_date=report_date,
+        purchase__delete_status=False,
+    ), 'purchase__branch')
+    purchase = _detail_totals(purchase_details, amount=Sum('total_amount'))
+
+    # ─── 2. RETAIL SALES ─────────────────────────────────────────
+    retail_sales = scoped(RetailSales.objects.filter(sales_date=report_date, delete_status=False))
+    retail = _detail_totals(scoped(RetailSalesDetails.objects.filter(
+        sales__sales_date=report_date,
+        sales__delete_status=False,
+    ), 'sales__branch'))
+    retail.update(_sums(
+        retail_sales,
+        amount=Sum('grand_total'),
+        cash=Sum('total_cash'),
+        upi=Sum('total_upi'),
+        card=Sum('total_card'),
+        pending=Sum('pending_amount'),
+    ))
+
+    # ─── 3. WHOLESALE SALES ──────────────────────────────────────
+    wholesale_sales = scoped(WholesaleSales.objects.filter(sales_date=report_date, delete_status=False))
+    wholesale = _detail_totals(scoped(WholesaleSalesDetails.objects.filter(
+        sales__sales_date=report_date,
+        sales__delete_status=False,
+    ), 'sales__branch'))
+    wholesale.update(_sums(
+        wholesale_sales,
+        amount=Sum('grand_total'),
+        paid=Sum('paid_amount'),
+        pending=Sum('pending_balance'),
+    ))
+
+    # ─── 4. WHOLESALE PAYMENTS RECEIVED ON THIS DAY ──────────────
+    payment_qs = scoped(WholesalePayment.objects.filter(payment_date=report_date, delete_status=False))
+    payments = list(payment_qs.select_related('customer'))
+    payment_total = sum((p.amount for p in payments), Decimal('0.00'))
+    payment_cash = sum((p.amount for p in payments if p.payment_mode == 'cash'), Decimal('0.00'))
+
+    # ─── 5. EXPENSES (all combined, all in cash per requirement) ─
+    expenses = scoped(Expense.objects.filter(payment_date=report_date, delete_status=False)).aggregate(
+        total=Coalesce(Sum('amount'), Value(ZERO), output_field=MONEY),
+        count=Count('id'),
+    )
+
+    # ─── 6. CASH HAND OVER ───────────────────────────────────────
+    # Cash received = retail cash + wholesale cash payments
+    # Then subtract expenses
+    total_cash_received = retail['cash'] + payment_cash
+
+    return {
+        # Purchase
+        'total_purchase_qty': purchase['qty'],
+        'total_purchase_weight': purchase['weight'],
+        'total_purchase_live_weight': purchase['live_weight'],
+        'total_purchase_amount': purchase['amount'],
+
+        # Retail
+        'total_retail_qty': retail['qty'],
+        'total_retail_weight': retail['weight'],
+        'total_retail_live_weight': retail['live_weight'],
+        'total_retail_amount': retail['amount'],
+        'total_retail_cash': retail['cash'],
+        'total_retail_upi': retail['upi'],
+        'total_retail_card': retail['card'],
+        'total_retail_pending': retail['pending'],
+
+        # Wholesale
+        'total_wholesale_qty': wholesale['qty'],
+        'total_wholesale_weight': wholesale['weight'],
+        'total_wholesale_live_weight': wholesale['live_weight'],
+        'total_wholesale_amount': wholesale['amount'],
+        'total_wholesale_paid_today': wholesale['paid'],
+        'total_wholesale_pending': wholesale['pending'],
+        'total_wholesale_payment_received': payment_total,
+        'wholesale_cash_payment_received': payment_cash,
+        'wholesale_payments': payments,
+
+        # Expenses
+        'total_expense': expenses['total'],
+        'expense_count': expenses['count'],
+
+        # Cash hand over
+        'total_cash_received': total_cash_received,
+        'cash_hand_over': total_cash_received - expenses['total'],
+    }
+
+
+def get_daily_summary(report_date, scope):
+    """compute_daily_summary, cached per (scope, date)."""
+    key = _cache_key(scope, report_date)
+    summary = cache.get(key)
+    if summary is None:
+        summary = compute_daily_summary(report_date, scope)
+        cache.set(key, summary, SUMMARY_CACHE_TIMEOUT)
+    return summary
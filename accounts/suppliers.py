@@ -0,0 +1,53 @@
+"""
+Supplier balances.
+
+Purchases and payments are summed in two independent correlated subqueries,
+one row per supplier each. Joining both tables on the supplier queryset and
+summing would multiply every purchase detail by every payment of the same
+supplier, inflating both totals.
+"""
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import PurchaseDetail, Supplierpay
+
+MONEY = DecimalField(max_digits=14, decimal_places=3)
+
+
+def _total(queryset, group_field, amount_field):
+    """Correlated Sum of amount_field for the outer supplier, or 0."""
+    total = (
+        queryset
+        .order_by()
+        .values(group_field)
+        .annotate(total=Sum(amount_field))
+        .values('total')
+    )
+    return Coalesce(Subquery(total, output_field=MONEY), Value(Decimal('0.000')), output_field=MONEY)
+
+
+def with_balances(suppliers, branch=None):
+    """
+    Annotate suppliers with total_purchase, total_paid and balance,
+    optionally limited to one branch's purchases and payments.
+    """
+    purchases = PurchaseDetail.objects.filter(
+        purchase__supplier=OuterRef('pk'),
+        purchase__delete_status=False,
+    )
+    payments = Supplierpay.objects.filter(
+        supplier=OuterRef('pk'),
+        delete_status=False,
+    )
+    if branch:
+        purchases = purchases.filter(purchase__branch=branch)
+        payments = payments.filter(branch=branch)
+
+    return suppliers.annotate(
+        total_purchase=_total(purchases, 'purchase__supplier', 'total_amount'),
+        total_paid=_total(payments, 'supplier', 'amount'),
+    ).annotate(
+        balance=F('total_purchase') - F('total_paid'),
+    )
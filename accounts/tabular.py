@@ -0,0 +1,82 @@
+"""
+CSV and XLSX downloads of report rows (?export=csv / ?export=xlsx).
+
+Views hand over a header and an iterator of row tuples, normally read from a
+queryset with .iterator(chunk_size=EXPORT_CHUNK_SIZE), so the rows are never
+all in memory. CSV is written to the client as the rows are read through a
+StreamingHttpResponse. XLSX is built by openpyxl in write-only mode, which
+spools rows to a temporary file that is then streamed; XLSX answers 501 on
+an install without openpyxl (see requirements.txt).
+
+Text cells that a spreadsheet would read as a formula (=, +, -, @) get a
+leading apostrophe, so a customer or item name cannot inject one.
+"""
+import csv
+import tempfile
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # pragma: no cover - optional dependency
+    Workbook = None
+
+EXPORT_CHUNK_SIZE = 2000
+TABULAR_FORMATS = ('csv', 'xlsx')
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+XLSX_SHEET_TITLE = 'Report'
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def safe_row(row):
+    """Row with text cells that would start a formula prefixed with an apostrophe."""
+    return [
+        f"'{value}" if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) else value
+        for value in row
+    ]
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(filename, header, rows):
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield '\ufeff'  # lets Excel detect UTF-8
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(safe_row(row))
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = content_disposition_header(True, f'{filename}.csv')
+    return response
+
+
+def stream_xlsx(filename, header, rows):
+    if Workbook is None:
+        return HttpResponse("XLSX export needs the openpyxl package; use CSV instead.", status=501)
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=XLSX_SHEET_TITLE)
+    sheet.append(header)
+    for row in rows:
+        sheet.append(safe_row(row))
+
+    spool = tempfile.TemporaryFile()  # removed when the response closes it
+    workbook.save(spool)
+    spool.seek(0)
+    return FileResponse(spool, as_attachment=True, filename=f'{filename}.xlsx', content_type=XLSX_CONTENT_TYPE)
+
+
+def tabular_export(export_type, filename, header, rows):
+    """Download response for export_type 'csv' or 'xlsx'."""
+    if export_type == 'xlsx':
+        return stream_xlsx(filename, header, rows)
+    return stream_csv(filename, header, rows)
@@ -1,3 +1,1342 @@
-from django.test import TestCase
+import csv
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest.mock import patch
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models.deletion import Collector
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from reportlab import rl_config
+
+from .models import (
+    Branch, CustomUser, Customer, DailyBranchTotals, DailystockUpdate, Expense, ExpenseCategory, ExportJob, Item, ItemBranchPrice, ItemCategory, LivePriceIndex,
+    Purchase, PurchaseDetail, RetailSales, RetailSalesDetails, StockMovement,
+    Supplier, Supplierpay, WholesalePayment, WholesaleSales, WholesaleSalesDetails, YieldPercentage,
+)
+from .balances import (
+    apply_payment, apply_sale, find_balance_mismatches, get_customer_balance,
+    ledger_entries, ledger_opening_balance, rebuild_customer_balances,
+)
+from .exports import (
+    EXPORT_JOB_RETENTION, EXPORT_MAX_AGE, enqueue_export, export_path, purge_exports,
+    run_export_job, stored_export,
+)
+from .pdf import LOGO_PATH, render_to_pdf
+from .tabular import XLSX_CONTENT_TYPE, Workbook
+from .costing import (
+    LivePriceLookup, get_multiplier_map, live_price_keys, refresh_live_prices,
+)
+from .benchmarks import VIEW_BUDGETS, run_view_benchmarks
+from .billing import post_sale_lines
+from .catalog import _snapshots, get_catalog
+from .forms import RetailSalesDetailFormSet
+from .inventory import get_stock, record_movement
+from .log import JsonFormatter, SampleFilter
+from .profiling import RequestProfile, query_shape, rank_views, read_profiles
+from .retail_list import keyset_page
+from .rollups import rebuild_daily_totals, refresh_daily_totals
+from .receipts import (
+    RETAIL_SALE, WHOLESALE_PAYMENT, next_receipt_no, peek_receipt_no,
+)
+from .seed import seed_shop
+from .stock import build_stock_sheet
+from .summary import compute_daily_summary, get_daily_summary
+from .suppliers import with_balances
+from .versions import forget_local_versions
+
+
+class ShopFixtureMixin:
+    """Small helpers to build a branch with items, purchases and sales."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.branch = Branch.objects.create(branch_name='Main', alias='MN', branch_address='Road 1')
+        cls.user = CustomUser.objects.create_user(
+            username='admin', password='pass', role='super_admin', branch=cls.branch
+        )
+        cls.category = ItemCategory.objects.create(
+            category_name='Chicken', include_in_stock_update=True
+        )
+        cls.supplier = Supplier.objects.create(
+            supplier_name='Farm', company_name='Farm Co', address='Village', phone_no='9000000000'
+        )
+        cls.customer = Customer.objects.create(customer_name='Walk-in')
+        cls.today = date.today()
+
+    def setUp(self):
+        # Cached lookups must not leak between rolled-back test transactions
+        cache.clear()
+        forget_local_versions()
+
+    @classmethod
+    def make_items(cls, count, start=0):
+        items = []
+        for n in range(start, start + count):
+            item = Item.objects.create(
+                category=cls.category, name=f'Item {n}', code=str(n + 1), unit='kg'
+            )
+            YieldPercentage.objects.create(
+                item=item, yeild_percentage=Decimal('70.000'), multipler=Decimal('1.400')
+            )
+            DailystockUpdate.objects.create(
+                item=item, branch=cls.branch, date=cls.today - timedelta(days=1),
+                closing_stock=Decimal('2.000')
+            )
+            purchase = Purchase.objects.create(
+                invoice_number=f'INV-{n}', purchase_date=cls.today, supplier=cls.supplier,
+                added_by=cls.user, branch=cls.branch
+            )
+            PurchaseDetail.objects.create(
+                purchase=purchase, purchase_type='kg', category=cls.category, item=item,
+                qty=1, net_weight=Decimal('10.000'), total_amount=Decimal('1000.000')
+            )
+            sale = RetailSales.objects.create(
+                receipt_no=f'MN-{n:04d}', sales_date=cls.today, customer=cls.customer,
+                added_by=cls.user, branch=cls.branch
+            )
+            RetailSalesDetails.objects.create(
+                sales=sale, item=item, qty=1, net_weight=Decimal('3.000'),
+                total_amount=Decimal('600.000')
+            )
+            items.append(item)
+        return items
+
+
+class ExportDirMixin:
+    """Rendered PDF exports go to a temporary directory."""
+
+    def setUp(self):
+        super().setUp()
+        export_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, export_dir)
+        settings_override = override_settings(PDF_EXPORT_DIR=export_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class StockSheetTests(ShopFixtureMixin, TestCase):
+
+    def test_sheet_values(self):
+        item, = self.make_items(1)
+        line = build_stock_sheet([item], self.today, self.branch)[item.id]
+        self.assertEqual(line['opening'], Decimal('2.000'))
+        self.assertEqual(line['purchase'], Decimal('10.000'))
+        self.assertEqual(line['total'], Decimal('12.000'))
+        self.assertEqual(line['sales'], Decimal('3.000'))
+        self.assertEqual(line['multiplier'], Decimal('1.400'))
+
+    def test_sheet_query_count_is_constant(self):
+        items = self.make_items(3)
+        with CaptureQueriesContext(connection) as few:
+            build_stock_sheet(items, self.today, self.branch)
+
+        items += self.make_items(30, start=3)
+        with CaptureQueriesContext(connection) as many:
+            build_stock_sheet(items, self.today, self.branch)
+
+        self.assertEqual(len(few), len(many))
+
+    def test_daily_stock_update_query_count_is_constant(self):
+        self.client.force_login(self.user)
+        url = reverse('daily_stock_update') + f'?branch={self.branch.pk}'
+
+        self.make_items(3)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+
+        self.make_items(30, start=3)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(few), len(many))
+
+
+class ProfitReportTests(ShopFixtureMixin, TestCase):
+
+    def test_item_wise_profit_query_count_is_constant(self):
+        self.client.force_login(self.user)
+        url = reverse('item_wise_profit_report')
+
+        self.make_items(3)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+
+        self.make_items(30, start=3)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(few), len(many))
+
+
+class StockLedgerTests(ShopFixtureMixin, TestCase):
+
+    def test_movements_update_branch_balance_and_item_total(self):
+        item = Item.objects.create(category=self.category, name='Breast', code='B1', unit='kg')
+        other = Branch.objects.create(branch_name='Second', alias='SC', branch_address='Road 2')
+
+        record_movement(item, self.branch, Decimal('10.000'), 'purchase', 'INV-1')
+        record_movement(item, self.branch, Decimal('-2.500'), 'retail_sale', 'MN-0001')
+        record_movement(item, other, Decimal('4.000'), 'purchase', 'INV-2')
+
+        self.assertEqual(get_stock(item, self.branch), Decimal('7.500'))
+        self.assertEqual(get_stock(item, other), Decimal('4.000'))
+        item.refresh_from_db()
+        self.assertEqual(item.stock, Decimal('11.50'))
+        self.assertEqual(StockMovement.objects.filter(item=item).count(), 3)
+
+    def test_purchase_edit_moves_only_changed_lines(self):
+        self.category.is_weight_based = True
+        self.category.save()
+        kept, changed = (
+            Item.objects.create(category=self.category, name=name, code=name, unit='kg')
+            for name in ('Kept', 'Changed')
+        )
+        purchase = Purchase.objects.create(
+            invoice_number='INV-E', purchase_date=self.today, supplier=self.supplier,
+            added_by=self.user, branch=self.branch
+        )
+        details = [
+            PurchaseDetail.objects.create(
+                purchase=purchase, purchase_type='retail', category=self.category, item=item,
+                qty=1, gross_weight=Decimal('5.000'), empty_weight=0, net_weight=Decimal('5.000'),
+                purchase_price=100, total_amount=Decimal('500.000')
+            )
+            for item in (kept, changed)
+        ]
+        for item in (kept, changed):
+            record_movement(item, self.branch, Decimal('5.000'), 'purchase', 'INV-E')
+
+        data = {
+            'invoice_number': 'INV-E', 'purchase_date': self.today.isoformat(),
+            'supplier': self.supplier.pk, 'branch': self.branch.pk,
+            'details-TOTAL_FORMS': 2, 'details-INITIAL_FORMS': 2,
+        }
+        for n, (detail, weight) in enumerate(zip(details, ('5.000', '7.000'))):
+            data.update({
+                f'details-{n}-id': detail.pk, f'details-{n}-purchase': purchase.pk,
+                f'details-{n}-purchase_type': 'retail', f'details-{n}-category': self.category.pk,
+                f'details-{n}-item': detail.item_id, f'details-{n}-purchase_price': '100',
+                f'details-{n}-qty': 1, f'details-{n}-gross_weight': weight,
+                f'details-{n}-empty_weight': 0, f'details-{n}-net_weight': weight,
+                f'details-{n}-total_amount': '500',
+            })
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('purchase_view', args=[purchase.pk]), data)
+
+        self.assertRedirects(response, reverse('purchase_list'), fetch_redirect_response=False)
+        self.assertEqual(StockMovement.objects.filter(item=kept).count(), 1)
+        self.assertEqual(StockMovement.objects.filter(item=changed).count(), 3)
+        self.assertEqual(get_stock(kept, self.branch), Decimal('5.000'))
+        self.assertEqual(get_stock(changed, self.branch), Decimal('7.000'))
+
+
+class LivePriceIndexTests(ShopFixtureMixin, TestCase):
+
+    def add_live_purchase(self, invoice, day, weight, amount):
+        item = Item.objects.get_or_create(
+            code='LIVE', defaults={'category': self.category, 'name': 'Live Bird', 'unit': 'kg', 'is_live': True}
+        )[0]
+        purchase = Purchase.objects.create(
+            invoice_number=invoice, purchase_date=day, supplier=self.supplier,
+            added_by=self.user, branch=self.branch
+        )
+        PurchaseDetail.objects.create(
+            purchase=purchase, purchase_type='kg', category=self.category, item=item,
+            qty=1, net_weight=Decimal(weight), total_amount=Decimal(amount)
+        )
+        refresh_live_prices(live_price_keys(purchase))
+        return purchase
+
+    def test_price_carries_forward_into_range(self):
+        day = self.today - timedelta(days=10)
+        self.add_live_purchase('L-1', day, '100.000', '12000.000')
+        self.add_live_purchase('L-2', day + timedelta(days=5), '50.000', '6500.000')
+
+        prices = LivePriceLookup(day + timedelta(days=2), self.today)
+        cid, bid = self.category.pk, self.branch.pk
+        self.assertEqual(prices.get(cid, day + timedelta(days=3), bid), Decimal('120.000'))
+        self.assertEqual(prices.get(cid, day + timedelta(days=5), bid), Decimal('130.000'))
+        self.assertEqual(prices.get(cid, self.today, bid), Decimal('130.000'))
+        self.assertEqual(prices.get(cid, day - timedelta(days=1), bid), Decimal('0.000'))
+
+    def test_refresh_updates_existing_row(self):
+        self.add_live_purchase('L-1', self.today, '10.000', '1000.000')
+        self.add_live_purchase('L-2', self.today, '30.000', '3400.000')
+
+        row = LivePriceIndex.objects.get(category=self.category, branch=self.branch, date=self.today)
+        self.assertEqual(row.total_weight, Decimal('40.000'))
+        self.assertEqual(row.price_per_kg, Decimal('110.000'))
+
+    def test_deleted_purchase_drops_index_row(self):
+        purchase = self.add_live_purchase('L-1', self.today, '10.000', '1000.000')
+        keys = live_price_keys(purchase)
+        purchase.delete_status = True
+        purchase.save()
+        refresh_live_prices(keys)
+
+        prices = LivePriceLookup(self.today, self.today)
+        self.assertEqual(prices.get(self.category.pk, self.today, self.branch.pk), Decimal('0.000'))
+
+
+class YieldMultiplierCacheTests(ShopFixtureMixin, TestCase):
+
+    def test_saving_yield_percentage_invalidates_map(self):
+        item, = self.make_items(1)
+        self.assertEqual(get_multiplier_map()[item.id], Decimal('1.400'))
+        with self.assertNumQueries(0):
+            get_multiplier_map()
+
+        yp = YieldPercentage.objects.get(item=item)
+        yp.multipler = Decimal('1.500')
+        yp.save()
+        self.assertEqual(get_multiplier_map()[item.id], Decimal('1.500'))
+
+
+class CustomerBalanceTests(ShopFixtureMixin, TestCase):
+
+    def test_balance_follows_sales_and_payments(self):
+        customer = Customer.objects.create(
+            customer_name='Hotel', whole_sale=True, opening_balance=Decimal('100.000')
+        )
+        apply_sale(customer, Decimal('500.000'), self.branch.pk, self.today)
+        apply_payment(customer, Decimal('200.000'), self.branch.pk, self.today)
+        self.assertEqual(get_customer_balance(customer.pk), Decimal('400.000'))
+
+        apply_payment(customer, Decimal('-200.000'), self.branch.pk, self.today)
+        self.assertEqual(get_customer_balance(customer.pk), Decimal('600.000'))
+
+    def test_repeated_delete_reverses_once(self):
+        customer = Customer.objects.create(customer_name='Hotel', whole_sale=True)
+        sale = WholesaleSales.objects.create(
+            receipt_no='MN-W-0001', sales_date=self.today, customer=customer,
+            added_by=self.user, branch=self.branch, grand_total=Decimal('750.000'),
+            paid_amount=Decimal('0.00')
+        )
+        payment = WholesalePayment.objects.create(
+            customer=customer, branch=self.branch, payment_date=self.today, amount=Decimal('300.000'),
+            added_by=self.user
+        )
+        rebuild_customer_balances()
+        self.client.force_login(self.user)
+
+        for _ in range(2):
+            self.client.post(reverse('wholesale_payment_delete', args=[payment.pk]))
+        self.assertEqual(get_customer_balance(customer.pk), Decimal('750.000'))
+
+        self.client.post(reverse('wholesale_sales_delete', args=[sale.pk]))
+        response = self.client.post(reverse('wholesale_sales_delete', args=[sale.pk]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(get_customer_balance(customer.pk), Decimal('0.000'))
+
+    def test_mismatch_detected_and_rebuilt(self):
+        customer = Customer.objects.create(customer_name='Hotel', whole_sale=True)
+        WholesaleSales.objects.create(
+            receipt_no='MN-W-0001', sales_date=self.today, customer=customer,
+            added_by=self.user, branch=self.branch, grand_total=Decimal('750.000'),
+            paid_amount=Decimal('0.00')
+        )
+        self.assertEqual(len(find_balance_mismatches()), 1)
+
+        rebuild_customer_balances()
+        self.assertEqual(find_balance_mismatches(), [])
+        self.assertEqual(get_customer_balance(customer.pk), Decimal('750.000'))
+
+
+class LedgerCheckpointTests(ShopFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.customer = Customer.objects.create(
+            customer_name='Hotel', whole_sale=True, opening_balance=Decimal('50.000')
+        )
+        self.other = Branch.objects.create(branch_name='Second', alias='SC', branch_address='Road 2')
+
+    def sell(self, day, amount, branch=None):
+        branch = branch or self.branch
+        sale = WholesaleSales.objects.create(
+            receipt_no=f'W-{WholesaleSales.objects.count() + 1}', sales_date=day,
+            customer=self.customer, added_by=self.user, branch=branch,
+            grand_total=Decimal(amount), paid_amount=Decimal('0.00')
+        )
+        apply_sale(self.customer, sale.grand_total, sale.branch_id, day)
+        return sale
+
+    def pay(self, day, amount, branch=None):
+        payment = WholesalePayment.objects.create(
+            receipt_no=f'P-{WholesalePayment.objects.count() + 1}', payment_date=day,
+            customer=self.customer, amount=Decimal(amount), branch=branch, added_by=self.user
+        )
+        apply_payment(self.customer, payment.amount, payment.branch_id, day)
+        return payment
+
+    def naive_opening(self, from_date, branch=None):
+        sales = WholesaleSales.objects.filter(
+            customer=self.customer, delete_status=False, sales_date__lt=from_date
+        )
+        payments = WholesalePayment.objects.filter(
+            customer=self.customer, delete_status=False, payment_date__lt=from_date
+        )
+        if branch:
+            sales = sales.filter(branch=branch)
+            payments = payments.filter(branch=branch)
+        return (
+            self.customer.opening_balance
+            + sum((s.grand_total for s in sales), Decimal('0'))
+            - sum((p.amount for p in payments), Decimal('0'))
+        )
+
+    def test_opening_balance_matches_full_history(self):
+        start = date(2025, 1, 10)
+        self.sell(start, '1000.000')
+        self.pay(start + timedelta(days=3), '400.00', self.branch)
+        self.sell(start + timedelta(days=40), '300.000', self.other)
+        self.pay(start + timedelta(days=45), '100.00')
+
+        march = date(2025, 3, 5)
+        for branch_ids, branch in ((None, None), ([self.branch.pk], self.branch)):
+            self.assertEqual(
+                ledger_opening_balance(self.customer, march, branch_ids),
+                self.naive_opening(march, branch),
+            )
+
+        # Checkpoints now exist; later documents before them must shift them
+        late = self.sell(date(2025, 2, 20), '250.000')
+        self.assertEqual(ledger_opening_balance(self.customer, march), self.naive_opening(march))
+        late.delete_status = True
+        late.save()
+        apply_sale(self.customer, -late.grand_total, late.branch_id, late.sales_date)
+        self.assertEqual(ledger_opening_balance(self.customer, march), self.naive_opening(march))
+
+        # A later month builds on the March checkpoint
+        self.assertEqual(
+            ledger_opening_balance(self.customer, date(2025, 6, 1)),
+            self.naive_opening(date(2025, 6, 1)),
+        )
+
+    def test_entries_are_ordered_by_date_sales_first(self):
+        day = date(2025, 1, 10)
+        self.pay(day, '100.00', self.branch)
+        self.sell(day + timedelta(days=1), '200.000')
+        self.sell(day, '300.000')
+
+        entries = list(ledger_entries(self.customer, day, day + timedelta(days=1)))
+        self.assertEqual(
+            [(e['date'], e['kind'], e['amount']) for e in entries],
+            [
+                (day, 'sale', Decimal('300.000')),
+                (day, 'payment', Decimal('100.00')),
+                (day + timedelta(days=1), 'sale', Decimal('200.000')),
+            ],
+        )
+        self.assertEqual(entries[1]['payment_mode'], 'cash')
+
+
+class ReceiptSequenceTests(ShopFixtureMixin, TestCase):
+
+    def test_sequence_continues_after_existing_receipts(self):
+        self.make_items(2)  # retail receipts MN-0000 and MN-0001
+        RetailSales.objects.create(
+            receipt_no='MN-10000', sales_date=self.today, customer=self.customer,
+            added_by=self.user, branch=self.branch
+        )
+        self.assertEqual(peek_receipt_no(self.branch, RETAIL_SALE), 'MN-10001')
+        self.assertEqual(next_receipt_no(self.branch, RETAIL_SALE), 'MN-10001')
+        self.assertEqual(next_receipt_no(self.branch, RETAIL_SALE), 'MN-10002')
+        self.assertEqual(peek_receipt_no(self.branch, RETAIL_SALE), 'MN-10003')
+
+    def test_document_types_and_manual_numbers(self):
+        WholesalePayment.objects.create(
+            receipt_no='MN-WP-0001', payment_date=self.today, customer=self.customer,
+            amount=Decimal('10.00'), branch=self.branch, added_by=self.user
+        )
+        self.assertEqual(next_receipt_no(self.branch, RETAIL_SALE), 'MN-0001')
+        self.assertEqual(next_receipt_no(self.branch, WHOLESALE_PAYMENT), 'MN-WP-0002')
+        self.assertEqual(next_receipt_no(None, WHOLESALE_PAYMENT), 'XX-WP-0001')
+
+    def test_payment_without_receipt_gets_next_number(self):
+        self.customer.whole_sale = True
+        self.customer.save()
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('wholesale_payment_add'), {
+            'receipt_no': '', 'customer': self.customer.pk, 'payment_date': self.today,
+            'amount': '25.00', 'payment_mode': 'cash', 'branch': self.branch.pk,
+        })
+        payment = WholesalePayment.objects.get()
+        self.assertRedirects(response, reverse('wholesale_payment_receipt', args=[payment.pk]))
+        self.assertEqual(payment.receipt_no, 'MN-WP-0001')
+        self.assertEqual(get_customer_balance(self.customer.pk), Decimal('-25.000'))
+
+
+class SalePostingTests(ShopFixtureMixin, TestCase):
+
+    def line_data(self, items, weight='1.500'):
+        data = {
+            'form-TOTAL_FORMS': str(len(items)), 'form-INITIAL_FORMS': '0',
+            'form-MIN_NUM_FORMS': '0', 'form-MAX_NUM_FORMS': '1000',
+        }
+        for n, item in enumerate(items):
+            data.update({
+                f'form-{n}-item': item.pk, f'form-{n}-qty': '1', f'form-{n}-net_weight': weight,
+                f'form-{n}-tax_percentage': '0', f'form-{n}-price_per_unit': '200',
+                f'form-{n}-total_amount': '300',
+            })
+        return data
+
+    def post(self, items, receipt_no, weight='1.500'):
+        formset = RetailSalesDetailFormSet(self.line_data(items, weight))
+        self.assertTrue(formset.is_valid(), formset.errors)
+        sale = RetailSales.objects.create(
+            receipt_no=receipt_no, sales_date=self.today, customer=self.customer,
+            added_by=self.user, branch=self.branch
+        )
+        return sale, post_sale_lines(sale, formset, 'retail_sale', self.user)
+
+    def test_lines_saved_and_stock_deducted(self):
+        items = self.make_items(2)
+        for item in items:
+            record_movement(item, self.branch, Decimal('10.000'), 'purchase')
+
+        sale, shortages = self.post(items + [items[0]], 'MN-9001')
+        self.assertEqual(shortages, [])
+        self.assertEqual(sale.details.count(), 3)
+        self.assertEqual(get_stock(items[0], self.branch), Decimal('7.000'))
+        self.assertEqual(get_stock(items[1], self.branch), Decimal('8.500'))
+        self.assertEqual(StockMovement.objects.filter(reference='MN-9001').count(), 2)
+
+        _, shortages = self.post([items[1]], 'MN-9002', weight='9.000')
+        self.assertEqual([item for item, _ in shortages], [items[1]])
+
+    def test_query_count_does_not_grow_with_lines(self):
+        items = self.make_items(20)
+        formsets = [RetailSalesDetailFormSet(self.line_data(items[:n])) for n in (2, 20)]
+        counts = []
+        for n, formset in enumerate(formsets):
+            self.assertTrue(formset.is_valid())
+            sale = RetailSales.objects.create(
+                receipt_no=f'MN-80{n}', sales_date=self.today, customer=self.customer,
+                added_by=self.user, branch=self.branch
+            )
+            with CaptureQueriesContext(connection) as queries:
+                post_sale_lines(sale, formset, 'retail_sale', self.user)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class SearchTests(ShopFixtureMixin, TestCase):
+
+    def test_item_search_ranks_code_and_prefix_matches_first(self):
+        Item.objects.create(category=self.category, name='Boneless Breast', code='BB1', unit='kg')
+        Item.objects.create(category=self.category, name='Breast', code='BR', unit='kg')
+        Item.objects.create(category=self.category, name='Leg', code='BREAST', unit='kg')
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('search_items'), {'q': 'breast', 'limit': 2})
+        self.assertEqual([row['code'] for row in response.json()], ['BREAST', 'BR'])
+        self.assertEqual(response['X-Next-Offset'], '2')
+
+        response = self.client.get(reverse('search_items'), {'q': 'breast', 'offset': 2})
+        self.assertEqual([row['code'] for row in response.json()], ['BB1'])
+        self.assertFalse(response.has_header('X-Next-Offset'))
+
+    def test_customer_search_prefix_first(self):
+        Customer.objects.create(customer_name='Hotel Ravi', customer_phone='9111')
+        Customer.objects.create(customer_name='Ravi Stores', customer_phone='9222')
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('search_customers'), {'q': 'ravi'})
+        self.assertEqual([row['name'] for row in response.json()], ['Ravi Stores', 'Hotel Ravi'])
+
+
+class CatalogTests(ShopFixtureMixin, TestCase):
+
+    def test_lookups_served_from_memory_until_prices_change(self):
+        item = Item.objects.create(
+            category=self.category, name='Breast', code='BR', unit='kg',
+            price_per_unit_retail=Decimal('250.00')
+        )
+        self.client.force_login(self.user)
+        url = reverse('item_by_code')
+        params = {'code': 'BR', 'branch_id': self.branch.pk}
+
+        first = self.client.get(url, params)
+        self.assertEqual(first.json()['price'], '250.00')
+        self.client.get(reverse('item_details', args=[item.pk]))
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(url, params, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.client.get(url, params)
+            self.client.get(reverse('item_details', args=[item.pk]))
+        self.assertEqual(second.status_code, 304)
+        self.assertFalse([q for q in queries if 'accounts_item' in q['sql']])
+
+        ItemBranchPrice.objects.create(
+            item=item, branch=self.branch,
+            price_per_unit_retail=Decimal('270.00'), price_per_unit_wholesale=Decimal('240.00')
+        )
+        third = self.client.get(url, params, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(third.status_code, 200)
+        self.assertEqual(third.json()['price'], '270.00')
+        self.assertNotEqual(third['ETag'], first['ETag'])
+
+    def test_unknown_branch_shares_default_snapshot(self):
+        self.assertIs(get_catalog(987654), get_catalog(None))
+        self.assertNotIn(987654, _snapshots)
+        self.assertEqual(get_catalog(self.branch.pk).branch_id, self.branch.pk)
+        with self.assertNumQueries(0):
+            get_catalog(987654)
+
+        branch = Branch.objects.create(branch_name='Second', alias='SC', branch_address='Road 2')
+        self.assertEqual(get_catalog(branch.pk).branch_id, branch.pk)
+
+    def test_other_processes_see_a_change_after_the_check_interval(self):
+        self.make_items(1)
+        snapshot = get_catalog(self.branch.pk)
+        with self.assertNumQueries(0):
+            get_catalog(self.branch.pk)
+
+        cache.delete('catalog:version')  # as replaced by another process
+        self.assertIs(get_catalog(self.branch.pk), snapshot)
+        with patch('accounts.versions.time.monotonic', return_value=time.monotonic() + 60):
+            self.assertIsNot(get_catalog(self.branch.pk), snapshot)
+
+
+class CatalogPriceTests(ShopFixtureMixin, TestCase):
+
+    def test_branch_prices_override_item_prices(self):
+        items = self.make_items(3)
+        for item in items:
+            item.price_per_unit_retail = Decimal('200.00')
+            item.save()
+        ItemBranchPrice.objects.create(
+            item=items[0], branch=self.branch,
+            price_per_unit_retail=Decimal('210.00'), price_per_unit_wholesale=Decimal('190.00')
+        )
+
+        by_id = get_catalog(self.branch.pk).by_id
+        self.assertEqual((by_id[items[0].pk]['price'], by_id[items[0].pk]['wholesale_price']), ('210.00', '190.00'))
+        self.assertEqual(by_id[items[1].pk]['price'], '200.00')
+        with self.assertNumQueries(0):
+            get_catalog(self.branch.pk)
+
+        ItemBranchPrice.objects.filter(item=items[0]).get().delete()
+        self.assertEqual(get_catalog(self.branch.pk).by_id[items[0].pk]['price'], '200.00')
+        self.assertEqual(get_catalog(None).by_id[items[0].pk]['wholesale_price'], '0.00')
+
+
+class BranchPriceManageTests(ShopFixtureMixin, TestCase):
+
+    def test_only_changed_rows_are_written(self):
+        items = self.make_items(3)
+        ItemBranchPrice.objects.create(
+            item=items[0], branch=self.branch,
+            price_per_unit_retail=Decimal('210.00'), price_per_unit_wholesale=Decimal('190.00')
+        )
+        ItemBranchPrice.objects.create(
+            item=items[1], branch=self.branch,
+            price_per_unit_retail=Decimal('100.00'), price_per_unit_wholesale=Decimal('90.00')
+        )
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('branch_price_manage', args=[self.branch.pk]), {
+            f'retail_{items[0].pk}': '210.00', f'wholesale_{items[0].pk}': '190',
+            f'retail_{items[1].pk}': '105', f'wholesale_{items[1].pk}': '95',
+            f'retail_{items[2].pk}': '300', f'wholesale_{items[2].pk}': '',
+        }, follow=True)
+
+        self.assertContains(response, 'Updated branch prices for 2 items.')
+        prices = {
+            bp.item_id: (bp.price_per_unit_retail, bp.price_per_unit_wholesale)
+            for bp in ItemBranchPrice.objects.filter(branch=self.branch)
+        }
+        self.assertEqual(prices[items[1].pk], (Decimal('105.00'), Decimal('95.00')))
+        self.assertEqual(prices[items[2].pk], (Decimal('300.00'), Decimal('0.00')))
+        self.assertEqual(len(prices), 3)
+
+
+class DailyTotalsTests(ShopFixtureMixin, TestCase):
+
+    def test_rollup_follows_sales_and_feeds_dashboard(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            sale = RetailSales.objects.create(
+                receipt_no='MN-0001', sales_date=self.today, customer=self.customer,
+                added_by=self.user, branch=self.branch, grand_total=Decimal('500.000'),
+                total_cash=Decimal('300.000'), total_upi=Decimal('200.000')
+            )
+        row = DailyBranchTotals.objects.get(branch=self.branch, date=self.today)
+        self.assertEqual((row.retail_total, row.retail_cash, row.retail_upi),
+                         (Decimal('500.000'), Decimal('300.000'), Decimal('200.000')))
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['today_sales'], Decimal('500.000'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sale.delete_status = True
+            sale.save()
+        self.assertFalse(DailyBranchTotals.objects.exists())
+
+    def test_moved_bill_refreshes_both_days(self):
+        yesterday = self.today - timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            purchase = Purchase.objects.create(
+                invoice_number='INV-1', purchase_date=yesterday, supplier=self.supplier,
+                added_by=self.user, branch=self.branch, grand_total=Decimal('900.000')
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            purchase.purchase_date = self.today
+            purchase.save()
+
+        row = DailyBranchTotals.objects.get()
+        self.assertEqual((row.date, row.purchase_total), (self.today, Decimal('900.000')))
+
+        refresh_daily_totals({(self.branch.pk, self.today)})
+        self.assertEqual(DailyBranchTotals.objects.get().purchase_total, Decimal('900.000'))
+
+    def test_rebuild_matches_history(self):
+        self.make_items(2)
+        RetailSales.objects.update(grand_total=Decimal('600.000'))
+        self.assertEqual(rebuild_daily_totals(), 1)
+        row = DailyBranchTotals.objects.get()
+        self.assertEqual(row.retail_total, Decimal('1200.000'))
+
+
+class DailySummaryTests(ShopFixtureMixin, TestCase):
+
+    def live_weight(self, detail):
+        """Live weight of a sold line as the Python reports used to compute it."""
+        if detail.item.is_live:
+            return detail.net_weight
+        multiplier = get_multiplier_map().get(detail.item_id, Decimal('1.000'))
+        return (detail.net_weight * multiplier).quantize(Decimal('0.001'))
+
+    def test_live_weights_computed_in_sql(self):
+        self.make_items(2)
+        live = Item.objects.create(category=self.category, name='Live', code='LV', unit='kg', is_live=True)
+        sale = RetailSales.objects.get(receipt_no='MN-0000')
+        RetailSalesDetails.objects.create(
+            sales=sale, item=live, qty=2, net_weight=Decimal('5.000'), total_amount=Decimal('500.000')
+        )
+
+        summary = compute_daily_summary(self.today, self.branch.pk)
+        expected = sum(
+            (self.live_weight(d) for d in RetailSalesDetails.objects.select_related('item')),
+            Decimal('0.000'),
+        )
+        self.assertEqual(summary['total_retail_live_weight'], expected)
+        self.assertEqual(summary['total_retail_live_weight'], Decimal('13.400'))
+        self.assertEqual(summary['total_purchase_live_weight'], Decimal('28.000'))
+        self.assertEqual(summary['total_retail_qty'], 4)
+        self.assertEqual(summary['total_purchase_weight'], Decimal('20.000'))
+
+    def test_live_weight_ties_round_to_even(self):
+        item = Item.objects.create(category=self.category, name='Curry cut', code='CC', unit='kg')
+        YieldPercentage.objects.create(item=item, yeild_percentage=Decimal('80.000'), multipler=Decimal('1.250'))
+        sale = RetailSales.objects.create(
+            receipt_no='MN-T', sales_date=self.today, customer=self.customer,
+            added_by=self.user, branch=self.branch
+        )
+        for weight in ('1.250', '1.750'):  # × 1.25 = 1.5625 and 2.1875
+            RetailSalesDetails.objects.create(
+                sales=sale, item=item, qty=1, net_weight=Decimal(weight), total_amount=Decimal('100.000')
+            )
+
+        summary = compute_daily_summary(self.today, self.branch.pk)
+        self.assertEqual(summary['total_retail_live_weight'], Decimal('1.562') + Decimal('2.188'))
+        self.assertEqual(
+            summary['total_retail_live_weight'],
+            sum(self.live_weight(d) for d in RetailSalesDetails.objects.select_related('item')),
+        )
+
+    def test_cached_until_a_document_of_the_day_changes(self):
+        self.make_items(1)
+        self.assertEqual(get_daily_summary(self.today, self.branch.pk)['total_retail_weight'], Decimal('3.000'))
+        with self.assertNumQueries(2):  # the generation and the summary from the cache table
+            get_daily_summary(self.today, self.branch.pk)
+
+        sale = RetailSales.objects.get()
+        sale.delete_status = True
+        sale.save()
+        self.assertEqual(get_daily_summary(self.today, self.branch.pk)['total_retail_weight'], Decimal('0.000'))
+
+
+class SupplierBalanceTests(ShopFixtureMixin, TestCase):
+
+    def naive_balances(self, branch=None):
+        rows = {}
+        for supplier in Supplier.objects.all():
+            details = PurchaseDetail.objects.filter(purchase__supplier=supplier, purchase__delete_status=False)
+            payments = Supplierpay.objects.filter(supplier=supplier, delete_status=False)
+            if branch:
+                details = details.filter(purchase__branch=branch)
+                payments = payments.filter(branch=branch)
+            purchased = sum((d.total_amount for d in details), Decimal('0'))
+            paid = sum((p.amount for p in payments), Decimal('0'))
+            rows[supplier.pk] = (purchased, paid, purchased - paid)
+        return rows
+
+    def test_matches_naive_reference(self):
+        self.make_items(3)  # three purchases of 1000 from Farm in Main
+        other = Branch.objects.create(branch_name='Other', alias='OT', branch_address='Road 2')
+        idle = Supplier.objects.create(
+            supplier_name='Idle', company_name='Idle Co', address='Town', phone_no='9000000001'
+        )
+        purchase = Purchase.objects.get(invoice_number='INV-0')
+        PurchaseDetail.objects.create(
+            purchase=purchase, purchase_type='kg', category=self.category, item=purchase.details.get().item,
+            qty=1, net_weight=Decimal('1.000'), total_amount=Decimal('250.000')
+        )
+        Purchase.objects.filter(invoice_number='INV-2').update(branch=other)
+        Purchase.objects.create(
+            invoice_number='INV-X', purchase_date=self.today, supplier=self.supplier,
+            added_by=self.user, branch=self.branch, delete_status=True
+        )
+        for amount, branch, deleted in [
+            ('400.00', self.branch, False), ('100.00', self.branch, False),
+            ('50.00', other, False), ('999.00', self.branch, True),
+        ]:
+            Supplierpay.objects.create(
+                supplier=self.supplier, payment_date=self.today, amount=Decimal(amount),
+                branch=branch, delete_status=deleted
+            )
+
+        for branch in (None, self.branch, other):
+            expected = self.naive_balances(branch)
+            rows = with_balances(Supplier.objects.all(), branch)
+            actual = {s.pk: (s.total_purchase, s.total_paid, s.balance) for s in rows}
+            self.assertEqual(actual, expected)
+
+        farm = with_balances(Supplier.objects.all()).get(pk=self.supplier.pk)
+        self.assertEqual(farm.total_purchase, Decimal('3250'))  # not × number of payments
+        self.assertEqual(farm.total_paid, Decimal('550'))  # not × number of purchase lines
+        self.assertEqual(with_balances(Supplier.objects.all()).get(pk=idle.pk).balance, Decimal('0'))
+
+    def test_query_count_does_not_grow_with_documents(self):
+        self.make_items(2)
+        with CaptureQueriesContext(connection) as few:
+            list(with_balances(Supplier.objects.all()))
+
+        self.make_items(10, start=2)
+        for _ in range(10):
+            Supplierpay.objects.create(supplier=self.supplier, payment_date=self.today, amount=Decimal('10.00'))
+        with CaptureQueriesContext(connection) as many:
+            list(with_balances(Supplier.objects.all()))
+
+        self.assertEqual(len(few), 1)
+        self.assertEqual(len(many), 1)
+
+
+class ReportIndexTests(ShopFixtureMixin, TestCase):
+
+    def index_names(self):
+        with connection.cursor() as cursor:
+            return set().union(*(
+                connection.introspection.get_constraints(cursor, model._meta.db_table)
+                for model in (RetailSales, WholesaleSales, Supplierpay)
+            ))
+
+    def test_benchmark_restores_dropped_indexes(self):
+        self.make_items(2)
+        WholesaleSales.objects.create(
+            receipt_no='MN-W-0001', sales_date=self.today, customer=self.customer,
+            added_by=self.user, branch=self.branch, paid_amount=Decimal('0.00')
+        )
+        Supplierpay.objects.create(supplier=self.supplier, payment_date=self.today, amount=Decimal('10.00'))
+        self.assertLessEqual(
+            {'retailsales_branch_date', 'wholesale_customer_date', 'supplierpay_supplier'}, self.index_names()
+        )
+
+        out = StringIO()
+        call_command('benchmark_indexes', '--compare', '--plans', '--repeat', '1', stdout=out)
+
+        self.assertIn('retail list page', out.getvalue())
+        self.assertIn('no index:', out.getvalue())
+        self.assertLessEqual(
+            {'retailsales_branch_date', 'wholesale_customer_date', 'supplierpay_supplier'}, self.index_names()
+        )
+
+
+class SeedShopTests(TestCase):
+    END = date(2026, 1, 31)
+
+    def sales_of_seed(self, seed):
+        return list(
+            RetailSales.objects.filter(branch__alias__startswith=f'S{seed}B')
+            .order_by('id').values_list('receipt_no', 'sales_date', 'grand_total', 'payment_mode', 'delete_status')
+        )
+
+    def test_same_seed_gives_same_documents(self):
+        with transaction.atomic():
+            counts = seed_shop(self.END, 3, 2, 10, seed=5)
+            first = self.sales_of_seed(5)
+            transaction.set_rollback(True)
+
+        seed_shop(self.END, 3, 2, 10, seed=5)
+        self.assertEqual(self.sales_of_seed(5), first)
+        self.assertEqual(counts['RetailSales'], len(first))
+        self.assertEqual(counts['Branch'], 2)
+        self.assertEqual({day for _, day, *_ in first}, {self.END - timedelta(days=n) for n in range(3)})
+        self.assertIsNone(seed_shop(self.END, 3, 2, 10, seed=5))
+
+    def test_derived_tables_match_documents(self):
+        out = StringIO()
+        call_command('seed_shop', '--days', '4', '--bills', '5', '--end', '2026-01-31', stdout=out)
+        self.assertIn('Seeded', out.getvalue())
+        self.assertEqual(find_balance_mismatches(), [])
+        stored = {(t.branch_id, t.date): t.retail_total for t in DailyBranchTotals.objects.all()}
+        rebuild_daily_totals()
+        self.assertEqual({(t.branch_id, t.date): t.retail_total for t in DailyBranchTotals.objects.all()}, stored)
+
+        with self.assertRaises(CommandError):
+            call_command('seed_shop', '--end', '2026-01-31', stdout=StringIO())
+
+
+class ViewBudgetTests(TestCase):
+
+    def test_heavy_views_stay_within_query_budgets(self):
+        seed_shop(date(2026, 1, 31), 3, 2, 5, seed=3)
+        user = CustomUser.objects.get(username='seed_shop')
+
+        results = run_view_benchmarks(user, repeat=1)
+
+        self.assertEqual([r['view'] for r in results], list(VIEW_BUDGETS))
+        for result in results:
+            with self.subTest(view=result['view']):
+                self.assertEqual(result['status'], 200)
+                self.assertGreater(result['queries'], 0)
+                self.assertLessEqual(result['queries'], VIEW_BUDGETS[result['view']][0])
+
+    def test_command_appends_history(self):
+        seed_shop(date(2026, 1, 31), 2, 1, 3, seed=4)
+        history = os.path.join(tempfile.mkdtemp(), 'views.jsonl')
+        self.addCleanup(shutil.rmtree, os.path.dirname(history))
+
+        for _ in range(2):
+            call_command('benchmark_views', 'dashboard', '--repeat', '1', '--history', history, stdout=StringIO())
+
+        with open(history) as f:
+            runs = [json.loads(line) for line in f]
+        self.assertEqual(len(runs), 2)
+        self.assertEqual([r['view'] for r in runs[1]['results']], ['dashboard'])
+
+
+class RetailSalesListTests(ShopFixtureMixin, TestCase):
+
+    def make_sales(self, count):
+        for n in range(count):
+            RetailSales.objects.create(
+                receipt_no=f'MN-{n:04d}', sales_date=self.today - timedelta(days=n % 3),
+                customer=self.customer, added_by=self.user, branch=self.branch,
+                grand_total=Decimal('100.000'), total_cash=Decimal('100.000'),
+            )
+
+    def test_keyset_pages_cover_every_sale_once(self):
+        self.make_sales(11)
+        seen, cursor = [], None
+        while True:
+            rows, cursor = keyset_page(RetailSales.objects.all(), cursor, 4)
+            seen += rows
+            if not cursor:
+                break
+        expected = list(RetailSales.objects.order_by('-sales_date', '-id'))
+        self.assertEqual(seen, expected)
+
+    def test_page_queries_do_not_grow_with_range(self):
+        self.client.force_login(self.user)
+        url = reverse('retail_sales_list')
+        params = {'from_date': str(self.today - timedelta(days=5)), 'to_date': str(self.today)}
+        self.make_sales(3)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url, params)
+
+        self.make_sales(150)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url, params)
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(len(response.context['sales']), 100)
+        self.assertIn('after=', response.context['sales_next_url'])
+
+    def test_totals_cover_whole_range_and_are_cached(self):
+        self.client.force_login(self.user)
+        self.make_sales(150)
+        url = reverse('retail_sales_totals')
+        params = {'from_date': str(self.today - timedelta(days=5)), 'to_date': str(self.today)}
+        self.assertEqual(self.client.get(url, params).json()['total_grand'], '15000.00')
+
+        with CaptureQueriesContext(connection) as cached:
+            self.client.get(url, params)
+        self.assertFalse(any('accounts_retailsales' in q['sql'] for q in cached))
+
+        sale = RetailSales.objects.first()
+        sale.delete_status = True
+        sale.save()
+        self.assertEqual(self.client.get(url, params).json()['total_grand'], '14900.00')
+
+
+class PurchaseListTests(ExportDirMixin, ShopFixtureMixin, TestCase):
+
+    def test_detail_totals(self):
+        item, = self.make_items(1)
+        purchase = Purchase.objects.get()
+        PurchaseDetail.objects.create(
+            purchase=purchase, purchase_type='kg', category=self.category, item=item,
+            qty=2, net_weight=Decimal('4.500'), total_amount=Decimal('450.000')
+        )
+        self.client.force_login(self.user)
+        row, = self.client.get(reverse('purchase_list')).context['purchases']
+        self.assertEqual(row['total_qty'], 3)
+        self.assertEqual(row['total_net_weight'], Decimal('14.500'))
+
+    def test_list_and_pdf_query_counts_are_constant(self):
+        self.client.force_login(self.user)
+        url = reverse('purchase_list')
+        self.make_items(2)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        job = enqueue_export(self.user, 'purchase_list', {})
+        with CaptureQueriesContext(connection) as few_pdf:
+            run_export_job(job.pk)
+
+        self.make_items(20, start=2)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(url)
+        job = enqueue_export(self.user, 'purchase_list', {})
+        with CaptureQueriesContext(connection) as many_pdf:
+            run_export_job(job.pk)
+
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(len(few_pdf), len(many_pdf))
+
+
+class PdfExportTests(ExportDirMixin, ShopFixtureMixin, TestCase):
+    REPORTS = [
+        'daily_summary_report', 'customer_ledger', 'wholesale_item_report',
+        'wholesale_profit_report', 'retail_item_report', 'purchase_list',
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def request_export(self, report, **params):
+        response = self.client.get(reverse(report), {**params, 'export': 'pdf'})
+        self.assertEqual(response.status_code, 302)
+        return ExportJob.objects.get(pk=response.url.rstrip('/').split('/')[-1])
+
+    def test_reports_are_queued_and_rendered_by_the_worker(self):
+        self.make_items(2)
+        jobs = [self.request_export(report) for report in self.REPORTS]
+        self.assertTrue(all(job.status == ExportJob.PENDING for job in jobs))
+
+        call_command('run_export_worker', '--once', '--processes', '0', stdout=open(os.devnull, 'w'))
+
+        for job in jobs:
+            job.refresh_from_db()
+            self.assertEqual(job.status, ExportJob.DONE, job.error)
+            response = self.client.get(reverse('export_download', args=[job.pk]))
+            self.assertEqual(response['Content-Type'], 'application/pdf')
+            self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+    def test_repeat_export_is_served_from_disk_until_data_changes(self):
+        self.make_items(1)
+        first = self.request_export('purchase_list')
+        self.assertEqual(run_export_job(first.pk), ExportJob.DONE)
+
+        again = self.request_export('purchase_list')
+        self.assertEqual(again.status, ExportJob.DONE)
+        self.assertEqual(again.cache_key, first.cache_key)
+        self.assertEqual(again.filename, ExportJob.objects.get(pk=first.pk).filename)
+
+        other_params = self.request_export('purchase_list', supplier=self.supplier.pk)
+        self.assertEqual(other_params.status, ExportJob.PENDING)
+
+        self.make_items(1, start=1)
+        changed = self.request_export('purchase_list')
+        self.assertEqual(changed.status, ExportJob.PENDING)
+        self.assertNotEqual(changed.cache_key, first.cache_key)
+        self.assertIsNotNone(stored_export(first.cache_key))
+
+    def test_jobs_are_private(self):
+        job = self.request_export('daily_summary_report')
+        other = CustomUser.objects.create_user(username='other', password='pass', role='admin')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('export_status', args=[job.pk])).status_code, 404)
+
+    def test_expired_files_and_old_jobs_are_purged(self):
+        self.make_items(1)
+        old, recent = self.request_export('purchase_list'), self.request_export('daily_summary_report')
+        for job in (old, recent):
+            run_export_job(job.pk)
+        expired = time.time() - EXPORT_MAX_AGE - 60
+        os.utime(export_path(old.cache_key), (expired, expired))
+        ExportJob.objects.filter(pk=old.pk).update(created_at=timezone.now() - EXPORT_JOB_RETENTION * 2)
+
+        self.assertEqual(purge_exports(), (1, 1))
+        self.assertFalse(export_path(old.cache_key).exists())
+        self.assertTrue(export_path(recent.cache_key).exists())
+        self.assertEqual(list(ExportJob.objects.values_list('pk', flat=True)), [recent.pk])
+
+    def test_signals_leave_other_models_fast_deletable(self):
+        self.assertTrue(Collector('default').can_fast_delete(StockMovement.objects.all()))
+        self.assertFalse(Collector('default').can_fast_delete(RetailSalesDetails.objects.all()))
+
+
+class PdfRenderTests(TestCase):
+
+    def test_logo_is_read_once(self):
+        render_to_pdf('purchase_list_pdf.html', {'purchases': [], 'logo_path': LOGO_PATH})
+        with patch('builtins.open', side_effect=AssertionError('logo read again')):
+            pdf = render_to_pdf('purchase_list_pdf.html', {'purchases': [], 'logo_path': LOGO_PATH})
+        self.assertIn(b'/Subtype /Image', pdf)
+
+    def test_reportlab_setting_restored_after_render(self):
+        pdf = render_to_pdf('purchase_list_pdf.html', {'purchases': [], 'logo_path': LOGO_PATH})
+        self.assertNotIn(b'ASCII85Decode', pdf)
+        self.assertEqual(rl_config.useA85, 1)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_pdf', '--rows', '5', '--repeat', '1', stdout=out)
+        self.assertIn('old', out.getvalue())
+        self.assertIn('current', out.getvalue())
+
+
+class TabularExportTests(ShopFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def export_rows(self, report, **params):
+        response = self.client.get(reverse(report), {**params, 'export': 'csv'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        text = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.reader(StringIO(text)))
+
+    def test_item_reports_and_purchase_list(self):
+        self.make_items(2)
+        header, *rows = self.export_rows('retail_item_report')
+        self.assertEqual(header[:2], ['Code', 'Item'])
+        self.assertEqual([row[1] for row in rows], ['Item 0', 'Item 1'])
+        self.assertEqual(Decimal(rows[0][3]), Decimal('3.000'))
+
+        header, *rows = self.export_rows('purchase_list')
+        self.assertEqual(sorted(row[0] for row in rows), ['INV-0', 'INV-1'])
+        self.assertEqual(Decimal(rows[0][5]), Decimal('10.000'))
+
+        customer = Customer.objects.create(customer_name='Hotel', whole_sale=True)
+        sale = WholesaleSales.objects.create(
+            receipt_no='W-1', sales_date=self.today, customer=customer, added_by=self.user,
+            branch=self.branch, grand_total=Decimal('300.000'), paid_amount=Decimal('0.00')
+        )
+        for _ in range(2):
+            WholesaleSalesDetails.objects.create(
+                sales=sale, item=Item.objects.get(name='Item 0'), qty=1,
+                net_weight=Decimal('1.500'), total_amount=Decimal('150.000')
+            )
+        header, *rows = self.export_rows('wholesale_item_report')
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0][:4], ['Hotel', '1', 'Item 0', '2'])
+
+    def test_customer_ledger_running_balance(self):
+        customer = Customer.objects.create(
+            customer_name='Hotel', whole_sale=True, opening_balance=Decimal('50.000')
+        )
+        WholesaleSales.objects.create(
+            receipt_no='W-1', sales_date=self.today, customer=customer, added_by=self.user,
+            branch=self.branch, grand_total=Decimal('300.000'), paid_amount=Decimal('0.00')
+        )
+        WholesalePayment.objects.create(
+            receipt_no='P-1', payment_date=self.today, customer=customer,
+            amount=Decimal('120.00'), branch=self.branch, added_by=self.user
+        )
+        header, *rows = self.export_rows('customer_ledger', customer_id=customer.pk)
+        self.assertEqual([row[2] for row in rows], ['Opening Balance', 'Sales', 'Cash'])
+        self.assertEqual([Decimal(row[6]) for row in rows], [Decimal('50'), Decimal('350'), Decimal('230')])
+
+    def test_expense_list(self):
+        category = ExpenseCategory.objects.create(expense_name='Fuel', type='expense')
+        Expense.objects.create(
+            expense=category, amount=Decimal('75.000'), payment_mode='upi',
+            payment_date=self.today, branch=self.branch
+        )
+        header, row = self.export_rows('expense_list')
+        self.assertEqual(row[1:3], ['Fuel', 'UPI'])
+
+    def test_formulas_are_escaped(self):
+        category = ExpenseCategory.objects.create(expense_name='=HYPERLINK("http://x")', type='expense')
+        Expense.objects.create(
+            expense=category, amount=Decimal('-5.000'), payment_mode='upi',
+            payment_date=self.today, branch=self.branch
+        )
+        header, row = self.export_rows('expense_list')
+        self.assertEqual(row[1], '\'=HYPERLINK("http://x")')
+        self.assertEqual(Decimal(row[6]), Decimal('-5'))
+
+    def test_rows_are_read_while_streaming(self):
+        self.make_items(3)
+        with CaptureQueriesContext(connection) as before:
+            response = self.client.get(reverse('purchase_list'), {'export': 'csv'})
+        with CaptureQueriesContext(connection) as streaming:
+            lines = b''.join(response.streaming_content).splitlines()
+        self.assertFalse(any('SUM(' in q['sql'] for q in before))
+        self.assertTrue(any('SUM(' in q['sql'] for q in streaming))
+        self.assertEqual(len(lines), 4)
+
+    def test_xlsx(self):
+        self.make_items(1)
+        response = self.client.get(reverse('retail_item_report'), {'export': 'xlsx'})
+        if Workbook is None:
+            self.assertEqual(response.status_code, 501)
+            return
+        self.assertEqual(response['Content-Type'], XLSX_CONTENT_TYPE)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'PK'))
+
+
+class RequestProfilingTests(ShopFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, log_dir)
+        settings_override = override_settings(REQUEST_PROFILE_LOG=os.path.join(log_dir, 'profile.jsonl'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_only_profiles_on_request(self):
+        self.make_items(2)
+        staff = CustomUser.objects.create_user(username='clerk', password='pass', role='staff', branch=self.branch)
+        url = reverse('purchase_list')
+
+        self.client.force_login(self.user)
+        self.client.get(url)
+        self.client.force_login(staff)
+        self.client.get(url, HTTP_X_PROFILE='1')
+        self.assertEqual(read_profiles(), [])
+
+        self.client.force_login(self.user)
+        self.client.get(url, HTTP_X_PROFILE='1')
+        record, = read_profiles()
+        self.assertEqual(record['view'], 'purchase_list')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['sql_count'], 0)
+        self.assertGreater(record['template_ms'], 0)
+
+        with override_settings(REQUEST_PROFILING=True):
+            self.client_class().get(reverse('login'))  # a new client loads the middleware again
+        self.assertEqual(len(read_profiles()), 2)
+
+    def test_streamed_response_is_profiled_until_sent(self):
+        self.make_items(3)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('purchase_list'), {'export': 'csv'}, HTTP_X_PROFILE='1')
+        self.assertEqual(read_profiles(), [])
+
+        with CaptureQueriesContext(connection) as streaming:
+            lines = b''.join(response.streaming_content).splitlines()
+        response.close()
+        record, = read_profiles()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(streaming)
+        self.assertGreaterEqual(record['sql_count'], len(streaming))
+
+    def test_each_process_writes_its_own_log(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('purchase_list'), HTTP_X_PROFILE='1')
+        log_dir = os.path.dirname(settings.REQUEST_PROFILE_LOG)
+        self.assertEqual(os.listdir(log_dir), [f'profile.{os.getpid()}.jsonl'])
+
+        other = dict(read_profiles()[0], view='other_worker')
+        with open(os.path.join(log_dir, 'profile.1.jsonl.1'), 'w', encoding='utf-8') as f:
+            f.write(json.dumps(other) + '\n')
+        self.assertEqual(sorted(r['view'] for r in read_profiles()), ['other_worker', 'purchase_list'])
+
+    def test_repeated_query_shapes(self):
+        items = self.make_items(3)
+        profile = RequestProfile()
+        with connection.execute_wrapper(profile):
+            for item in items:
+                Item.objects.filter(pk=item.pk).first()
+            list(Item.objects.filter(pk__in=[items[0].pk]))
+            list(Item.objects.filter(pk__in=[item.pk for item in items]))
+
+        counts = sorted(shape['count'] for shape in profile.repeated_shapes())
+        self.assertEqual(counts, [2, 3])  # one row lookup per item; IN lists of any length
+        self.assertEqual(query_shape('SELECT 1 WHERE id IN (%s, %s,\n %s)'), 'SELECT 1 WHERE id IN (...)')
+
+    def test_profile_page_ranks_views_by_p95(self):
+        records = [
+            {'view': 'fast', 'ms': ms, 'sql_count': 3, 'sql_ms': 1.0, 'template_ms': 2.0, 'repeated': []}
+            for ms in (10, 12, 11)
+        ] + [
+            {'view': 'slow', 'ms': ms, 'sql_count': 40, 'sql_ms': 30.0, 'template_ms': 5.0,
+             'repeated': [{'sql': 'SELECT item', 'count': 38, 'ms': 20.0}]}
+            for ms in range(1, 101)
+        ]
+        slow, fast = rank_views(records)
+        self.assertEqual((slow['view'], slow['p50'], slow['p95'], slow['max']), ('slow', 50, 95, 100))
+        self.assertEqual(slow['repeated'], [('SELECT item', 38)])
+        self.assertEqual((fast['p50'], fast['p95']), (11, 12))
+
+        self.client.force_login(self.user)
+        self.client.get(reverse('purchase_list'), HTTP_X_PROFILE='1')
+        response = self.client.get(reverse('request_profiles'))
+        self.assertContains(response, 'purchase_list')
+
+
+class StructuredLoggingTests(ShopFixtureMixin, TestCase):
+
+    def make_record(self, level=logging.DEBUG, **extra):
+        record = logging.LogRecord('accounts.views', level, __file__, 1, "Purchase %s", ('INV-1',), None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_json_lines_carry_extra_data(self):
+        line = JsonFormatter().format(self.make_record(data={'grand_total': Decimal('10.50'), 'qty': 3}))
+        entry = json.loads(line)
+        self.assertEqual(entry['message'], 'Purchase INV-1')
+        self.assertEqual((entry['level'], entry['logger']), ('DEBUG', 'accounts.views'))
+        self.assertEqual((entry['grand_total'], entry['qty']), ('10.50', 3))
+
+    def test_sampling_only_drops_low_levels(self):
+        never = SampleFilter(rate=0, max_level='DEBUG')
+        self.assertFalse(never.filter(self.make_record()))
+        self.assertTrue(never.filter(self.make_record(logging.INFO)))
+        self.assertTrue(SampleFilter(rate=1).filter(self.make_record()))
+
+    def test_records_of_one_purchase_are_sampled_together(self):
+        sample = SampleFilter(rate=0.5)
+        kept = set()
+        for n in range(200):
+            decisions = {
+                sample.filter(self.make_record(data={'invoice': f'INV-{n}', 'line': line}))
+                for line in range(5)
+            }
+            self.assertEqual(len(decisions), 1)
+            kept |= decisions
+        self.assertEqual(kept, {True, False})
+
+    def test_debug_output_only_when_enabled(self):
+        item, = self.make_items(1)
+        url = reverse('items_by_category', args=[self.category.pk])
+        self.client.force_login(self.user)
+        with self.assertNoLogs('accounts.views', logging.INFO):
+            self.client.get(url)
+
+        with self.assertLogs('accounts.views', logging.DEBUG) as logs:
+            response = self.client.get(url)
+        self.assertEqual(response.json(), [{'id': item.pk, 'name': item.name}])
+        record, = logs.records
+        self.assertEqual(record.data, {'category_id': self.category.pk, 'items': 1})
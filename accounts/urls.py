@@ -49,6 +49,7 @@ urlpatterns = [
     # Retail Sales URLs
     path('retailsales/add/', views.retail_sales_add, name='retail_sales_add'),
     path('sales/retail/list/', views.retail_sales_list, name='retail_sales_list'),
+    path('sales/retail/list/totals/', views.retail_sales_totals, name='retail_sales_totals'),
     path('sales/retail/receipt/<int:pk>/', views.retail_receipt, name='retail_receipt'),
     path('sales/retail/delete/<int:pk>/', views.retail_sales_delete, name='retail_sales_delete'),
     path('sales/retail/pay-credit/<int:pk>/', views.retail_pay_credit, name='retail_pay_credit'),
@@ -125,5 +126,8 @@ urlpatterns = [
 
     # Daily Summary Report
     path('daily-summary-report/', views.daily_summary_report, name='daily_summary_report'),
+    path('exports/<int:pk>/', views.export_status, name='export_status'),
+    path('exports/<int:pk>/download/', views.export_download, name='export_download'),
+    path('reports/request-profiles/', views.request_profiles, name='request_profiles'),
 ]
 
@@ -0,0 +1,58 @@
+"""
+Version tokens for data that worker processes keep in memory.
+
+A SharedVersion is a random token in the shared cache, replaced whenever
+the data it stands for changes. Each process remembers the token it last
+read and asks the cache again only once VERSION_CHECK_INTERVAL has passed,
+so hot paths (the billing catalog, the yield multipliers) read nothing but
+memory between checks. The process that saves a change drops its copy at
+once; the other processes pick the new token up within the interval.
+"""
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_CHECK_INTERVAL = 5  # seconds another process may keep using an old version
+
+_versions = []
+
+
+class SharedVersion:
+
+    def __init__(self, key):
+        self.key = key
+        self._token = None
+        self._checked_at = 0.0
+        _versions.append(self)
+
+    def get(self):
+        now = time.monotonic()
+        token = self._token
+        if token is None or now - self._checked_at > VERSION_CHECK_INTERVAL:
+            token = cache.get(self.key)
+            if token is None:
+                cache.add(self.key, uuid.uuid4().hex, None)
+                token = cache.get(self.key)
+            self._token, self._checked_at = token, now
+        return token
+
+    def forget(self):
+        """Drop this process's copy; the next get() reads the cache."""
+        self._token = None
+
+    def replace(self):
+        self._retire()
+        # A request may reload from the old rows before this transaction commits
+        transaction.on_commit(self._retire)
+
+    def _retire(self):
+        cache.delete(self.key)
+        self.forget()
+
+
+def forget_local_versions():
+    """Drop every in-process copy, e.g. after cache.clear() in tests and benchmarks."""
+    for version in _versions:
+        version.forget()
@@ -1,16 +1,41 @@
 from django.templatetags.static import static
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db.models import Sum, F, Q
+from django.urls import reverse
+from django.db.models import Sum, F, Q, Value
 from django.contrib import messages
 from django.conf import settings
-import os
 from django.forms import modelformset_factory
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import AuthenticationForm
 from django.db import transaction
 from .forms import ItemBranchPriceForm,PettyCashBalanceForm,DailyStockUpdateForm,YieldPercentageForm,ExpenseCategoryForm,ExpenseForm,EmployeeLoginForm,PurchaseForm, PurchaseDetailFormSet, ItemCategoryForm, BranchForm, SupplierForm, ItemForm, RetailSalesForm, RetailSalesDetailFormSet, CustomerDataForm, WholesaleSalesForm, WholesaleSalesDetailFormSet,SupplierpayForm,EmployeForm,AttendanceInlineForm,CustomerForm,WholesalePaymentForm
-from .models import ItemBranchPrice,PettyCashBalance,DailystockUpdate,YieldPercentage,ExpenseCategory,Expense,Purchase, PurchaseDetail, Branch, Supplier, ItemCategory, Item, RetailSales, RetailSalesDetails, Customer, WholesaleSales, WholesaleSalesDetails,Supplierpay,Employe,Attendance,WholesalePayment
+from .models import DailyBranchTotals,ExportJob,ItemBranchPrice,PettyCashBalance,DailystockUpdate,YieldPercentage,ExpenseCategory,Expense,Purchase, PurchaseDetail, Branch, Supplier, ItemCategory, Item, RetailSales, RetailSalesDetails, Customer, WholesaleSales, WholesaleSalesDetails,Supplierpay,Employe,Attendance,WholesalePayment
+from .stock import build_stock_sheet, category_live_stats
+from .balances import (
+    apply_payment, apply_sale, balance_annotations, get_customer_balance,
+    ledger_entries, ledger_opening_balance,
+)
+from .inventory import record_movement, stock_quantity
+from .billing import post_sale_lines
+from .search import find_customers, page_bounds, paginate
+from .catalog import get_catalog, invalidate_catalog, not_modified
+from .summary import ALL_BRANCHES, NO_BRANCH, get_daily_summary
+from .suppliers import with_balances
+from .exports import export_path, pdf_export
+from .pdf import LOGO_PATH, render_to_pdf
+from .profiling import rank_views, read_profiles
+from .tabular import EXPORT_CHUNK_SIZE, TABULAR_FORMATS, tabular_export
+from .retail_list import (
+    CREDIT_PAGE_SIZE, SALES_PAGE_SIZE, RetailListFilter, get_retail_totals, keyset_page,
+)
+from .receipts import (
+    RETAIL_SALE, WHOLESALE_PAYMENT, WHOLESALE_SALE, next_receipt_no, peek_receipt_no,
+)
+from .costing import (
+    LivePriceLookup, get_multiplier_map, live_price_keys,
+    refresh_live_prices,
+)
 import logging
 from django.http import JsonResponse
 from django.views.decorators.http import require_GET
@@ -18,28 +43,29 @@ from django.http import HttpRequest
 from datetime import datetime, date,timedelta
 from django.contrib.auth.hashers import make_password
 from django.db import models
-from decimal import Decimal,ROUND_HALF_UP
+from decimal import Decimal,ROUND_HALF_UP,InvalidOperation
 from django.utils import timezone
 from django.db.models import IntegerField
-from django.db.models.functions import Cast
+from django.db.models.functions import Cast, Coalesce
 from collections import OrderedDict
 import base64
 from django.http import HttpResponse
-from django.template.loader import render_to_string
-from xhtml2pdf import pisa
-from io import BytesIO
+from django.http import HttpResponseNotModified
+from django.http import FileResponse, Http404
 from django.utils.timezone import now
 
 
 logger = logging.getLogger(__name__)
 
-logo_path = os.path.join(
-    settings.BASE_DIR,
-    'static',
-    'img',
-    'jaan_logo.jpeg'
+# Purchase line fields written to the debug log by purchase_add
+PURCHASE_DEBUG_FIELDS = (
+    'item', 'purchase_price', 'qty', 'no_of_boxes', 'gross_weight',
+    'empty_weight', 'net_weight', 'tax_percentage', 'total_amount',
 )
+
+logo_path = LOGO_PATH
 @login_required(login_url='login')
+@pdf_export
 def daily_summary_report(request):
     user = request.user
     is_admin_like = user.role in ['super_admin', 'admin']
@@ -63,148 +89,13 @@ def daily_summary_report(request):
     else:
         selected_branch = user.branch
 
-    # Helper: get multiplier for an item (1 if no yield record)
-    def get_multiplier(item):
-        yp = item.yieldpercentage_set.first()
-        return yp.multipler if yp else Decimal('1.000')
-
-    # Helper: convert weight to live weight
-    # If item.is_live = True, weight is already live (multiplier=1)
-    # If item.is_live = False, multiply by yield multiplier
-    def to_live_weight(item, weight):
-        if item.is_live:
-            return weight
-        return (weight * get_multiplier(item)).quantize(Decimal('0.001'))
-
-    # ─── 1. PURCHASES ────────────────────────────────────────────
-    purchase_qs = PurchaseDetail.objects.filter(
-        purchase__purchase_date=report_date,
-        purchase__delete_status=False,
-    ).select_related('item', 'item__category', 'purchase__branch')
-
-    if selected_branch:
-        purchase_qs = purchase_qs.filter(purchase__branch=selected_branch)
-    elif not is_admin_like:
-        purchase_qs = purchase_qs.none()
-
-    total_purchase_weight = Decimal('0.000')
-    total_purchase_live_weight = Decimal('0.000')
-    total_purchase_amount = Decimal('0.00')
-    total_purchase_qty = 0
-
-    for pd in purchase_qs:
-        nw = pd.net_weight or Decimal('0.000')
-        total_purchase_weight += nw
-        total_purchase_live_weight += to_live_weight(pd.item, nw)
-        total_purchase_amount += pd.total_amount or Decimal('0.00')
-        total_purchase_qty += pd.qty or 0
-
-    # ─── 2. RETAIL SALES ─────────────────────────────────────────
-    retail_sales_qs = RetailSales.objects.filter(
-        sales_date=report_date,
-        delete_status=False,
-    )
-    if selected_branch:
-        retail_sales_qs = retail_sales_qs.filter(branch=selected_branch)
-    elif not is_admin_like:
-        retail_sales_qs = retail_sales_qs.none()
-
-    retail_details_qs = RetailSalesDetails.objects.filter(
-        sales__in=retail_sales_qs
-    ).select_related('item', 'item__category')
-
-    total_retail_weight = Decimal('0.000')
-    total_retail_live_weight = Decimal('0.000')
-    total_retail_qty = 0
-
-    for rd in retail_details_qs:
-        nw = rd.net_weight or Decimal('0.000')
-        total_retail_weight += nw
-        total_retail_live_weight += to_live_weight(rd.item, nw)
-        total_retail_qty += rd.qty or 0
-
-    retail_totals = retail_sales_qs.aggregate(
-        total_amount=Sum('grand_total'),
-        total_cash=Sum('total_cash'),
-        total_upi=Sum('total_upi'),
-        total_card=Sum('total_card'),
-        total_pending=Sum('pending_amount'),
-    )
-
-    total_retail_amount = retail_totals['total_amount'] or Decimal('0.00')
-    total_retail_cash = retail_totals['total_cash'] or Decimal('0.00')
-    total_retail_upi = retail_totals['total_upi'] or Decimal('0.00')
-    total_retail_card = retail_totals['total_card'] or Decimal('0.00')
-    total_retail_pending = retail_totals['total_pending'] or Decimal('0.00')
-
-    # ─── 3. WHOLESALE SALES ──────────────────────────────────────
-    wholesale_sales_qs = WholesaleSales.objects.filter(
-        sales_date=report_date,
-        delete_status=False,
-    )
-    if selected_branch:
-        wholesale_sales_qs = wholesale_sales_qs.filter(branch=selected_branch)
-    elif not is_admin_like:
-        wholesale_sales_qs = wholesale_sales_qs.none()
-
-    wholesale_details_qs = WholesaleSalesDetails.objects.filter(
-        sales__in=wholesale_sales_qs
-    ).select_related('item', 'item__category')
-
-    total_wholesale_weight = Decimal('0.000')
-    total_wholesale_live_weight = Decimal('0.000')
-    total_wholesale_qty = 0
-
-    for wd in wholesale_details_qs:
-        nw = wd.net_weight or Decimal('0.000')
-        total_wholesale_weight += nw
-        total_wholesale_live_weight += to_live_weight(wd.item, nw)
-        total_wholesale_qty += wd.qty or 0
-
-    wholesale_totals = wholesale_sales_qs.aggregate(
-        total_amount=Sum('grand_total'),
-        total_paid=Sum('paid_amount'),
-        total_pending=Sum('pending_balance'),
-    )
-
-    total_wholesale_amount = wholesale_totals['total_amount'] or Decimal('0.00')
-    total_wholesale_paid_today = wholesale_totals['total_paid'] or Decimal('0.00')
-    total_wholesale_pending = wholesale_totals['total_pending'] or Decimal('0.00')
-
-    # ─── 4. WHOLESALE PAYMENTS RECEIVED ON THIS DAY ──────────────
-    payment_qs = WholesalePayment.objects.filter(
-        payment_date=report_date,
-        delete_status=False,
-    )
+    # Figures come from a few grouped queries, cached per (branch, date)
     if selected_branch:
-        payment_qs = payment_qs.filter(branch=selected_branch)
-    elif not is_admin_like:
-        payment_qs = payment_qs.none()
-
-    payment_totals = payment_qs.aggregate(
-        total=Sum('amount'),
-        cash=Sum('amount', filter=Q(payment_mode='cash')),
-    )
-    total_wholesale_payment_received = payment_totals['total'] or Decimal('0.00')
-    wholesale_cash_payment_received = payment_totals['cash'] or Decimal('0.00')
-
-    # ─── 5. EXPENSES (all combined, all in cash per requirement) ─
-    expense_qs = Expense.objects.filter(
-        payment_date=report_date,
-        delete_status=False,
-    )
-    if selected_branch:
-        expense_qs = expense_qs.filter(branch=selected_branch)
-    elif not is_admin_like:
-        expense_qs = expense_qs.none()
-
-    total_expense = expense_qs.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-
-    # ─── 6. CASH HAND OVER ───────────────────────────────────────
-    # Cash received = retail cash + wholesale cash payments
-    # Then subtract expenses
-    total_cash_received = total_retail_cash + wholesale_cash_payment_received
-    cash_hand_over = total_cash_received - total_expense
+        scope = selected_branch.pk
+    elif is_admin_like:
+        scope = ALL_BRANCHES
+    else:
+        scope = NO_BRANCH
 
     context = {
         'report_date': report_date,
@@ -213,42 +104,7 @@ def daily_summary_report(request):
         'is_admin_like': is_admin_like,
         'selected_branch': selected_branch,
         'branches': Branch.objects.all() if is_admin_like else [],
-
-        # Purchase
-        'total_purchase_qty': total_purchase_qty,
-        'total_purchase_weight': total_purchase_weight,
-        'total_purchase_live_weight': total_purchase_live_weight,
-        'total_purchase_amount': total_purchase_amount,
-
-        # Retail
-        'total_retail_qty': total_retail_qty,
-        'total_retail_weight': total_retail_weight,
-        'total_retail_live_weight': total_retail_live_weight,
-        'total_retail_amount': total_retail_amount,
-        'total_retail_cash': total_retail_cash,
-        'total_retail_upi': total_retail_upi,
-        'total_retail_card': total_retail_card,
-        'total_retail_pending': total_retail_pending,
-
-        # Wholesale
-        'total_wholesale_qty': total_wholesale_qty,
-        'total_wholesale_weight': total_wholesale_weight,
-        'total_wholesale_live_weight': total_wholesale_live_weight,
-        'total_wholesale_amount': total_wholesale_amount,
-        'total_wholesale_paid_today': total_wholesale_paid_today,
-        'total_wholesale_pending': total_wholesale_pending,
-        'total_wholesale_payment_received': total_wholesale_payment_received,
-        'wholesale_cash_payment_received': wholesale_cash_payment_received,
-        'wholesale_payments': payment_qs.select_related('customer'),
-
-        # Expenses
-        'total_expense': total_expense,
-        'expense_count': expense_qs.count(),
-
-        # Cash hand over
-        'total_cash_received': total_cash_received,
-        'cash_hand_over': cash_hand_over,
-
+        **get_daily_summary(report_date, scope),
         'logo_path': logo_path,
     }
 
@@ -307,37 +163,50 @@ def branch_price_manage(request, branch_id):
     }
 
     if request.method == 'POST':
-        with transaction.atomic():
-            saved_count = 0
-            for item in items:
-                retail_key = f'retail_{item.id}'
-                wholesale_key = f'wholesale_{item.id}'
+        changed = []
+        for item in items:
+            retail_key = f'retail_{item.id}'
+            wholesale_key = f'wholesale_{item.id}'
 
-                retail_val = request.POST.get(retail_key, '').strip()
-                wholesale_val = request.POST.get(wholesale_key, '').strip()
+            retail_val = request.POST.get(retail_key, '').strip()
+            wholesale_val = request.POST.get(wholesale_key, '').strip()
 
-                if not retail_val and not wholesale_val:
-                    continue
-
-                try:
-                    retail_price = Decimal(retail_val) if retail_val else Decimal('0.00')
-                    wholesale_price = Decimal(wholesale_val) if wholesale_val else Decimal('0.00')
-                except (ValueError, TypeError):
-                    continue
+            if not retail_val and not wholesale_val:
+                continue
 
-                ItemBranchPrice.objects.update_or_create(
-                    item=item,
-                    branch=branch,
-                    defaults={
-                        'price_per_unit_retail': retail_price,
-                        'price_per_unit_wholesale': wholesale_price,
-                        'updated_by': request.user,
-                    }
+            try:
+                retail_price = Decimal(retail_val) if retail_val else Decimal('0.00')
+                wholesale_price = Decimal(wholesale_val) if wholesale_val else Decimal('0.00')
+            except (ValueError, TypeError, InvalidOperation):
+                continue
+
+            # Only write rows whose prices actually changed
+            bp = existing_prices.get(item.id)
+            if bp and bp.price_per_unit_retail == retail_price and bp.price_per_unit_wholesale == wholesale_price:
+                continue
+
+            changed.append(ItemBranchPrice(
+                item=item,
+                branch=branch,
+                price_per_unit_retail=retail_price,
+                price_per_unit_wholesale=wholesale_price,
+                updated_by=request.user,
+            ))
+
+        if changed:
+            with transaction.atomic():
+                ItemBranchPrice.objects.bulk_create(
+                    changed,
+                    batch_size=500,
+                    update_conflicts=True,
+                    unique_fields=['item', 'branch'],
+                    update_fields=['price_per_unit_retail', 'price_per_unit_wholesale', 'updated_by', 'updated_at'],
                 )
-                saved_count += 1
+                # bulk_create sends no post_save signals
+                invalidate_catalog()
 
-            messages.success(request, f"Updated branch prices for {saved_count} items.")
-            return redirect('branch_price_manage', branch_id=branch.pk)
+        messages.success(request, f"Updated branch prices for {len(changed)} items.")
+        return redirect('branch_price_manage', branch_id=branch.pk)
 
     # Build display data
     items_data = []
@@ -358,24 +227,6 @@ def branch_price_manage(request, branch_id):
     })
 
 
-# Helper function — use this anywhere you need to fetch the effective price
-def get_effective_price(item, branch, sale_type='retail'):
-    """
-    Returns branch-specific price if set; otherwise falls back to item default.
-    sale_type: 'retail' or 'wholesale'
-    """
-    if branch:
-        bp = ItemBranchPrice.objects.filter(item=item, branch=branch).first()
-        if bp:
-            if sale_type == 'wholesale':
-                return bp.price_per_unit_wholesale
-            return bp.price_per_unit_retail
-
-    if sale_type == 'wholesale':
-        return item.price_per_unit_wholesale
-    return item.price_per_unit_retail
-
-
 @login_required(login_url='login')
 def item_wise_profit_report(request):
     is_admin_like = request.user.role in ['super_admin', 'admin']
@@ -408,74 +259,14 @@ def item_wise_profit_report(request):
     else:
         selected_branch = request.user.branch if request.user.branch else None
 
-    # ── Pre-build live purchase price lookup (within date range) ───────────
-    # Key: (category_id, purchase_date, branch_id) → price_per_kg
-    purchase_qs = PurchaseDetail.objects.filter(
-        item__is_live=True,
-        purchase__purchase_date__gte=from_date_obj,
-        purchase__purchase_date__lte=to_date_obj,
-        purchase__delete_status=False,
-    ).select_related('item__category', 'purchase__branch')
-
-    if selected_branch:
-        purchase_qs = purchase_qs.filter(purchase__branch=selected_branch)
-
-    live_price_raw = {}
-    for pd in purchase_qs:
-        key = (pd.item.category_id, pd.purchase.purchase_date, pd.purchase.branch_id)
-        if key not in live_price_raw:
-            live_price_raw[key] = {'cost': Decimal('0.000'), 'weight': Decimal('0.000')}
-        live_price_raw[key]['cost']   += pd.total_amount or Decimal('0.000')
-        live_price_raw[key]['weight'] += pd.net_weight   or Decimal('0.000')
-
-    live_price_map = {}
-    for key, val in live_price_raw.items():
-        live_price_map[key] = (
-            (val['cost'] / val['weight']).quantize(Decimal('0.001'))
-            if val['weight'] > 0 else Decimal('0.000')
-        )
-
-    # ── Fallback price cache ───────────────────────────────────────────────
-    # When a day has no live purchase, find the most recent one before that date.
-    # Cache results so we don't hit DB repeatedly for the same (category, date, branch).
-    fallback_price_cache = {}
-
-    def get_live_price(category_id, sales_date, branch_id):
-        """Return live price for the day, or fall back to last known price."""
-        key = (category_id, sales_date, branch_id)
-
-        # Exact match found in the date-range map
-        if key in live_price_map:
-            return live_price_map[key]
-
-        # Check fallback cache
-        if key in fallback_price_cache:
-            return fallback_price_cache[key]
-
-        # Query the last inserted live purchase for this category+branch before this date
-        fallback_qs = PurchaseDetail.objects.filter(
-            item__is_live=True,
-            item__category_id=category_id,
-            purchase__purchase_date__lte=sales_date,
-            purchase__delete_status=False,
-        ).select_related('purchase')
-
-        if branch_id:
-            fallback_qs = fallback_qs.filter(purchase__branch_id=branch_id)
-
-        fallback_qs = fallback_qs.order_by('-purchase__purchase_date', '-purchase__created_date')
-
-        last_pd = fallback_qs.first()
-        if last_pd and last_pd.net_weight and last_pd.net_weight > 0:
-            price = (last_pd.total_amount / last_pd.net_weight).quantize(Decimal('0.001'))
-        else:
-            price = Decimal('0.000')
-
-        fallback_price_cache[key] = price
-        return price
+    # ── Live purchase price lookup ─────────────────────────────────────────
+    # Days without a live purchase fall back to the last known price.
+    live_prices = LivePriceLookup(from_date_obj, to_date_obj, selected_branch)
+    get_live_price = live_prices.get
 
     # ── Aggregation ────────────────────────────────────────────────────────
     report_items = {}
+    multipliers = get_multiplier_map()
 
     def process_details(details_qs):
         for detail in details_qs:
@@ -484,8 +275,7 @@ def item_wise_profit_report(request):
             sales_date = detail.sales.sales_date
             branch     = detail.sales.branch
 
-            yp         = item.yieldpercentage_set.first()
-            multiplier = yp.multipler if yp else Decimal('1.000')
+            multiplier = multipliers.get(item.id, Decimal('1.000'))
 
             net_weight  = detail.net_weight or Decimal('0.000')
             live_weight = (net_weight * multiplier).quantize(Decimal('0.001'))
@@ -573,6 +363,7 @@ def item_wise_profit_report(request):
     return render(request, 'item_wise_profit_report.html', context)
 
 @login_required(login_url='login')
+@pdf_export
 def wholesale_profit_report(request):
     is_admin_like = request.user.role in ['super_admin', 'admin']
 
@@ -611,74 +402,10 @@ def wholesale_profit_report(request):
     if customer_id:
         selected_customer = Customer.objects.filter(id=customer_id).first()
 
-    # ── Pre-build live purchase price lookup (within date range) ───────────
-    # Key: (category_id, purchase_date, branch_id) → price_per_kg
-    purchase_qs = PurchaseDetail.objects.filter(
-        item__is_live=True,
-        purchase__purchase_date__gte=from_date_obj,
-        purchase__purchase_date__lte=to_date_obj,
-        purchase__delete_status=False,
-    ).select_related('item__category', 'purchase__branch')
-
-    if selected_branch:
-        purchase_qs = purchase_qs.filter(purchase__branch=selected_branch)
-
-    live_price_raw = {}
-    for pd in purchase_qs:
-        key = (
-            pd.item.category_id,
-            pd.purchase.purchase_date,
-            pd.purchase.branch_id,
-        )
-        if key not in live_price_raw:
-            live_price_raw[key] = {'cost': Decimal('0.000'), 'weight': Decimal('0.000')}
-        live_price_raw[key]['cost']   += pd.total_amount or Decimal('0.000')
-        live_price_raw[key]['weight'] += pd.net_weight   or Decimal('0.000')
-
-    live_price_map = {}
-    for key, val in live_price_raw.items():
-        live_price_map[key] = (
-            (val['cost'] / val['weight']).quantize(Decimal('0.001'))
-            if val['weight'] > 0 else Decimal('0.000')
-        )
-
-    # ── Fallback price cache ───────────────────────────────────────────────
-    # When no purchase exists for a given (category, date, branch),
-    # find the most recently inserted live purchase on or before that date.
-    fallback_price_cache = {}
-
-    def get_live_price(category_id, sales_date, branch_id):
-        """Return live price for the day, or fall back to last known price."""
-        key = (category_id, sales_date, branch_id)
-
-        if key in live_price_map:
-            return live_price_map[key]
-
-        if key in fallback_price_cache:
-            return fallback_price_cache[key]
-
-        fallback_qs = PurchaseDetail.objects.filter(
-            item__is_live=True,
-            item__category_id=category_id,
-            purchase__purchase_date__lte=sales_date,
-            purchase__delete_status=False,
-        ).select_related('purchase')
-
-        if branch_id:
-            fallback_qs = fallback_qs.filter(purchase__branch_id=branch_id)
-
-        fallback_qs = fallback_qs.order_by(
-            '-purchase__purchase_date', '-purchase__created_date'
-        )
-
-        last_pd = fallback_qs.first()
-        if last_pd and last_pd.net_weight and last_pd.net_weight > 0:
-            price = (last_pd.total_amount / last_pd.net_weight).quantize(Decimal('0.001'))
-        else:
-            price = Decimal('0.000')
-
-        fallback_price_cache[key] = price
-        return price
+    # ── Live purchase price lookup ─────────────────────────────────────────
+    # Days without a live purchase fall back to the last known price.
+    live_prices = LivePriceLookup(from_date_obj, to_date_obj, selected_branch)
+    get_live_price = live_prices.get
 
     # ── Sales details queryset ─────────────────────────────────────────────
     details_qs = WholesaleSalesDetails.objects.filter(
@@ -700,6 +427,7 @@ def wholesale_profit_report(request):
 
     # ── Build report ───────────────────────────────────────────────────────
     report_data = {}
+    multipliers = get_multiplier_map()
 
     for detail in details_qs:
         customer      = detail.sales.customer
@@ -709,8 +437,7 @@ def wholesale_profit_report(request):
         sales_date    = detail.sales.sales_date
         branch        = detail.sales.branch
 
-        yp         = item.yieldpercentage_set.first()
-        multiplier = yp.multipler if yp else Decimal('1.000')
+        multiplier = multipliers.get(item.id, Decimal('1.000'))
 
         net_weight  = detail.net_weight or Decimal('0.000')
         live_weight = (net_weight * multiplier).quantize(Decimal('0.001'))
@@ -832,7 +559,23 @@ def PettyCashBalance_update(request,pk):
         form = PettyCashBalanceForm(instance = PettyCashBalance_value)
     return render(request, 'PettyCashBalance_add.html',{'form': form, 'PettyCashBalance_value':PettyCashBalance_value})
 
+def ledger_export_rows(customer, from_date, to_date, branch_ids, opening_balance):
+    """Ledger rows with running balance for the CSV/XLSX export, read as they are written."""
+    payment_modes = dict(WholesalePayment._meta.get_field('payment_mode').choices)
+    balance = opening_balance
+    yield (from_date, '', 'Opening Balance', '', '', '', balance)
+    for entry in ledger_entries(customer, from_date, to_date, branch_ids):
+        if entry['kind'] == 'sale':
+            balance += entry['amount']
+            yield (entry['date'], 'To', 'Sales', entry['receipt_no'], entry['amount'], '', balance)
+        else:
+            balance -= entry['amount']
+            particular = payment_modes.get(entry['payment_mode'], entry['payment_mode'])
+            yield (entry['date'], 'By', particular, entry['receipt_no'], '', entry['amount'], balance)
+
 
+@login_required(login_url='login')
+@pdf_export
 def customer_ledger(request):
 
     user = request.user
@@ -880,48 +623,31 @@ def customer_ledger(request):
 
     if selected_customer:
 
-        # Filters
-        sales_filter = {
-            'customer': selected_customer,
-            'delete_status': False
-        }
-
-        payment_filter = {
-            'customer': selected_customer,
-            'delete_status': False
-        }
-
-        # Branch filtering
+        # Branch filtering (None = every branch)
+        branch_ids = None
         if is_admin_like:
             if branch_id:
-                sales_filter['branch_id'] = branch_id
-                payment_filter['branch_id'] = branch_id
+                branch_ids = [int(branch_id)]
         else:
-            sales_filter['branch'] = user.branch
-            payment_filter['branch'] = user.branch
+            branch_ids = [user.branch_id]
 
         # ---------------------------
         # 1️⃣ Opening Balance
         # ---------------------------
 
-        previous_sales = WholesaleSales.objects.filter(
-            **sales_filter,
-            sales_date__lt=from_date
-        ).aggregate(total=Sum('grand_total'))['total'] or Decimal('0.00')
-
-        previous_payments = WholesalePayment.objects.filter(
-            **payment_filter,
-            payment_date__lt=from_date
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-
-        opening_balance = (
-            selected_customer.opening_balance
-            + previous_sales
-            - previous_payments
-        )
+        # Nearest monthly checkpoint plus the days since it
+        opening_balance = ledger_opening_balance(selected_customer, from_date, branch_ids)
 
         running_balance = opening_balance
 
+        if export_type in TABULAR_FORMATS:
+            return tabular_export(
+                export_type,
+                f"{now():%Y-%m-%d}-ledger-{selected_customer.customer_name.replace(' ', '_')}",
+                ['Date', 'Type', 'Particular', 'Receipt No', 'Debit', 'Credit', 'Balance'],
+                ledger_export_rows(selected_customer, from_date, to_date, branch_ids, opening_balance),
+            )
+
         ledger_rows.append({
             'date': from_date,
             'type': '',
@@ -933,50 +659,31 @@ def customer_ledger(request):
         })
 
         # ---------------------------
-        # 2️⃣ Transactions
+        # 2️⃣ Transactions + Running Balance
         # ---------------------------
 
-        sales = WholesaleSales.objects.filter(
-            **sales_filter,
-            sales_date__gte=from_date,
-            sales_date__lte=to_date
-        )
-
-        payments = WholesalePayment.objects.filter(
-            **payment_filter,
-            payment_date__gte=from_date,
-            payment_date__lte=to_date
-        )
-
-        transactions = []
-
-        for s in sales:
-            transactions.append({
-                'date': s.sales_date,
-                'type': 'To',
-                'particular': 'Sales',
-                'receipt_no': s.receipt_no,
-                'debit': s.grand_total,
-                'credit': Decimal('0.00')
-            })
-
-        for p in payments:
-            transactions.append({
-                'date': p.payment_date,
-                'type': 'By',
-                'particular': p.get_payment_mode_display(),
-                'receipt_no': p.receipt_no,
-                'debit': Decimal('0.00'),
-                'credit': p.amount
-            })
-
-        transactions = sorted(transactions, key=lambda x: x['date'])
-
-        # ---------------------------
-        # 3️⃣ Running Balance
-        # ---------------------------
+        payment_modes = dict(WholesalePayment._meta.get_field('payment_mode').choices)
+
+        for entry in ledger_entries(selected_customer, from_date, to_date, branch_ids):
+            if entry['kind'] == 'sale':
+                txn = {
+                    'date': entry['date'],
+                    'type': 'To',
+                    'particular': 'Sales',
+                    'receipt_no': entry['receipt_no'],
+                    'debit': entry['amount'],
+                    'credit': Decimal('0.00')
+                }
+            else:
+                txn = {
+                    'date': entry['date'],
+                    'type': 'By',
+                    'particular': payment_modes.get(entry['payment_mode'], entry['payment_mode']),
+                    'receipt_no': entry['receipt_no'],
+                    'debit': Decimal('0.00'),
+                    'credit': entry['amount']
+                }
 
-        for txn in transactions:
             running_balance += txn['debit']
             running_balance -= txn['credit']
 
@@ -1027,14 +734,40 @@ def customer_ledger(request):
 
 
 
-def render_to_pdf(template_src, context):
-    html = render_to_string(template_src, context)
-    result = BytesIO()
-    pisa_status = pisa.CreatePDF(html, dest=result)
 
-    if pisa_status.err:
-        return None
-    return result.getvalue()
+@login_required(login_url='login')
+def export_status(request, pk):
+    job = get_object_or_404(ExportJob, pk=pk, user=request.user)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'status': job.status,
+            'error': job.error,
+            'download_url': reverse('export_download', args=[job.pk]) if job.status == ExportJob.DONE else None,
+        })
+    return render(request, 'export_status.html', {'job': job})
+
+
+@login_required(login_url='login')
+def export_download(request, pk):
+    job = get_object_or_404(ExportJob, pk=pk, user=request.user, status=ExportJob.DONE)
+    path = export_path(job.cache_key)
+    if not path.exists():
+        raise Http404("Export file is no longer available.")
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=job.filename, content_type='application/pdf')
+
+
+@login_required(login_url='login')
+def request_profiles(request):
+    if request.user.role != 'super_admin':
+        messages.error(request, "Permission denied")
+        return redirect('dashboard')
+
+    records = read_profiles()
+    return render(request, 'request_profiles.html', {
+        'rows': rank_views(records),
+        'request_count': len(records),
+        'profiling_enabled': settings.REQUEST_PROFILING,
+    })
 
 @login_required
 def wholesale_customer_balance(request):
@@ -1043,24 +776,9 @@ def wholesale_customer_balance(request):
     if not customer_id:
         return JsonResponse({'balance': '0.00'})
 
-    try:
-        customer = Customer.objects.get(id = customer_id,delete_status=False)
-    except Customer.DoesNotExist:
-         return JsonResponse({'balance': '0.00'})
-
-    total_sales = WholesaleSales.objects.filter(
-            customer=customer,
-            delete_status=False
-        ).aggregate(total=Sum('grand_total'))['total'] or Decimal('0.00')
-
-    total_paid = WholesalePayment.objects.filter(
-        customer = customer,
-        delete_status = False
-    ).aggregate(paid=Sum('amount'))['paid'] or Decimal('0.00')
-
-    opening_balance = customer.opening_balance or Decimal('0.00')
-
-    balance = opening_balance + total_sales - total_paid
+    balance = get_customer_balance(customer_id) if str(customer_id).isdigit() else None
+    if balance is None:
+        return JsonResponse({'balance': '0.00'})
 
     return JsonResponse({'balance':str(balance)})
 
@@ -1110,38 +828,21 @@ def daily_stock_report(request):
     for r in records:
         category_items.setdefault(r.item.category, []).append(r)
 
+    multipliers = get_multiplier_map()
+
     # Build category_data with live stats — same logic as daily_stock_update
     category_data = []
     for category, rows in category_items.items():
-        total_live_purchase = Decimal('0.000')
-        total_live_sales    = Decimal('0.000')
-        total_live_closing  = Decimal('0.000')
-
-        for r in rows:
-            yp = r.item.yieldpercentage_set.first()
-            multiplier = yp.multipler if yp else Decimal('1.000')
-
-            total_live_purchase += ((r.opening_stock + r.purchase_stock) * multiplier).quantize(Decimal('0.001'))
-            total_live_sales    += (r.todays_sales  * multiplier).quantize(Decimal('0.001'))
-            total_live_closing  += (r.closing_stock * multiplier).quantize(Decimal('0.001'))
-
-        theoretical_loss     = total_live_purchase - total_live_sales
-        theoretical_loss_pct = (theoretical_loss * 100 / total_live_purchase).quantize(Decimal('0.01')) if total_live_purchase > 0 else Decimal('0.00')
-        physical_loss_weight = total_live_closing
-        physical_loss_pct    = (physical_loss_weight * 100 / total_live_purchase).quantize(Decimal('0.01')) if total_live_purchase > 0 else Decimal('0.00')
-        stock_loss           = theoretical_loss - physical_loss_weight
-        stock_loss_pct       = (stock_loss * 100 / total_live_purchase).quantize(Decimal('0.01')) if total_live_purchase > 0 else Decimal('0.00')
-
-        category_data.append((category, rows, {
-            'total_live_purchase':  total_live_purchase,
-            'total_live_sales':     total_live_sales,
-            'theoretical_loss':     theoretical_loss,
-            'theoretical_loss_pct': theoretical_loss_pct,
-            'physical_loss_weight': physical_loss_weight,
-            'physical_loss_pct':    physical_loss_pct,
-            'stock_loss':           stock_loss,
-            'stock_loss_pct':       stock_loss_pct,
-        }))
+        stats = category_live_stats(
+            (
+                r.opening_stock + r.purchase_stock,
+                r.todays_sales,
+                r.closing_stock,
+                multipliers.get(r.item_id, Decimal('1.000')),
+            )
+            for r in rows
+        )
+        category_data.append((category, rows, stats))
 
     context = {
         'category_data': category_data,
@@ -1194,6 +895,10 @@ def daily_stock_update(request):
 
     existing_map = {e.item_id: e for e in existing}
 
+    # Opening / purchase / sales for every item in a fixed number of queries
+    all_items = [item for items in category_items.values() for item in items]
+    sheet = build_stock_sheet(all_items, selected_date, branch)
+
     initial_data = []
     for category, items in category_items.items():
         live_items = [i for i in items if i.is_live]
@@ -1201,14 +906,12 @@ def daily_stock_update(request):
         ordered_items = live_items + non_live_items
 
         for item in ordered_items:
-            yp = item.yieldpercentage_set.first()
-            multiplier = yp.multipler if yp else Decimal('1.000')
-
-            # Fetch fresh data
-            opening = get_previous_closing_stock(item, selected_date, branch)
-            purchase = get_purchase_stock(item, selected_date, branch)
-            sales = get_todays_sales(item, selected_date, branch)
-            total_stock = opening + purchase
+            line = sheet[item.id]
+            multiplier = line['multiplier']
+            opening = line['opening']
+            purchase = line['purchase']
+            sales = line['sales']
+            total_stock = line['total']
 
             live_opening = (opening * multiplier).quantize(Decimal('0.000'))
             live_purchase = (purchase * multiplier).quantize(Decimal('0.000'))
@@ -1263,65 +966,21 @@ def daily_stock_update(request):
                 }
 
             initial_data.append(initial)
-    
-    # --- Category-wise live weight stats ---
+
     # ───────── Category-wise Live Weight Stats ─────────
-    category_live_stats = {}
+    category_live_stats_map = {}
 
     for category, items in category_items.items():
-        total_live_total_stock = Decimal('0.000')   # Total available (Opening + Purchase) in live weight
-        total_live_sales       = Decimal('0.000')
-        total_live_closing     = Decimal('0.000')
-
+        rows = []
         for item in items:
-            yp = item.yieldpercentage_set.first()
-            multiplier = yp.multipler if yp else Decimal('1.000')
-
-            # Fetch fresh data
-            opening = get_previous_closing_stock(item, selected_date, branch)
-            purchase = get_purchase_stock(item, selected_date, branch)
-            sales = get_todays_sales(item, selected_date, branch)
-
-            # Get saved closing stock if exists
+            line = sheet[item.id]
+            # Saved closing stock if exists
             rec = existing_map.get(item.id)
             closing = rec.closing_stock if rec else Decimal('0.000')
+            rows.append((line['total'], line['sales'], closing, line['multiplier']))
 
-            # Convert to live weight
-            live_total_stock = (opening + purchase) * multiplier
-            live_sales       = sales * multiplier
-            live_closing     = closing * multiplier
-
-            total_live_total_stock += live_total_stock.quantize(Decimal('0.001'))
-            total_live_sales       += live_sales.quantize(Decimal('0.001'))
-            total_live_closing     += live_closing.quantize(Decimal('0.001'))
-
-        # ─── CORRECT CALCULATIONS ───
-        theoretical_loss = total_live_total_stock - total_live_sales          # ← This is correct
-
-        physical_loss_weight = total_live_closing
+        category_live_stats_map[category.pk] = category_live_stats(rows)
 
-        stock_loss = theoretical_loss - physical_loss_weight
-
-        # Percentages
-        theoretical_loss_pct = (theoretical_loss * 100 / total_live_total_stock).quantize(Decimal('0.01')) \
-            if total_live_total_stock > 0 else Decimal('0.00')
-
-        physical_loss_pct = (physical_loss_weight * 100 / total_live_total_stock).quantize(Decimal('0.01')) \
-            if total_live_total_stock > 0 else Decimal('0.00')
-
-        stock_loss_pct = (stock_loss * 100 / total_live_total_stock).quantize(Decimal('0.01')) \
-            if total_live_total_stock > 0 else Decimal('0.00')
-
-        category_live_stats[category.pk] = {
-            'total_live_total_stock': total_live_total_stock,
-            'total_live_sales':       total_live_sales,
-            'theoretical_loss':       theoretical_loss,           # Should now be positive
-            'theoretical_loss_pct':   theoretical_loss_pct,
-            'physical_loss_weight':   physical_loss_weight,
-            'physical_loss_pct':      physical_loss_pct,
-            'stock_loss':             stock_loss,
-            'stock_loss_pct':         stock_loss_pct,
-        }
     # Formset
     DailyStockFormSet = modelformset_factory(
         DailystockUpdate,
@@ -1338,10 +997,10 @@ def daily_stock_update(request):
 
     # POST handling
     if request.method == 'POST':
-        logger.info("POST received - checking formset validity")
+        logger.debug("POST received - checking formset validity")
 
         if formset.is_valid():
-            logger.info(f"Formset valid - processing {len(formset)} forms")
+            logger.debug("Formset valid - processing %s forms", len(formset))
             saved_count = 0
 
             for form in formset:
@@ -1362,7 +1021,6 @@ def daily_stock_update(request):
                 spoilage      = spoilage      or Decimal('0.000')
                 closing_stock = closing_stock or Decimal('0.000')
 
-                item       = Item.objects.get(id=item_id)
                 multiplier = Decimal(form.initial.get('multiplier', '1.000'))
 
                 opening_stock    = Decimal(form.initial['opening_stock'])
@@ -1385,7 +1043,7 @@ def daily_stock_update(request):
                 live_weight_loss    = (live_actual_stock - live_weight_closing).quantize(Decimal('0.000'))
 
                 obj, created = DailystockUpdate.objects.update_or_create(
-                    item=item,
+                    item_id=item_id,
                     date=selected_date,
                     branch=branch,
                     defaults={
@@ -1410,7 +1068,7 @@ def daily_stock_update(request):
                 )
                 saved_count += 1
                 action = "Created" if created else "Updated"
-                logger.info(f"{action} record for item {item.id} on {selected_date}")
+                logger.debug("%s record for item %s on %s", action, item_id, selected_date)
 
             if saved_count > 0:
                 messages.success(request, f"Saved/updated {saved_count} records!")
@@ -1420,13 +1078,13 @@ def daily_stock_update(request):
             return redirect(request.get_full_path())
 
         else:
-            logger.error(f"Formset invalid: {formset.errors}")
+            logger.error("Formset invalid: %s", formset.errors)
             messages.error(request, "Form validation failed. Check required fields.")
 
     # Build category_data list: (category, stats_dict) — no custom template tag needed
     category_data = []
     for category in category_items.keys():
-        category_data.append((category, category_live_stats.get(category.pk, {})))
+        category_data.append((category, category_live_stats_map.get(category.pk, {})))
 
     # GET or invalid POST → render
     context = {
@@ -1442,43 +1100,6 @@ def daily_stock_update(request):
     return render(request, 'daily_stock_update.html', context)  # ← this line was missing
 
 
-# Helper functions remain the same
-def get_previous_closing_stock(item, current_date, branch):
-    prev = DailystockUpdate.objects.filter(
-        item=item,
-        branch=branch,
-        date__lt=current_date
-    ).order_by('-date').first()
-    return prev.closing_stock if prev else Decimal('0.000')
-
-
-def get_purchase_stock(item, date, branch):
-    total = PurchaseDetail.objects.filter(
-        item=item,
-        purchase__purchase_date=date,
-        purchase__branch=branch,
-        purchase__delete_status=False
-    ).aggregate(total=Sum('net_weight'))['total'] or Decimal('0.000')
-    return total
-
-
-def get_todays_sales(item, date, branch):
-    retail = RetailSalesDetails.objects.filter(
-        item=item,
-        sales__sales_date=date,
-        sales__branch=branch,
-        sales__delete_status=False
-    ).aggregate(total=Sum('net_weight'))['total'] or Decimal('0.000')
-
-    wholesale = WholesaleSalesDetails.objects.filter(
-        item=item,
-        sales__sales_date=date,
-        sales__branch=branch,
-        sales__delete_status=False
-    ).aggregate(total=Sum('net_weight'))['total'] or Decimal('0.000')
-
-    return retail + wholesale
-
 @login_required
 def YieldPercentage_add(request):
     if request.method =="POST":
@@ -1540,20 +1161,25 @@ def dashboard_view(request):
             from_date = today - timedelta(days=30)
             to_date = today
 
-    # Apply branch filter
-    purchase_filter = Q(delete_status=False, purchase_date__range=[from_date, to_date])
-    retail_filter = Q(delete_status=False, sales_date__range=[from_date, to_date])
-    wholesale_filter = Q(delete_status=False, sales_date__range=[from_date, to_date])
-
+    # Apply branch filter (daily rollup rows: at most one per branch and day)
+    totals = DailyBranchTotals.objects.filter(date__range=[from_date, to_date])
     if not is_admin_like and branch:
-        purchase_filter &= Q(branch=branch)
-        retail_filter &= Q(branch=branch)
-        wholesale_filter &= Q(branch=branch)
+        totals = totals.filter(branch=branch)
+
+    daily = {
+        row['date']: row
+        for row in totals.values('date').annotate(
+            purchase=Sum('purchase_total'),
+            retail=Sum('retail_total'),
+            wholesale=Sum('wholesale_total'),
+        ).order_by('date')
+    }
 
     # === TODAY'S SUMMARY ===
-    today_purchase = Purchase.objects.filter(purchase_filter & Q(purchase_date=today)).aggregate(s=Sum('grand_total'))['s'] or 0
-    today_retail = RetailSales.objects.filter(retail_filter & Q(sales_date=today)).aggregate(s=Sum('grand_total'))['s'] or 0
-    today_wholesale = WholesaleSales.objects.filter(wholesale_filter & Q(sales_date=today)).aggregate(s=Sum('grand_total'))['s'] or 0
+    today_row = daily.get(today, {})
+    today_purchase = today_row.get('purchase') or 0
+    today_retail = today_row.get('retail') or 0
+    today_wholesale = today_row.get('wholesale') or 0
     today_sales = today_retail + today_wholesale
     today_profit = today_sales - today_purchase
     pending_credit = RetailSales.objects.filter(payment_mode='pending', delete_status=False).aggregate(s=Sum('grand_total'))['s'] or 0
@@ -1571,20 +1197,10 @@ def dashboard_view(request):
     else:
         labels = [d.strftime('%b %Y') for d in date_range]  # Jan 2026
 
-    # Aggregate purchases
-    purchases = Purchase.objects.filter(purchase_filter).values('purchase_date').annotate(total=Sum('grand_total')).order_by('purchase_date')
-    purchase_map = {p['purchase_date']: float(p['total'] or 0) for p in purchases}
-    purchase_data = [purchase_map.get(d, 0) for d in date_range]
-
-    # Aggregate retail sales
-    retail = RetailSales.objects.filter(retail_filter).values('sales_date').annotate(total=Sum('grand_total')).order_by('sales_date')
-    retail_map = {r['sales_date']: float(r['total'] or 0) for r in retail}
-    retail_data = [retail_map.get(d, 0) for d in date_range]
-
-    # Aggregate wholesale sales
-    wholesale = WholesaleSales.objects.filter(wholesale_filter).values('sales_date').annotate(total=Sum('grand_total')).order_by('sales_date')
-    wholesale_map = {w['sales_date']: float(w['total'] or 0) for w in wholesale}
-    wholesale_data = [wholesale_map.get(d, 0) for d in date_range]
+    # Chart series
+    purchase_data = [float(daily[d]['purchase'] or 0) if d in daily else 0 for d in date_range]
+    retail_data = [float(daily[d]['retail'] or 0) if d in daily else 0 for d in date_range]
+    wholesale_data = [float(daily[d]['wholesale'] or 0) if d in daily else 0 for d in date_range]
 
     context = {
         'user': user,
@@ -1716,6 +1332,23 @@ def expense_list(request):
 
     expenses = expenses.order_by('-payment_date')
 
+    export_type = request.GET.get('export')
+    if export_type in TABULAR_FORMATS:
+        payment_modes = dict(Expense._meta.get_field('payment_mode').choices)
+        rows = expenses.values_list(
+            'payment_date', 'expense__expense_name', 'payment_mode', 'staff__name',
+            'description', 'branch__branch_name', 'amount',
+        )
+        return tabular_export(
+            export_type, f"{now():%Y-%m-%d}-expenses",
+            ['Date', 'Category', 'Mode', 'Staff', 'Description', 'Branch', 'Amount'],
+            (
+                (day, category, payment_modes.get(mode, mode), staff, description, branch, amount)
+                for day, category, mode, staff, description, branch, amount
+                in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+            ),
+        )
+
     total_expense = expenses.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
 
     petty_cash         = PettyCashBalance.objects.first()
@@ -1753,7 +1386,11 @@ def wholesale_payment_add(request):
             payment.added_by = request.user
             if not payment.branch and request.user.branch:
                 payment.branch = request.user.branch
-            payment.save()
+            with transaction.atomic():
+                if not payment.receipt_no:
+                    payment.receipt_no = next_receipt_no(payment.branch, WHOLESALE_PAYMENT)
+                payment.save()
+                apply_payment(payment.customer, payment.amount, payment.branch_id, payment.payment_date)
             messages.success(request, f"Payment of ₹{payment.amount} recorded for {payment.customer}!")
             return redirect('wholesale_payment_receipt', pk=payment.pk)
     else:
@@ -1776,8 +1413,14 @@ def wholesale_payment_delete(request, pk):
     payment = get_object_or_404(WholesalePayment,pk=pk,delete_status=False)
 
     if request.method == "POST":
-        payment.delete_status = True
-        payment.save()
+        with transaction.atomic():
+            # Re-read under a row lock so a repeated submit cannot reverse the payment twice
+            payment = get_object_or_404(
+                WholesalePayment.objects.select_for_update(), pk=pk, delete_status=False
+            )
+            payment.delete_status = True
+            payment.save()
+            apply_payment(payment.customer, -payment.amount, payment.branch_id, payment.payment_date)
 
         return JsonResponse({"success": True})
 
@@ -1820,35 +1463,23 @@ def wholesale_payment_list(request):
 
     
 
-    # Customer balance calculation
+    # Customer balance calculation (from the maintained balance rows)
     customers = Customer.objects.filter(whole_sale=True, delete_status=False)
     if not is_admin_like and user.branch:
         customers = customers.filter(wholesalesales__branch=user.branch).distinct()
 
-    customer_stats = []
-    for cust in customers:
-        total_sales = WholesaleSales.objects.filter(
-            customer=cust,
-            delete_status=False
-        ).aggregate(total=Sum('grand_total'))['total'] or Decimal('0.00')
+    customers = customers.annotate(**balance_annotations()).filter(current_balance__gt=0)  # Only show if pending
 
-        total_paid = WholesalePayment.objects.filter(
-            customer=cust,
-            delete_status=False
-        ).aggregate(paid=Sum('amount'))['paid'] or Decimal('0.00')
-
-        opening_balance = cust.opening_balance or Decimal('0.00')
-
-        balance = opening_balance + total_sales - total_paid
-
-        if balance > 0:  # Only show if pending
-            customer_stats.append({
-                'customer': cust,
-                'total_sales': total_sales,
-                'total_paid': total_paid,
-                'balance': balance,
-                'opening_balance': opening_balance
-            })
+    customer_stats = [
+        {
+            'customer': cust,
+            'total_sales': cust.total_sales,
+            'total_paid': cust.total_paid,
+            'balance': cust.current_balance,
+            'opening_balance': cust.opening_balance or Decimal('0.00')
+        }
+        for cust in customers
+    ]
 
     context = {
         'payments': payments,
@@ -1860,6 +1491,7 @@ def wholesale_payment_list(request):
     return render(request, 'wholesale_payment_list.html', context)
 
 @login_required(login_url='login')
+@pdf_export
 def wholesale_item_report(request):
     is_admin_like = request.user.role in ['super_admin', 'admin']
     
@@ -1917,6 +1549,23 @@ def wholesale_item_report(request):
         details_qs = details_qs.filter(sales__customer_id=customer_id)
         selected_customer = Customer.objects.filter(id=customer_id).first()
 
+    if export_type in TABULAR_FORMATS:
+        rows = details_qs.values_list(
+            'sales__customer__customer_name', 'item__code', 'item__name'
+        ).annotate(
+            total_qty=Sum('qty'),
+            total_net_weight=Sum('net_weight'),
+            total_amount=Sum('total_amount'),
+        ).order_by('sales__customer__customer_name', 'item__code')
+        return tabular_export(
+            export_type, f"{now():%Y-%m-%d}-wholesale-item-report",
+            ['Customer', 'Code', 'Item', 'Qty', 'Net Weight', 'Amount'],
+            (
+                (customer_name or "Unknown Customer", *rest)
+                for customer_name, *rest in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+            ),
+        )
+
     # Group by Customer → Item
     report_data = {}
     for detail in details_qs:
@@ -2081,6 +1730,7 @@ def customer_delete(request, pk):
     return render(request, 'customer_delete.html', {'customer': customer})
 
 @login_required(login_url='login')
+@pdf_export
 def retail_item_report(request):
     is_admin_like = request.user.role in ['super_admin', 'admin']
     
@@ -2138,6 +1788,15 @@ def retail_item_report(request):
         total_amount=Sum('total_amount')
     ).order_by('item__name')
 
+    if export_type in TABULAR_FORMATS:
+        return tabular_export(
+            export_type, f"{now():%Y-%m-%d}-retail-item-report",
+            ['Code', 'Item', 'Qty', 'Net Weight', 'Amount'],
+            item_data.values_list(
+                'item__code', 'item__name', 'total_qty', 'total_net_weight', 'total_amount'
+            ).iterator(chunk_size=EXPORT_CHUNK_SIZE),
+        )
+
     # Convert to list (if needed for template)
     item_data = list(item_data)
 
@@ -2205,11 +1864,9 @@ def user_logout(request):
 
 @require_GET
 def items_by_category(request: HttpRequest, category_id: int):
-    print(f"Fetching items for category_id: {category_id}")
-    items = Item.objects.filter(category_id=category_id).values('id', 'name')
-    if not items.exists():
-        print("No items found for this category")
-    return JsonResponse(list(items), safe=False)
+    items = list(Item.objects.filter(category_id=category_id).values('id', 'name'))
+    logger.debug("Items by category", extra={'data': {'category_id': category_id, 'items': len(items)}})
+    return JsonResponse(items, safe=False)
 
 @login_required(login_url='login')
 def supplier_list(request):
@@ -2286,46 +1943,28 @@ def supplier_payment_list(request):
     # === SUPPLIER BALANCE CALCULATION ===
     stats = Supplier.objects.all()
 
-    # Base filters
-    purchase_q = Q(purchase__delete_status=False)
-    payment_q = Q(supplierpay__delete_status=False)
-
-    # Apply branch filter if needed
-    if is_manager or is_staff and user.branch:
-        purchase_q &= Q(purchase__branch=user.branch)
-        payment_q &= Q(supplierpay__branch=user.branch)
-
     # Apply supplier filter BEFORE annotate (safe)
     if supplier_id:
         stats = stats.filter(supplier_id=supplier_id)  # Use supplier_id, not id!
 
-    supplier_stats = stats.annotate(
-        total_purchase=Sum(
-            'purchase__details__total_amount',
-            filter=purchase_q,
-            output_field=models.DecimalField(max_digits=12, decimal_places=2)
-        ),
-        total_paid=Sum(
-            'supplierpay__amount',
-            filter=payment_q,
-            output_field=models.DecimalField(max_digits=12, decimal_places=2)
-        )
-    ).annotate(
-        balance=F('total_purchase') - F('total_paid')
-    ).values(
-        'supplier_id', 'supplier_name', 'total_purchase', 'total_paid', 'balance'
-    )
+    # Branch restriction for manager/staff, same as the payments list
+    stats_branch = None
+    if is_manager or is_staff:
+        stats_branch = user.branch
+        if not user.branch:
+            stats = stats.none()
 
-    # Clean None → 0.00
     supplier_stats = [
         {
             'supplier_id': s['supplier_id'],
             'supplier_name': s['supplier_name'],
-            'total_purchase': s['total_purchase'] or Decimal('0.00'),
-            'total_paid': s['total_paid'] or Decimal('0.00'),
-            'balance': (s['total_purchase'] or Decimal('0.00')) - (s['total_paid'] or Decimal('0.00'))
+            'total_purchase': s['total_purchase'],
+            'total_paid': s['total_paid'],
+            'balance': s['balance'],
         }
-        for s in supplier_stats
+        for s in with_balances(stats, stats_branch).values(
+            'supplier_id', 'supplier_name', 'total_purchase', 'total_paid', 'balance'
+        )
     ]
 
     # Suppliers for dropdown
@@ -2568,12 +2207,13 @@ def purchase_add(request):
                 })
             with transaction.atomic():
                 purchase = form.save(commit=False)
-
-                print("===== PURCHASE DEBUG =====")
-                print("Invoice:", purchase.invoice_number)
-                print("Tax Amount:", purchase.tax_amount)
-                print("Grand Total:", purchase.grand_total)
-                print("==========================")
+                debug = logger.isEnabledFor(logging.DEBUG)
+                if debug:
+                    logger.debug("Purchase", extra={'data': {
+                        'invoice': purchase.invoice_number,
+                        'tax_amount': purchase.tax_amount,
+                        'grand_total': purchase.grand_total,
+                    }})
 
                 purchase.added_by = request.user
                 if not is_admin_like:
@@ -2584,33 +2224,22 @@ def purchase_add(request):
                         if detail.instance.pk:
                             detail.instance.delete()
                     elif detail.cleaned_data and not detail.cleaned_data.get('DELETE'):
-
-                        print("===== PURCHASE DETAIL DEBUG =====")
-                        print("Item:", detail.cleaned_data.get('item'))
-                        print("Purchase Price:", detail.cleaned_data.get('purchase_price'))
-                        print("Qty:", detail.cleaned_data.get('qty'))
-                        print("No Of Boxes:", detail.cleaned_data.get('no_of_boxes'))
-                        print("Gross Weight:", detail.cleaned_data.get('gross_weight'))
-                        print("Empty Weight:", detail.cleaned_data.get('empty_weight'))
-                        print("Net Weight:", detail.cleaned_data.get('net_weight'))
-                        print("Tax %:", detail.cleaned_data.get('tax_percentage'))
-                        print("Total Amount:", detail.cleaned_data.get('total_amount'))
-                        print("=================================")
+                        if debug:
+                            logger.debug("Purchase detail", extra={'data': {
+                                'invoice': purchase.invoice_number,
+                                **{field: detail.cleaned_data.get(field) for field in PURCHASE_DEBUG_FIELDS},
+                            }})
 
                         detail_instance = detail.save(commit=False)
                         detail_instance.purchase = purchase
                         detail_instance.save()
                         item = detail.cleaned_data['item']
-                        print("Item:", item)
-                        print("Current stock:", item.stock)
-                        if item.category.is_weight_based:
-                            print("Adding weight:", detail.cleaned_data['net_weight'])
-                            new_stock = item.stock + detail.cleaned_data['net_weight']
-                        else:
-                            print("Adding qty:", detail.cleaned_data['qty'])
-                            new_stock = item.stock + detail.cleaned_data['qty']
-                        print("New stock:", new_stock)
-                        item.save()
+                        record_movement(
+                            item, purchase.branch,
+                            stock_quantity(item, detail_instance.qty, detail_instance.net_weight),
+                            'purchase', purchase.invoice_number, request.user
+                        )
+                refresh_live_prices(live_price_keys(purchase))
                 messages.success(request, f"Purchase {invoice_no} saved successfully!")
                 return redirect("purchase_add")
         else:
@@ -2638,6 +2267,7 @@ def purchase_add(request):
         })
 
 @login_required(login_url='login')
+@pdf_export
 def purchase_list(request):
     is_admin_like = request.user.role in ['super_admin', 'admin']
     
@@ -2699,20 +2329,33 @@ def purchase_list(request):
         purchases = purchases.filter(supplier_id=supplier_id)
         selected_supplier = Supplier.objects.filter(supplier_id=supplier_id).first()
 
-    # Order by latest first
-    purchases = purchases.order_by('-purchase_date', '-created_date')
+    # Order by latest first; detail totals summed in the same query
+    purchases = purchases.annotate(
+        total_qty=Coalesce(Sum('details__qty'), 0),
+        total_net_weight=Coalesce(
+            Sum('details__net_weight'), Value(Decimal('0.000')),
+            output_field=models.DecimalField(max_digits=14, decimal_places=3),
+        ),
+    ).order_by('-purchase_date', '-created_date')
+
+    if export_type in TABULAR_FORMATS:
+        return tabular_export(
+            export_type, f"{now():%Y-%m-%d}-purchase-list",
+            ['Invoice', 'Date', 'Supplier', 'Branch', 'Qty', 'Net Weight', 'Tax', 'Grand Total'],
+            purchases.values_list(
+                'invoice_number', 'purchase_date', 'supplier__supplier_name', 'branch__branch_name',
+                'total_qty', 'total_net_weight', 'tax_amount', 'grand_total',
+            ).iterator(chunk_size=EXPORT_CHUNK_SIZE),
+        )
 
-    # Calculate totals for display
-    purchase_data = []
-    for purchase in purchases:
-        details = purchase.details.all()
-        total_qty = sum(d.qty for d in details)
-        total_net_weight = sum(d.net_weight for d in details)
-        purchase_data.append({
+    purchase_data = [
+        {
             'purchase': purchase,
-            'total_qty': total_qty,
-            'total_net_weight': total_net_weight,
-        })
+            'total_qty': purchase.total_qty,
+            'total_net_weight': purchase.total_net_weight,
+        }
+        for purchase in purchases
+    ]
 
     context = {
         'purchases': purchase_data,
@@ -2743,6 +2386,7 @@ def purchase_list(request):
 def purchase_view(request, pk):
     is_admin_like = request.user.role in ['super_admin', 'admin']
     purchase = get_object_or_404(Purchase, pk=pk, delete_status=False)
+    original_branch = purchase.branch
     
     # Restrict non-admin users to their branch
     if not is_admin_like and purchase.branch != request.user.branch:
@@ -2754,6 +2398,7 @@ def purchase_view(request, pk):
             messages.error(request, "You are not authorized to update this purchase.")
             return redirect('purchase_list')
         
+        original_price_keys = live_price_keys(purchase)
         form = PurchaseForm(request.POST, instance=purchase, user=request.user)
         formset = PurchaseDetailFormSet(request.POST, instance=purchase)
         if form.is_valid() and formset.is_valid():
@@ -2764,34 +2409,41 @@ def purchase_view(request, pk):
                 purchase.save()
 
                 # Revert stock for deleted or updated items
+                # (bound forms already hold the edited values, so read the saved row)
                 for detail in formset:
-                    if detail.instance.pk and detail.cleaned_data.get('DELETE'):
-                        item = detail.instance.item
-                        if item.category.is_weight_based:
-                            item.stock -= detail.instance.net_weight
-                        else:
-                            item.stock -= detail.instance.qty
-                        item.save()
+                    old = PurchaseDetail.objects.select_related('item__category').filter(
+                        pk=detail.instance.pk
+                    ).first() if detail.instance.pk else None
+
+                    if old and detail.cleaned_data.get('DELETE'):
+                        record_movement(
+                            old.item, original_branch,
+                            -stock_quantity(old.item, old.qty, old.net_weight),
+                            'purchase_revert', purchase.invoice_number, request.user
+                        )
                     elif detail.cleaned_data and not detail.cleaned_data.get('DELETE'):
                         detail_instance = detail.save(commit=False)
                         detail_instance.purchase = purchase
-                        # Revert old stock
-                        if detail.instance.pk:
-                            old_item = detail.instance.item
-                            if old_item.category.is_weight_based:
-                                old_item.stock -= detail.instance.net_weight
-                            else:
-                                old_item.stock -= detail.instance.qty
-                            old_item.save()
-                        # Update new stock
                         detail_instance.save()
                         item = detail.cleaned_data['item']
-                        if item.category.is_weight_based:
-                            item.stock += detail.cleaned_data['net_weight']
-                        else:
-                            item.stock += detail.cleaned_data['qty']
-                        item.save()
+                        quantity = stock_quantity(item, detail_instance.qty, detail_instance.net_weight)
+                        if old:
+                            old_quantity = stock_quantity(old.item, old.qty, old.net_weight)
+                            # An unchanged line keeps its movement
+                            if (old.item_id, original_branch, old_quantity) == (item.pk, purchase.branch, quantity):
+                                continue
+                            # Revert old stock
+                            record_movement(
+                                old.item, original_branch, -old_quantity,
+                                'purchase_revert', purchase.invoice_number, request.user
+                            )
+                        # Update new stock
+                        record_movement(
+                            item, purchase.branch, quantity,
+                            'purchase', purchase.invoice_number, request.user
+                        )
                 formset.save()
+                refresh_live_prices(original_price_keys | live_price_keys(purchase))
                 messages.success(request, f"Purchase {purchase.invoice_number} updated successfully!")
                 return redirect('purchase_list')
         else:
@@ -2816,17 +2468,17 @@ def purchase_delete(request, pk):
     purchase = get_object_or_404(Purchase, pk=pk, delete_status=False)
     with transaction.atomic():
         # Revert stock
-        for detail in purchase.details.all():
-            item = detail.item
-            if item.category.is_weight_based:
-                item.stock -= detail.net_weight
-            else:
-                item.stock -= detail.qty
-            item.save()
+        for detail in purchase.details.select_related('item__category'):
+            record_movement(
+                detail.item, purchase.branch,
+                -stock_quantity(detail.item, detail.qty, detail.net_weight),
+                'purchase_revert', purchase.invoice_number, request.user
+            )
         # Update delete status and deleted_by
         purchase.delete_status = True
         purchase.deleted_by = request.user
         purchase.save()
+        refresh_live_prices(live_price_keys(purchase))
         messages.success(request, f"Purchase {purchase.invoice_number} deleted successfully.")
     return redirect('purchase_list')
 
@@ -2872,68 +2524,11 @@ def get_or_create_customer(data, customer_id=None):
         defaults={'customer_phone': None, 'customer_address': '', 'gstin': None}
     )[0], False
 
-def generate_next_receipt(branch_alias):
-
-    if not branch_alias:
-        branch_alias = "XX"  # fallback
-
-    prefix = branch_alias.upper()
-
-    # Find the last retail sale for this branch prefix
-    last_sale = RetailSales.objects.filter(
-        receipt_no__istartswith=prefix + '-',
-        delete_status=False
-    ).order_by('-id').first()
-
-    if last_sale and '-' in last_sale.receipt_no:
-        try:
-            num_part = last_sale.receipt_no.split('-', 1)[1]
-            num = int(''.join(filter(str.isdigit, num_part)))
-            next_num = num + 1
-            return f"{prefix}-{next_num:04d}"
-        except (ValueError, IndexError):
-            pass
-
-    # If no valid last receipt or parsing failed
-    return f"{prefix}-0001"
-
 @login_required
 def retail_receipt(request, pk):
     sale = get_object_or_404(RetailSales, pk=pk, delete_status=False)
     return render(request, 'retail_receipt.html', {'sale': sale})
 
-from django.db.models import Max
-
-def generate_next_receipt(branch_alias):
-    """Generate next receipt like AK-0001, BK-0005"""
-    if not branch_alias:
-        branch_alias = "XX"
-    prefix = branch_alias.upper().strip()
-
-    # Get the highest number used with this prefix
-    last = RetailSales.objects.filter(
-        receipt_no__istartswith=prefix + '-',
-        delete_status=False
-    ).aggregate(max_id=Max('id'))
-
-    if last['max_id']:
-        # Try to extract number from existing receipts
-        similar = RetailSales.objects.filter(
-            receipt_no__istartswith=prefix + '-',
-            delete_status=False
-        ).order_by('-receipt_no').first()
-
-        if similar and similar.receipt_no:
-            try:
-                num_part = similar.receipt_no.split('-')[1]
-                num = int(''.join(filter(str.isdigit, num_part)))
-                return f"{prefix}-{num + 1:04d}"
-            except:
-                pass
-
-    return f"{prefix}-0001"
-
-
 @login_required
 def retail_sales_add(request):
     is_admin_like = request.user.role in ['super_admin', 'admin']
@@ -2948,27 +2543,15 @@ def retail_sales_add(request):
         customer_form = CustomerDataForm(request.POST, require_customer=require_customer)
 
         if form.is_valid() and formset.is_valid() and customer_form.is_valid():
-            receipt_no = form.cleaned_data['receipt_no'].strip()
-
-            # ONLY BLOCK IF AN ACTIVE (not deleted) RECEIPT EXISTS
-            if RetailSales.objects.filter(
-                receipt_no__iexact=receipt_no,
-                delete_status=False
-            ).exists():
-                messages.error(request, f"Receipt number '{receipt_no}' is already in use (active sale exists)!")
-                return render(request, "retail_sales_add.html", {
-                    'form': form,
-                    'formset': formset,
-                    'customer_form': customer_form,
-                    'is_admin_like': is_admin_like
-                })
-
             with transaction.atomic():
                 sales = form.save(commit=False)
                 sales.added_by = request.user
                 if not is_admin_like:
                     sales.branch = request.user.branch
 
+                # The number shown on the form is only a preview; take the real one now
+                sales.receipt_no = next_receipt_no(sales.branch, RETAIL_SALE)
+
                 # === SAFE CUSTOMER HANDLING ===
                 customer_data = customer_form.cleaned_data
                 customer, created = get_or_create_customer(customer_data, customer_id)
@@ -2984,29 +2567,11 @@ def retail_sales_add(request):
                 sales.save()
 
                 # Save items & deduct stock
-                for detail in formset:
-                    if detail.cleaned_data and not detail.cleaned_data.get('DELETE'):
-                        detail_instance = detail.save(commit=False)
-                        detail_instance.sales = sales
-                        detail_instance.save()
+                shortages = post_sale_lines(sales, formset, 'retail_sale', request.user)
+                for item, quantity in shortages:
+                    messages.error(request, f"Low stock: {item.name}")
 
-                        item = detail.cleaned_data['item']
-                        qty = detail.cleaned_data['qty'] or 0
-                        net_weight = detail.cleaned_data['net_weight'] or 0
-
-                        if item.category.is_weight_based:
-                            if item.stock < net_weight:
-                                messages.error(request, f"Low stock: {item.name}")
-                                #raise transaction.TransactionManagementError()
-                            item.stock -= net_weight
-                        else:
-                            if item.stock < qty:
-                                messages.error(request, f"Low stock: {item.name}")
-                                #raise transaction.TransactionManagementError()
-                            item.stock -= qty
-                        item.save()
-
-                messages.success(request, f"Retail sale {receipt_no} saved successfully!")
+                messages.success(request, f"Retail sale {sales.receipt_no} saved successfully!")
                 return redirect('retail_receipt', pk=sales.pk)
 
         else:
@@ -3024,7 +2589,7 @@ def retail_sales_add(request):
         else:
             selected_branch = request.user.branch
 
-        receipt_no = generate_next_receipt(selected_branch.alias if selected_branch else "XX")
+        receipt_no = peek_receipt_no(selected_branch, RETAIL_SALE)
 
         initial = {
             'receipt_no': receipt_no,
@@ -3053,67 +2618,17 @@ from datetime import date
 
 @login_required(login_url='login')
 def retail_sales_list(request):
-    is_admin_like = request.user.role in ['super_admin', 'admin']
-
-    # === FILTER PARAMETERS ===
-    branch_id = request.GET.get('branch')
-    customer_type = request.GET.get('customer_type', 'all')  # all, store, takeaway
-    from_date_str = request.GET.get('from_date')
-    to_date_str = request.GET.get('to_date')
-
+    list_filter = RetailListFilter(request.user, request.GET)
+    is_admin_like = list_filter.is_admin_like
     today = date.today()
 
-    # Default to today if no date provided
-    from_date_str = from_date_str or today.strftime('%Y-%m-%d')
-    to_date_str = to_date_str or today.strftime('%Y-%m-%d')
-
-    # Parse dates safely
-    try:
-        from_date = datetime.strptime(from_date_str, '%Y-%m-%d').date()
-    except ValueError:
-        from_date = today
-
-    try:
-        to_date = datetime.strptime(to_date_str, '%Y-%m-%d').date()
-    except ValueError:
-        to_date = today
-
-    selected_branch = None
-    if branch_id and branch_id.isdigit():
-        selected_branch = int(branch_id)
-
-    # === 1. PENDING CREDIT BILLS (any with pending > 0) ===
-    credit_sales = RetailSales.objects.filter(
-        pending_amount__gt=0,
-        delete_status=False
-    ).select_related('branch', 'customer', 'added_by')
-
-    if not is_admin_like:
-        credit_sales = credit_sales.filter(branch=request.user.branch)
-    else:
-        if selected_branch is not None:
-            credit_sales = credit_sales.filter(branch_id=selected_branch)
-
-    credit_sales = credit_sales.order_by('-sales_date')
-
-    # === 2. REGULAR FILTERED SALES ===
-    sales = RetailSales.objects.filter(
-        delete_status=False,
-        sales_date__gte=from_date,
-        sales_date__lte=to_date
-    ).select_related('branch', 'customer', 'added_by', 'take_amay_employee')
-
-    # Branch filter
+    selected_branch = list_filter.selected_branch
     if not is_admin_like:
         if request.user.branch:
-            sales = sales.filter(branch=request.user.branch)
             selected_branch_name = request.user.branch.branch_name
         else:
-            sales = sales.none()
             selected_branch_name = "No Branch Assigned"
     else:
-        if selected_branch is not None:
-            sales = sales.filter(branch_id=selected_branch)
         selected_branch_name = "All Branches"
         if selected_branch is not None:
             try:
@@ -3121,61 +2636,80 @@ def retail_sales_list(request):
             except Branch.DoesNotExist:
                 selected_branch_name = "Unknown Branch"
 
-    # Customer type filter
-    if customer_type == 'store':
-        sales = sales.filter(take_amay_employee__isnull=True)
-    elif customer_type == 'takeaway':
-        sales = sales.filter(take_amay_employee__isnull=False)
-
-    sales = sales.order_by('-sales_date')
-
-    # === TOTALS ===
-    totals = sales.aggregate(
-        total_subtotal=Sum('total'),
-        total_discount=Sum('discount'),
-        total_grand=Sum('grand_total'),
-        total_cash=Sum('total_cash'),
-        total_upi=Sum('total_upi'),
-        total_card=Sum('total_card'),
-        total_pending=Sum('pending_amount'),
+    # === 1. PENDING CREDIT BILLS (any with pending > 0), one page ===
+    credit_sales, credit_next = keyset_page(
+        list_filter.credit_sales().select_related('customer', 'take_amay_employee'),
+        request.GET.get('credit_after'), CREDIT_PAGE_SIZE,
     )
 
-    credit_totals = credit_sales.aggregate(
-        credit_grand=Sum('grand_total'),
-        credit_pending=Sum('pending_amount'),
+    # === 2. REGULAR FILTERED SALES, one page ===
+    sales, sales_next = keyset_page(
+        list_filter.sales().select_related('branch', 'customer', 'added_by', 'take_amay_employee'),
+        request.GET.get('after'), SALES_PAGE_SIZE,
     )
 
+    # Totals are loaded from retail_sales_totals; pages keep the filters
+    filter_params = request.GET.copy()
+    for key in ('after', 'start', 'credit_after', 'credit_start'):
+        filter_params.pop(key, None)
+
+    def page_url(**cursors):
+        params = filter_params.copy()
+        for key, value in cursors.items():
+            if value is not None:
+                params[key] = value
+        return '?' + params.urlencode()
+
+    sales_start = int(request.GET['start']) if request.GET.get('start', '').isdigit() else 0
+    credit_start = int(request.GET['credit_start']) if request.GET.get('credit_start', '').isdigit() else 0
+    current = {
+        'after': request.GET.get('after'),
+        'start': sales_start or None,
+        'credit_after': request.GET.get('credit_after'),
+        'credit_start': credit_start or None,
+    }
+
     context = {
         'sales': sales,
         'credit_sales': credit_sales,
-
-        'total_subtotal': totals['total_subtotal'] or Decimal('0.00'),
-        'total_discount': totals['total_discount'] or Decimal('0.00'),
-        'total_grand': totals['total_grand'] or Decimal('0.00'),
-        'total_cash': totals['total_cash'] or Decimal('0.00'),
-        'total_upi': totals['total_upi'] or Decimal('0.00'),
-        'total_card': totals['total_card'] or Decimal('0.00'),
-        'total_pending': totals['total_pending'] or Decimal('0.00'),
-
-        'credit_total_grand': credit_totals['credit_grand'] or Decimal('0.00'),
-        'credit_pending_total': credit_totals['credit_pending'] or Decimal('0.00'),
+        'sales_start': sales_start,
+        'credit_start': credit_start,
+        'sales_next_url': sales_next and page_url(
+            **dict(current, after=sales_next, start=sales_start + len(sales))
+        ),
+        'sales_first_url': current['after'] and page_url(**dict(current, after=None, start=None)),
+        'credit_next_url': credit_next and page_url(
+            **dict(current, credit_after=credit_next, credit_start=credit_start + len(credit_sales))
+        ),
+        'credit_first_url': current['credit_after'] and page_url(
+            **dict(current, credit_after=None, credit_start=None)
+        ),
+        'totals_url': reverse('retail_sales_totals') + '?' + filter_params.urlencode(),
 
         'branches': Branch.objects.all() if is_admin_like else [],
         'is_admin_like': is_admin_like,
         'selected_branch': selected_branch,
         'selected_branch_name': selected_branch_name,
 
-        'from_date_str': from_date_str,
-        'to_date_str': to_date_str,
-        'from_date': from_date,
-        'to_date': to_date,
+        'from_date_str': list_filter.from_date.strftime('%Y-%m-%d'),
+        'to_date_str': list_filter.to_date.strftime('%Y-%m-%d'),
+        'from_date': list_filter.from_date,
+        'to_date': list_filter.to_date,
         'today': today.strftime('%Y-%m-%d'),
 
-        'customer_type': customer_type,  # for pre-selecting dropdown
+        'customer_type': list_filter.customer_type,  # for pre-selecting dropdown
     }
 
     return render(request, 'retail_sales_list.html', context)
 
+
+@login_required
+@require_GET
+def retail_sales_totals(request):
+    """Totals of the retail sales list filters (whole range, not just one page)."""
+    totals = get_retail_totals(RetailListFilter(request.user, request.GET))
+    return JsonResponse({name: f'{value:.2f}' for name, value in totals.items()})
+
 @login_required
 def retail_sales_delete(request, pk):
     if request.user.role not in ['super_admin', 'admin']:
@@ -3186,13 +2720,12 @@ def retail_sales_delete(request, pk):
     try:
         with transaction.atomic():
             # CORRECT: related_name='details'
-            for detail in sale.details.all():
-                item = detail.item
-                if item.category.is_weight_based:
-                    item.stock += detail.net_weight
-                else:
-                    item.stock += detail.qty
-                item.save()
+            for detail in sale.details.select_related('item__category'):
+                record_movement(
+                    detail.item, sale.branch,
+                    stock_quantity(detail.item, detail.qty, detail.net_weight),
+                    'retail_sale_revert', sale.receipt_no, request.user
+                )
 
             sale.delete_status = True
             sale.deleted_by = request.user
@@ -3291,8 +2824,8 @@ def wholesale_sales_add(request):
         if form.is_valid() and formset.is_valid() and customer_form.is_valid():
             receipt_no = form.cleaned_data['receipt_no'].strip().upper()
 
-            # Unique receipt check
-            if WholesaleSales.objects.filter(receipt_no__iexact=receipt_no,delete_status=False).exists():
+            # Unique receipt check (blank = next number from the sequence)
+            if receipt_no and WholesaleSales.objects.filter(receipt_no__iexact=receipt_no,delete_status=False).exists():
                 messages.error(request, f"Receipt No '{receipt_no}' already used!")
                 return render(request, "wholesale_sales_add.html", {
                     'form': form, 'formset': formset, 'customer_form': customer_form,
@@ -3327,34 +2860,22 @@ def wholesale_sales_add(request):
 
                 # CRITICAL: Assign customer BEFORE saving!
                 sales.customer = customer
+                if not receipt_no:
+                    sales.receipt_no = next_receipt_no(sales.branch, WHOLESALE_SALE)
 
                 # Now it's safe to save
                 sales.save()
+                apply_sale(customer, sales.grand_total, sales.branch_id, sales.sales_date)
+
+                # 3. Save formset items & deduct stock
+                shortages = post_sale_lines(sales, formset, 'wholesale_sale', request.user)
+                for item, quantity in shortages:
+                    unit = ' kg' if item.category.is_weight_based else ''
+                    messages.error(request, f"Low stock: {item.name} (Need {quantity}{unit})")
+                if shortages:
+                    raise ValueError("Low stock")
 
-                # 3. Save formset items
-                for detail_form in formset:
-                    if detail_form.cleaned_data and not detail_form.cleaned_data.get('DELETE', False):
-                        detail = detail_form.save(commit=False)
-                        detail.sales = sales
-                        detail.save()
-
-                        item = detail.item
-                        qty = detail.qty or 0
-                        net_weight = detail.net_weight or 0
-
-                        if item.category.is_weight_based:
-                            if item.stock < net_weight:
-                                messages.error(request, f"Low stock: {item.name} (Need {net_weight} kg)")
-                                raise ValueError("Low stock")
-                            item.stock -= net_weight
-                        else:
-                            if item.stock < qty:
-                                messages.error(request, f"Low stock: {item.name} (Need {qty})")
-                                raise ValueError("Low stock")
-                            item.stock -= qty
-                        item.save()
-
-                messages.success(request, f"Wholesale Sale {receipt_no} created successfully!")
+                messages.success(request, f"Wholesale Sale {sales.receipt_no} created successfully!")
                 return redirect('wholesale_receipt', pk=sales.pk)
 
         else:
@@ -3396,29 +2917,32 @@ def wholesale_sales_delete(request, pk):
 
     try:
         with transaction.atomic():
+            # Re-read under a row lock so a repeated submit cannot reverse the sale twice
+            sale = WholesaleSales.objects.select_for_update().filter(pk=pk, delete_status=False).first()
+            if sale is None:
+                return JsonResponse({'success': False, 'error': 'Sale already deleted.'}, status=409)
+
             # Restore stock for all items in this sale
-            for detail in sale.details.all():          # ← Use correct related_name
-                item = detail.item
-                
-                if item.category.is_weight_based:
-                    item.stock += detail.net_weight or Decimal('0.000')
-                else:
-                    item.stock += detail.qty or 0
-                
-                item.save()
+            for detail in sale.details.select_related('item__category'):          # ← Use correct related_name
+                record_movement(
+                    detail.item, sale.branch,
+                    stock_quantity(detail.item, detail.qty, detail.net_weight),
+                    'wholesale_sale_revert', sale.receipt_no, request.user
+                )
 
             # Soft delete the sale
             sale.delete_status = True
             sale.deleted_by = request.user
             sale.save()
+            apply_sale(sale.customer, -(sale.grand_total or 0), sale.branch_id, sale.sales_date)
 
         return JsonResponse({
             'success': True,
             'message': f'Sale #{sale.receipt_no} deleted successfully. Stock restored.'
         })
 
-    except Exception as e:
-        print(f"Delete error for sale {pk}: {str(e)}")   # Log for debugging
+    except Exception:
+        logger.exception("Delete failed for wholesale sale %s", pk)
         return JsonResponse({
             'success': False,
             'error': 'Failed to delete sale. Please try again.'
@@ -3427,63 +2951,47 @@ def wholesale_sales_delete(request, pk):
 
 @require_GET
 def search_items(request):
-    q = request.GET.get('q', '')
+    q = request.GET.get('q', '').strip()
     branch_id = request.GET.get('branch_id')  # NEW: pass branch context
 
-    items = Item.objects.filter(name__icontains=q).select_related('category')
+    catalog = get_catalog(branch_id)
+    if not_modified(request, catalog):
+        return HttpResponseNotModified(headers={'ETag': catalog.etag})
 
-    # Pre-load branch prices if branch given
-    branch_price_map = {}
-    if branch_id and str(branch_id).isdigit():
-        branch_prices = ItemBranchPrice.objects.filter(
-            branch_id=branch_id,
-            item__in=items
-        )
-        branch_price_map = {bp.item_id: bp for bp in branch_prices}
+    # Name or code, best matches first, one page at a time
+    offset, limit = page_bounds(request.GET)
+    data, has_more = paginate(catalog.search(q), offset, limit)
 
-    data = []
-    for item in items:
-        bp = branch_price_map.get(item.id)
-        retail = bp.price_per_unit_retail if bp else item.price_per_unit_retail
-        wholesale = bp.price_per_unit_wholesale if bp else item.price_per_unit_wholesale
-        data.append({
-            'id': item.id,
-            'name': item.name,
-            'code': item.code,
-            'price': str(retail),
-            'wholesale_price': str(wholesale),
-            'is_weight_based': item.category.is_weight_based
-        })
-    return JsonResponse(data, safe=False)
+    response = JsonResponse(data, safe=False)
+    response['ETag'] = catalog.etag
+    if has_more:
+        response['X-Next-Offset'] = offset + limit
+    return response
 
 @require_GET
 def item_by_code(request):
     code = request.GET.get('code', '')
     branch_id = request.GET.get('branch_id')  # NEW
 
-    try:
-        item = Item.objects.select_related('category').get(code=code)
-
-        retail = item.price_per_unit_retail
-        wholesale = item.price_per_unit_wholesale
-
-        if branch_id and str(branch_id).isdigit():
-            bp = ItemBranchPrice.objects.filter(item=item, branch_id=branch_id).first()
-            if bp:
-                retail = bp.price_per_unit_retail
-                wholesale = bp.price_per_unit_wholesale
-
-        data = {
-            'id': item.id,
-            'name': item.name,
-            'price': str(retail),
-            'wholesale_price': str(wholesale),
-            'is_weight_based': item.category.is_weight_based
-        }
-        return JsonResponse(data)
-    except Item.DoesNotExist:
+    catalog = get_catalog(branch_id)
+    if not_modified(request, catalog):
+        return HttpResponseNotModified(headers={'ETag': catalog.etag})
+
+    entry = catalog.by_code.get(code)
+    if entry is None:
         return JsonResponse({'error': 'Item not found'}, status=404)
 
+    data = {
+        'id': entry['id'],
+        'name': entry['name'],
+        'price': entry['price'],
+        'wholesale_price': entry['wholesale_price'],
+        'is_weight_based': entry['is_weight_based']
+    }
+    response = JsonResponse(data)
+    response['ETag'] = catalog.etag
+    return response
+
 @require_GET
 def search_customers(request):
     q = request.GET.get('q', '').strip()
@@ -3500,15 +3008,13 @@ def search_customers(request):
         customers = customers.filter(whole_sale=False)
     # Else: show all (fallback)
 
-    # Apply search
-    if q:
-        if type_ == 'phone':
-            customers = customers.filter(customer_phone__icontains=q)
-        else:
-            customers = customers.filter(customer_name__icontains=q)
+    # Apply search (prefix matches first)
+    field = 'customer_phone' if type_ == 'phone' else 'customer_name'
+    customers = find_customers(q, field, customers)
 
     # Limit results for performance
-    customers = customers[:20]
+    offset, limit = page_bounds(request.GET)
+    customers, has_more = paginate(customers, offset, limit)
 
     data = [
         {
@@ -3520,15 +3026,24 @@ def search_customers(request):
         }
         for c in customers
     ]
-    return JsonResponse(data, safe=False)
+    response = JsonResponse(data, safe=False)
+    if has_more:
+        response['X-Next-Offset'] = offset + limit
+    return response
 
 @require_GET
 def item_details(request, item_id):
-    try:
-        item = Item.objects.get(id=item_id)
-        return JsonResponse({'is_weight_based': item.category.is_weight_based})
-    except Item.DoesNotExist:
+    catalog = get_catalog()
+    if not_modified(request, catalog):
+        return HttpResponseNotModified(headers={'ETag': catalog.etag})
+
+    entry = catalog.by_id.get(item_id)
+    if entry is None:
         return JsonResponse({'error': 'Item not found', 'is_weight_based': False}, status=404)
+
+    response = JsonResponse({'is_weight_based': entry['is_weight_based']})
+    response['ETag'] = catalog.etag
+    return response
     
 @login_required
 def employe_add(request):
@@ -52,6 +52,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'accounts.profiling.RequestProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'jaan_chicken.urls'
@@ -92,6 +93,21 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# One cache for every worker process, so the catalog, summary and export
+# version keys replaced on a change are seen by all of them. The table is
+# created by the accounts migrations (0054).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'accounts_cache',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -133,6 +149,52 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",   # Points to /chicken_shop/static/
 ]
 
+# Rendered report PDFs (see accounts/exports.py and the run_export_worker command)
+PDF_EXPORT_DIR = BASE_DIR / "exports"
+
+# Request profiling (see accounts/profiling.py). Off, a super_admin can still
+# profile single requests with an "X-Profile: 1" header. Each process writes
+# its own request_profile.<pid>.jsonl and rotates it at the size below.
+REQUEST_PROFILING = False
+REQUEST_PROFILE_LOG = BASE_DIR / "logs" / "request_profile.jsonl"
+REQUEST_PROFILE_LOG_MAX_BYTES = 5 * 1024 * 1024
+REQUEST_PROFILE_LOG_BACKUPS = 4
+
+# Logging (see accounts/log.py): one JSON object per line on stdout, written
+# by a background thread. Debug output of the views (e.g. purchase lines) is
+# off until the accounts logger, or one of its children such as
+# accounts.views, is set to DEBUG here; debug records are then sampled at
+# LOG_DEBUG_SAMPLE_RATE, one decision per purchase invoice.
+LOG_LEVEL = 'INFO'
+LOG_DEBUG_SAMPLE_RATE = 0.1
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'accounts.log.JsonFormatter'},
+    },
+    'filters': {
+        'sample_debug': {
+            '()': 'accounts.log.SampleFilter', 'rate': LOG_DEBUG_SAMPLE_RATE, 'max_level': 'DEBUG',
+            'key': 'invoice',  # a purchase's records are kept or dropped together
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'accounts.log.QueueStreamHandler',
+            'stream': 'ext://sys.stdout',
+            'formatter': 'json',
+            'filters': ['sample_debug'],
+        },
+    },
+    'loggers': {
+        'accounts': {'handlers': ['console'], 'level': LOG_LEVEL, 'propagate': False},
+        # Noisy third-party loggers
+        'xhtml2pdf': {'handlers': ['console'], 'level': 'ERROR', 'propagate': False},
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 